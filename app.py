@@ -1,41 +1,166 @@
 from __future__ import annotations
 
-from datetime import date
+import time
+
+_startup = time.perf_counter()
 
-import pandas as pd
+import asyncio
+import contextvars
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
 
-from typing import Optional
+from typing import Any, List, Optional, Tuple
 
-from fastapi import FastAPI
-from fastapi.responses import JSONResponse
+from fastapi import Body, FastAPI, Header, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
 
 from fake_data import create_app
+from fake_data import formats
+from fake_data import metrics
+from fake_data.aggregates import GRANULARITIES
+from fake_data.live import LiveFeed
+from fake_data.singleflight import SingleFlight
 
+_imports = time.perf_counter() - _startup
 app_tracker = create_app()
-user_list = app_tracker.users
 app = FastAPI()
 
+# Simulations of `/` run off the event loop, identical concurrent requests share one
+simulations = SingleFlight(ThreadPoolExecutor(thread_name_prefix="simulation"), name="connexion")
+
+# Meals of the day pushed as they happen, started by the first subscriber
+live_feed = LiveFeed(app_tracker, executor=simulations.executor)
+
+# Seconds without any event before a comment is sent on /live, so proxies keep the stream open
+LIVE_KEEPALIVE = 15
+
+# Lookups accepted in one POST /batch
+MAX_BATCH_ITEMS = 1000
+
+# Days accepted in one date range, every day of a range is simulated
+MAX_RANGE_DAYS = 366
+
+# Startup breakdown: module imports, then the stages of create_app
+startup_timings = {'imports': _imports, **app_tracker.startup_timings, 'total': time.perf_counter() - _startup}
+for _stage, _duree in startup_timings.items():
+    metrics.STARTUP_SECONDS.set(_duree, stage=_stage)
+logging.getLogger("uvicorn.error").info(
+    "Startup: %s", ", ".join(f"{stage} {duree * 1000:.0f} ms" for stage, duree in startup_timings.items()))
+
+
+@app.middleware("http")
+async def server_timing(request: Request, call_next):
+    """Time every request and report its stages in a Server-Timing header"""
+    timings = metrics.start_request()
+    debut = time.perf_counter()
+    response = await call_next(request)
+    total = time.perf_counter() - debut
+    # The route template, not the raw path, keeps the number of series bounded
+    route = request.scope.get("route")
+    metrics.REQUEST_SECONDS.observe(total, endpoint=route.path if route is not None else "unmatched")
+    response.headers["Server-Timing"] = metrics.server_timing(timings, total)
+    return response
+
 
-def find_user_by_id(users, user_id):
-    for user in users:
-        if user.user_id == user_id:
-            return user
+# Past days never change: clients and CDNs may keep them for a year
+PAST_DAY_CACHE_CONTROL = "public, max-age=31536000, immutable"
+
+
+def check_date(business_date: date) -> Optional[str]:
+    """Return the error message if no data can be served for this date"""
+    # Check the year
+    if business_date.year < 2024:
+        return "No data before 2024"
+    # Check the date is in the past
+    if date.today() < business_date:
+        return "Choose a date in the past"
     return None
 
 
+def check_range(start: date, end: date) -> Optional[JSONResponse]:
+    """Return the error response if no data can be served for this date range"""
+    # The same rules as connexion apply to both ends of the range
+    for business_date in (start, end):
+        error = check_date(business_date)
+        if error is not None:
+            return JSONResponse(status_code=404, content=error)
+    if end < start:
+        return JSONResponse(status_code=404, content="End date should be after start date")
+    if (end - start).days + 1 > MAX_RANGE_DAYS:
+        return JSONResponse(status_code=400, content=f"At most {MAX_RANGE_DAYS} days per range")
+    return None
+
+
+def check_meal_id(classe_mangeur: str, meal_id: int) -> Optional[str]:
+    """Return the error message if the meal does not exist for this eater class"""
+    if classe_mangeur in ['standard', 'meat_lover', 'vegan', 'vegetarian'] and (meal_id > 4 or meal_id < 1):
+        return "Meal_id should be between 1 and 4"
+    if classe_mangeur == 'random' and meal_id != 1:
+        return "Meal_id should be 1"
+    if classe_mangeur == 'fasting' and (meal_id > 2 or meal_id < 1):
+        return "Meal_id should be between 1 and 2"
+    return None
+
+
+def negotiate(accept: Optional[str]):
+    """Return the media type of the response, or the 406 response if none can be served"""
+    media_type = formats.negocier(accept)
+    if media_type is None:
+        return None, JSONResponse(status_code=406, content=f"Supported media types: {', '.join(formats.MEDIA_TYPES)}")
+    try:
+        formats.verifier(media_type)
+    except formats.FormatIndisponible as error:
+        return None, JSONResponse(status_code=406, content=str(error))
+    return media_type, None
+
+
+def columnar_response(connexion_counts: dict, media_type: str, headers: Optional[dict] = None) -> Response:
+    """Encode columnar traffic in the negotiated media type"""
+    with metrics.chrono("encode"):
+        if media_type == formats.JSON:
+            return JSONResponse(status_code=200, content=connexion_counts, headers=headers)
+        return Response(content=formats.encoder(connexion_counts, media_type), media_type=media_type, headers=headers)
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Return True if the If-None-Match header matches the ETag"""
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(tag.strip().removeprefix("W/") == etag for tag in if_none_match.split(","))
+
+
 # https://food-tracking-de-ml-project.onrender.com/?user_id=4&year=2024&month=07&day=18&meal_id=1
 
 # curl -G https://fake-retail-sensor-api.onrender.com -d "user_id=4" -d "year=2024" -d "month=07" -d "day=18"
+def simulate(user_id: int, business_date: date, meal_id: Optional[int]) -> dict:
+    """Simulate (or read from the cache or store) the traffic of a user at a date"""
+    # If no sensor choose return the visit for the whole store
+    if meal_id is None:
+        return app_tracker.get_all_connexion(user_id, business_date)
+    return app_tracker.get_connexion(meal_id, business_date, user_id)
+
+
 @app.get("/")
-def connexion(
+async def connexion(
         user_id: int,
         year: int,
         month: int,
         day: int,
         meal_id: Optional[int] = None,
-) -> JSONResponse:
+        if_none_match: Optional[str] = Header(None),
+        accept: Optional[str] = Header(None),
+) -> Response:
+    # JSON by default, Arrow, Parquet or msgpack when asked for
+    media_type, error_response = negotiate(accept)
+    if error_response is not None:
+        return error_response
+
     # Trouver l'utilisateur par user_id
-    user = find_user_by_id(user_list, user_id)
+    user = app_tracker.get_user(user_id)
     if user is None:
         return JSONResponse(status_code=404, content="User Not found")
 
@@ -46,34 +171,280 @@ def connexion(
     # Check the date
     try:
         date(year, month, day)
-    except TypeError:
+    except (TypeError, ValueError):
         return JSONResponse(status_code=404, content="Enter a valid date")
 
     # Check the date is in the past
-    if date.today() < date(year, month, day):
-        return JSONResponse(status_code=404, content="Choose a date in the past")
+    error = check_date(date(year, month, day))
+    if error is not None:
+        return JSONResponse(status_code=404, content=error)
 
-    # If no sensor choose return the visit for the whole store
-    if meal_id is None:
-        connexion_counts = app_tracker.get_all_connexion(
-            user_id,
-            date(year, month, day)
-        )
-    else:
-        classe_mangeur = user.classe_mangeur
-        # Check the value of meal_id
-        if classe_mangeur in ['standard', 'meat_lover', 'vegan', 'vegetarian'] and (meal_id > 4 or meal_id < 1):
-            return JSONResponse(status_code=404, content="Meal_id should be between 1 and 4")
-        if classe_mangeur == 'random' and meal_id != 1:
-            return JSONResponse(status_code=404, content="Meal_id should be 1")
-        if classe_mangeur == 'fasting' and (meal_id > 2 or meal_id < 1):
-            return JSONResponse(status_code=404, content="Meal_id should be between 1 and 2")
-
-        connexion_counts = app_tracker.get_connexion(meal_id, date(year, month, day), user_id)
+    # Check the value of meal_id
+    if meal_id is not None:
+        error = check_meal_id(user.classe_mangeur, meal_id)
+        if error is not None:
+            return JSONResponse(status_code=404, content=error)
+
+    metrics.REQUESTS.inc(endpoint="/", classe_mangeur=user.classe_mangeur)
+
+    # Past days are immutable, a client that already has one gets a 304 without any simulation
+    headers = {"Vary": "Accept"}
+    if date(year, month, day) < date.today():
+        headers.update({
+            "ETag": app_tracker.etag(user_id, date(year, month, day), meal_id,
+                                     None if media_type == formats.JSON else media_type),
+            "Cache-Control": PAST_DAY_CACHE_CONTROL,
+        })
+        if etag_matches(if_none_match, headers["ETag"]):
+            return Response(status_code=304, headers=headers)
+
+    # Concurrent requests for the same day and meal wait for the same simulation
+    key = (user_id, date(year, month, day), meal_id)
+    connexion_counts = await simulations.run(key, simulate, *key)
 
     #if connexion_counts < 0:
         #return JSONResponse(
          #   status_code=404, content="The store was closed try another date"
         #)
 
-    return JSONResponse(status_code=200, content=connexion_counts)
+    return columnar_response(connexion_counts, media_type, headers)
+
+
+def check_batch_item(item: Any) -> Tuple[Optional[tuple], Optional[str]]:
+    """Return the (user_id, date, meal_id) lookup of a /batch item, or its error message (same rules as connexion)"""
+    if not isinstance(item, dict):
+        return None, "Enter an object with user_id, date and optionally meal_id"
+    user_id, meal_id = item.get('user_id'), item.get('meal_id')
+    if not isinstance(user_id, int) or isinstance(user_id, bool):
+        return None, "Enter a valid user_id"
+    user = app_tracker.get_user(user_id)
+    if user is None:
+        return None, "User Not found"
+
+    try:
+        business_date = date.fromisoformat(item.get('date'))
+    except (TypeError, ValueError):
+        return None, "Enter a valid date"
+    error = check_date(business_date)
+    if error is not None:
+        return None, error
+
+    if meal_id is not None:
+        if not isinstance(meal_id, int) or isinstance(meal_id, bool):
+            return None, "Enter a valid meal_id"
+        error = check_meal_id(user.classe_mangeur, meal_id)
+        if error is not None:
+            return None, error
+
+    metrics.REQUESTS.inc(endpoint="/batch", classe_mangeur=user.classe_mangeur)
+    return (user_id, business_date, meal_id), None
+
+
+# curl http://localhost:8000/batch -H "Content-Type: application/json" \
+#   -d '[{"user_id": 4, "date": "2024-07-18", "meal_id": 1}, {"user_id": 5, "date": "2024-07-19"}]'
+@app.post("/batch")
+async def batch(items: List[Any] = Body(...)) -> Response:
+    """Answer many (user_id, date, meal_id) lookups at once: a result or an error per item, in the items' order.
+
+    Items are checked like the parameters of `/`, then the valid ones are grouped by date and user
+    and simulated (or read from the cache or store) in a single pass."""
+    if len(items) > MAX_BATCH_ITEMS:
+        return JSONResponse(status_code=413, content=f"At most {MAX_BATCH_ITEMS} items per batch")
+
+    lookups, positions, results = [], [], []
+    for item in items:
+        lookup, error = check_batch_item(item)
+        if error is not None:
+            results.append({'status': 404, 'error': error})
+        else:
+            positions.append(len(results))
+            lookups.append(lookup)
+            results.append(None)
+
+    loop = asyncio.get_running_loop()
+    traffic = await loop.run_in_executor(simulations.executor, contextvars.copy_context().run,
+                                         app_tracker.get_batch, lookups)
+    for position, connexion_counts in zip(positions, traffic):
+        results[position] = {'status': 200, 'result': connexion_counts}
+
+    with metrics.chrono("encode"):
+        return JSONResponse(status_code=200, content=results)
+
+
+# curl -G http://localhost:8000/range -d "user_id=4" -d "start=2024-07-01" -d "end=2024-07-31"
+@app.get("/range")
+def connexion_range(
+        user_id: int,
+        start: date,
+        end: date,
+        meal_id: Optional[int] = None,
+        accept: Optional[str] = Header(None),
+):
+    """Stream the activity of a user for every day of a date range as newline-delimited JSON,
+    an Arrow stream with one record batch per day, Parquet or a sequence of msgpack maps"""
+    media_type, error_response = negotiate(accept)
+    if error_response is not None:
+        return error_response
+
+    user = app_tracker.get_user(user_id)
+    if user is None:
+        return JSONResponse(status_code=404, content="User Not found")
+
+    error_response = check_range(start, end)
+    if error_response is not None:
+        return error_response
+
+    if meal_id is not None:
+        error = check_meal_id(user.classe_mangeur, meal_id)
+        if error is not None:
+            return JSONResponse(status_code=404, content=error)
+
+    metrics.REQUESTS.inc(endpoint="/range", classe_mangeur=user.classe_mangeur)
+    days = app_tracker.iter_connexion_range(user_id, start, end, meal_id)
+    headers = {"Vary": "Accept"}
+    if media_type == formats.PARQUET:
+        # Parquet is written once the whole range is known
+        return Response(content=formats.encoder_jours(days, media_type), media_type=media_type, headers=headers)
+    if media_type != formats.JSON:
+        return StreamingResponse(formats.encoder_jours(days, media_type), media_type=media_type, headers=headers)
+
+    def lines():
+        # One day is simulated and encoded at a time, memory does not grow with the range
+        for business_date, connexion_day in days:
+            yield json.dumps({'date': business_date.isoformat(), **connexion_day}) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson", headers=headers)
+
+
+# curl "http://localhost:8000/aggregates?user_id=4&start=2024-01-01&end=2024-06-30&granularity=week"
+@app.get("/aggregates")
+def aggregates(
+        user_id: int,
+        start: date,
+        end: date,
+        granularity: str = "day",
+) -> Response:
+    """Return the calories of a user per meal, day or week of a date range, in total and per food type"""
+    user = app_tracker.get_user(user_id)
+    if user is None:
+        return JSONResponse(status_code=404, content="User Not found")
+
+    # The same rules as range apply
+    error_response = check_range(start, end)
+    if error_response is not None:
+        return error_response
+    if granularity not in GRANULARITIES:
+        return JSONResponse(status_code=404, content=f"Granularity should be one of {', '.join(GRANULARITIES)}")
+
+    metrics.REQUESTS.inc(endpoint="/aggregates", classe_mangeur=user.classe_mangeur)
+    result = app_tracker.get_aggregates(user_id, start, end, granularity)
+    with metrics.chrono("encode"):
+        return JSONResponse(status_code=200, content={'user_id': user_id, 'granularity': granularity, **result})
+
+
+# curl -G http://localhost:8000/population -d "date=2024-07-18" -d "classe_mangeur=vegan"
+@app.get("/population")
+def population(
+        business_date: date = Query(alias="date"),
+        classe_mangeur: Optional[str] = None,
+        accept: Optional[str] = Header(None),
+) -> Response:
+    """Return the activity of every user (optionally of one eater class) at a date, in columns"""
+    media_type, error_response = negotiate(accept)
+    if error_response is not None:
+        return error_response
+
+    error = check_date(business_date)
+    if error is not None:
+        return JSONResponse(status_code=404, content=error)
+    if classe_mangeur is not None and classe_mangeur not in app_tracker.registry.vocab_classes:
+        return JSONResponse(status_code=404, content="Classe_mangeur Not found")
+
+    metrics.REQUESTS.inc(endpoint="/population", classe_mangeur=classe_mangeur or "all")
+    connexion_counts = app_tracker.get_population_connexion(business_date, classe_mangeur)
+    return columnar_response(connexion_counts, media_type, {"Vary": "Accept"})
+
+
+def check_live_filters(user_ids: Optional[List[int]], classes_mangeurs: Optional[List[str]]) -> Optional[str]:
+    """Return the error message if a user or eater class to follow does not exist"""
+    for user_id in user_ids or ():
+        if user_id not in app_tracker.registry:
+            return "User Not found"
+    for classe_mangeur in classes_mangeurs or ():
+        if classe_mangeur not in app_tracker.registry.vocab_classes:
+            return "Classe_mangeur Not found"
+    return None
+
+
+# curl -N -G http://localhost:8000/live -d "user_id=4" -d "classe_mangeur=vegan"
+@app.get("/live")
+async def live(
+        user_id: Optional[List[int]] = Query(None),
+        classe_mangeur: Optional[List[str]] = Query(None),
+):
+    """Stream today's meals as they happen as Server-Sent Events, for some users or eater classes (all by default)"""
+    error = check_live_filters(user_id, classe_mangeur)
+    if error is not None:
+        return JSONResponse(status_code=404, content=error)
+
+    metrics.REQUESTS.inc(endpoint="/live", classe_mangeur="all")
+    subscription = live_feed.subscribe(user_id, classe_mangeur)
+
+    async def events():
+        try:
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.get(), LIVE_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"event: meal\ndata: {json.dumps(event)}\n\n"
+        finally:
+            # Also reached when the client disconnects
+            live_feed.unsubscribe(subscription)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+
+@app.websocket("/live/ws")
+async def live_websocket(
+        websocket: WebSocket,
+        user_id: Optional[List[int]] = Query(None),
+        classe_mangeur: Optional[List[str]] = Query(None),
+):
+    """Push today's meals as they happen, one JSON message per meal, for some users or eater classes"""
+    error = check_live_filters(user_id, classe_mangeur)
+    if error is not None:
+        await websocket.close(code=1008, reason=error)
+        return
+
+    await websocket.accept()
+    metrics.REQUESTS.inc(endpoint="/live/ws", classe_mangeur="all")
+    subscription = live_feed.subscribe(user_id, classe_mangeur)
+    # The socket is read while waiting for events, so a client that leaves a quiet feed is unsubscribed at once
+    reception = asyncio.ensure_future(websocket.receive())
+    prochain = asyncio.ensure_future(subscription.get())
+    try:
+        while True:
+            done, _ = await asyncio.wait({reception, prochain}, return_when=asyncio.FIRST_COMPLETED)
+            if reception in done:
+                if reception.result()["type"] == "websocket.disconnect":
+                    break
+                # Messages from the client are ignored
+                reception = asyncio.ensure_future(websocket.receive())
+            if prochain in done:
+                await websocket.send_json(prochain.result())
+                prochain = asyncio.ensure_future(subscription.get())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        reception.cancel()
+        prochain.cancel()
+        live_feed.unsubscribe(subscription)
+
+
+# curl http://localhost:8000/metrics
+@app.get("/metrics")
+def metrics_endpoint() -> PlainTextResponse:
+    """Expose stage latencies, request counts and cache counters in the Prometheus text format"""
+    return PlainTextResponse(metrics.exposition(app_tracker.cache.stats()), media_type="text/plain; version=0.0.4")
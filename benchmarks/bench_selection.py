@@ -0,0 +1,104 @@
+"""
+Micro-benchmark of the food selection of one meal: `User.selectionner_aliments`
+against the previous implementation, which filtered `probabilites_df` with
+pandas for every sort key of the over-budget trimming loop and drew each
+food with `RandomState.choice`. Since simulation version daily-3 foods are
+drawn from per-type ranges of the catalog (`fake_data.sampling`): the chosen
+types are the same, the foods follow the same distribution but are other
+draws, so only the types are compared. The trimming of over-budget meals
+is checked against the previous one by tests/test_selection.py.
+
+    python benchmarks/bench_selection.py [--meals 2000]
+
+Run from the project root, where the Excel files are.
+"""
+import argparse
+import os
+import sys
+import time
+from datetime import date
+
+import numpy as np
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from fake_data.catalog import get_catalog  # noqa: E402
+from fake_data.sensor import create_user_instance  # noqa: E402
+
+
+def probabilite_aliment_reference(user, type_aliment, repas):
+    repas_col_avg = f'Meal_{repas}_avg'
+    return user.probabilites_df[user.probabilites_df['Types'] == type_aliment][repas_col_avg].values[0]
+
+
+def choisir_types_reference(user, repas, np_rng):
+    types = user.probabilites_df['Types']
+    probabilites = np_rng.normal(user.probabilites_df[f'Meal_{repas}_avg'], user.probabilites_df[f'Meal_{repas}_std'])
+    probabilites = np.clip(probabilites, 0, None)
+    total_probabilite = np.sum(probabilites)
+    if total_probabilite > 0:
+        probabilites = probabilites / total_probabilite
+    return np_rng.choice(types, size=len(types), p=probabilites)
+
+
+def selectionner_reference(user, catalog, types_choisis, repas, min_calories, max_calories, rng, np_rng):
+    """The selection before the per-meal lookup tables"""
+    min_calories *= user.facteur_calories
+    max_calories *= user.facteur_calories
+    total_calories = 0
+    aliments_selectionnes = []
+    exceed_max_calories = rng.random() < 0.2
+    for type_aliment in types_choisis:
+        positions = catalog.positions_du_type(type_aliment)
+        aliment_choisi = catalog.aliment(positions[np_rng.choice(len(positions), size=1, replace=False)[0]])
+        aliment_choisi['Repas'] = repas
+        quantite = user.determiner_quantite(type_aliment, rng)
+        aliment_choisi['Quantite'] = quantite
+        if quantite >= 10:
+            exceed_max_calories = 1
+        total_calories += aliment_choisi['Valeur calorique'] * quantite
+        aliments_selectionnes.append(aliment_choisi)
+        if total_calories >= min_calories and (exceed_max_calories or total_calories <= max_calories):
+            break
+    if not exceed_max_calories and total_calories > max_calories:
+        while total_calories > max_calories:
+            aliments_selectionnes.sort(key=lambda x: probabilite_aliment_reference(user, x['Type'], x['Repas']))
+            aliment_a_retirer = aliments_selectionnes.pop(0)
+            total_calories -= aliment_a_retirer['Valeur calorique'] * aliment_a_retirer['Quantite']
+    return aliments_selectionnes
+
+
+def meal(user, catalog, repas, seed, reference):
+    rng, np_rng = user.generateurs(user.user_id, date(2024, 1, 1), seed)
+    min_calories, max_calories = user.intervalles_calories[repas]
+    if reference:
+        types = choisir_types_reference(user, repas, np_rng)
+        return types, selectionner_reference(user, catalog, types, repas, min_calories, max_calories, rng, np_rng)
+    types = user.choisir_types_aliments(repas, np_rng)
+    return types, user.selectionner_aliments(catalog, types, repas, min_calories, max_calories, rng, np_rng)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--meals", type=int, default=2000, help="Meals per eater class and implementation")
+    args = parser.parse_args()
+
+    catalog = get_catalog()
+    for classe_mangeur in ['standard', 'meat_lover', 'vegetarian', 'vegan', 'fasting', 'random']:
+        user = create_user_instance({'nom': 'Bench', 'prenom': 'Bench', 'age': 30, 'sexe': 'f',
+                                     'user_id': 1, 'classe_mangeur': classe_mangeur})
+        meals = list(user.heures_repas)
+        jobs = [(meals[seed % len(meals)], seed) for seed in range(args.meals)]
+        timings = {}
+        results = {}
+        for reference in (True, False):
+            t = time.perf_counter()
+            results[reference] = [meal(user, catalog, repas, seed, reference) for repas, seed in jobs]
+            timings[reference] = (time.perf_counter() - t) / len(jobs)
+        same_types = all((avant[0] == apres[0]).all() for avant, apres in zip(results[True], results[False]))
+        print(f"{classe_mangeur:<11} before {timings[True] * 1e6:8.1f} us/meal   after {timings[False] * 1e6:8.1f} us/meal"
+              f"   x{timings[True] / timings[False]:5.1f}   same_types={same_types}")
+
+
+if __name__ == "__main__":
+    main()
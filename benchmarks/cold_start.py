@@ -0,0 +1,72 @@
+"""
+Cold-start budget of the API: time from launching `uvicorn app:app` to the
+first successful response.
+
+    python benchmarks/cold_start.py [--budget 2.0] [--runs 3]
+
+The exit status is 1 when the median cold start exceeds the budget (in
+seconds). Compiled tables are built first (`python -m fake_data.assets`), as
+in a deployed image. Run from the project root, where the Excel files are.
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def port_libre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def cold_start(timeout: float = 60.0) -> float:
+    """
+    Start uvicorn in a new process and wait for a first 200 from `/`
+    """
+    port = port_libre()
+    url = f"http://127.0.0.1:{port}/?user_id=4&year=2024&month=7&day=18"
+    debut = time.perf_counter()
+    process = subprocess.Popen([sys.executable, "-m", "uvicorn", "app:app", "--port", str(port), "--log-level", "warning"],
+                               cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while time.perf_counter() - debut < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f"uvicorn exited with status {process.returncode}")
+            try:
+                with urllib.request.urlopen(url, timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - debut
+            except OSError:
+                time.sleep(0.01)
+        raise TimeoutError(f"No response from uvicorn after {timeout} s")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--budget", type=float, default=2.0, help="Maximum median cold start, in seconds")
+    parser.add_argument("--runs", type=int, default=3, help="Number of cold starts")
+    args = parser.parse_args(argv)
+
+    subprocess.run([sys.executable, "-c", "from fake_data.assets import build; build()"], cwd=ROOT, check=True,
+                   stdout=subprocess.DEVNULL)
+    durees = [cold_start() for _ in range(args.runs)]
+    median = statistics.median(durees)
+    print(f"cold start: median {median:.3f} s, runs {', '.join(f'{d:.3f}' for d in durees)} (budget {args.budget} s)")
+    if median > args.budget:
+        print(f"Cold start over budget: {median:.3f} s > {args.budget} s", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
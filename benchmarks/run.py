@@ -0,0 +1,331 @@
+"""
+Benchmark suite of the simulation and API hot paths.
+
+    python benchmarks/run.py                                   # run and print
+    python benchmarks/run.py --save benchmarks/baseline.json   # store a JSON baseline
+    python benchmarks/run.py --compare benchmarks/baseline.json --threshold 0.25
+
+With --compare, the exit status is 1 when the median time of a benchmark
+grows by more than the threshold (0.25 = 25% slower) against the baseline.
+Run from the project root, where the Excel files are.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import date, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+# Name -> function taking the shared context and returning the callable to time
+BENCHMARKS = {}
+
+CLASSES_MANGEURS = ['standard', 'meat_lover', 'vegetarian', 'vegan', 'fasting', 'random']
+DATES = [date(2024, 1, 1) + timedelta(days=37 * k) for k in range(8)]
+
+
+def benchmark(name: str, number: int = 1, repeat: int = 5):
+    """
+    Register a benchmark: `number` calls per round, `repeat` rounds
+    """
+    def register(setup):
+        BENCHMARKS[name] = (setup, number, repeat)
+        return setup
+    return register
+
+
+@contextlib.contextmanager
+def silence():
+    # The package prints a lot, it would dominate the timings
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+class Context:
+    """
+    Objects shared by the benchmarks, created on first use
+    """
+
+    def __init__(self):
+        self._app_tracker = None
+        self._client = None
+
+    @property
+    def app_tracker(self):
+        if self._app_tracker is None:
+            from fake_data import create_app
+            with silence():
+                self._app_tracker = create_app()
+        return self._app_tracker
+
+    @property
+    def client(self):
+        if self._client is None:
+            from fastapi.testclient import TestClient
+            with silence():
+                import app
+            self._client = TestClient(app.app)
+        return self._client
+
+    def user_id(self, classe_mangeur: str) -> int:
+        return int(self.app_tracker.registry.user_ids_de_classe(classe_mangeur)[0])
+
+
+@benchmark("startup.import_and_create_app", repeat=3)
+def bench_cold_start(ctx):
+    code = "from fake_data import create_app; create_app()"
+    return lambda: subprocess.run([sys.executable, "-c", code], cwd=ROOT, check=True,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+@benchmark("startup.create_app", number=5)
+def bench_create_app(ctx):
+    from fake_data import create_app
+
+    def run():
+        with silence():
+            create_app()
+    return run
+
+
+def bench_daily_activity(classe_mangeur):
+    def setup(ctx):
+        user_id = ctx.user_id(classe_mangeur)
+        user = ctx.app_tracker.get_user(user_id)
+        catalog = ctx.app_tracker.catalog
+
+        def run():
+            for business_date in DATES:
+                user.get_daily_activity(user_id, business_date, catalog)
+        return run
+    return setup
+
+
+for _classe_mangeur in CLASSES_MANGEURS:
+    benchmark(f"daily_activity.{_classe_mangeur}")(bench_daily_activity(_classe_mangeur))
+
+
+@benchmark("tracker.get_all_connexion")
+def bench_get_all_connexion(ctx):
+    app_tracker = ctx.app_tracker
+
+    def run():
+        app_tracker.cache.clear()
+        for business_date in DATES:
+            app_tracker.get_all_connexion(5, business_date)
+    return run
+
+
+@benchmark("tracker.get_all_connexion.cached", number=100)
+def bench_get_all_connexion_cached(ctx):
+    app_tracker = ctx.app_tracker
+    app_tracker.get_all_connexion(5, DATES[0])
+    return lambda: app_tracker.get_all_connexion(5, DATES[0])
+
+
+@benchmark("tracker.get_connexion")
+def bench_get_connexion(ctx):
+    app_tracker = ctx.app_tracker
+
+    def run():
+        app_tracker.cache.clear()
+        with silence():
+            for business_date in DATES:
+                app_tracker.get_connexion(2, business_date, 5)
+    return run
+
+
+@benchmark("api.root", number=5)
+def bench_api_root(ctx):
+    client = ctx.client
+    app_tracker = ctx.app_tracker
+
+    def run():
+        app_tracker.cache.clear()
+        with silence():
+            response = client.get("/?user_id=5&year=2024&month=7&day=18")
+        assert response.status_code == 200
+    return run
+
+
+@benchmark("api.root.meal", number=5)
+def bench_api_root_meal(ctx):
+    client = ctx.client
+    app_tracker = ctx.app_tracker
+
+    def run():
+        app_tracker.cache.clear()
+        with silence():
+            response = client.get("/?user_id=5&year=2024&month=7&day=18&meal_id=2")
+        assert response.status_code == 200
+    return run
+
+
+# Scattered lookups of the downstream services: a day or a meal of several users at several dates
+LOOKUPS = [{'user_id': 1 + k % 20, 'date': (date(2024, 1, 1) + timedelta(days=7 * k)).isoformat(),
+            **({'meal_id': 1} if k % 2 else {})} for k in range(40)]
+
+
+@benchmark("api.root.sequential_40", repeat=3)
+def bench_api_root_sequential(ctx):
+    client = ctx.client
+    import app
+    app_tracker = app.app_tracker  # The tracker behind the client, whose cache is cleared
+
+    def run():
+        app_tracker.cache.clear()
+        with silence():
+            for lookup in LOOKUPS:
+                year, month, day = lookup['date'].split("-")
+                params = {'user_id': lookup['user_id'], 'year': year, 'month': month, 'day': day}
+                params.update({'meal_id': lookup['meal_id']} if 'meal_id' in lookup else {})
+                assert client.get("/", params=params).status_code == 200
+    return run
+
+
+@benchmark("api.batch_40", repeat=3)
+def bench_api_batch(ctx):
+    client = ctx.client
+    import app
+    app_tracker = app.app_tracker
+
+    def run():
+        app_tracker.cache.clear()
+        with silence():
+            response = client.post("/batch", json=LOOKUPS)
+        assert response.status_code == 200
+    return run
+
+
+@benchmark("bulk.range_one_user_90_days", repeat=3)
+def bench_range(ctx):
+    app_tracker = ctx.app_tracker
+
+    def run():
+        app_tracker.cache.clear()
+        for _ in app_tracker.iter_connexion_range(5, date(2024, 1, 1), date(2024, 3, 30)):
+            pass
+    return run
+
+
+@benchmark("bulk.all_users_7_days", repeat=3)
+def bench_all_users(ctx):
+    app_tracker = ctx.app_tracker
+    user_ids = app_tracker.registry.user_ids.tolist()
+
+    def run():
+        app_tracker.cache.clear()
+        for user_id in user_ids:
+            for k in range(7):
+                app_tracker.get_all_connexion(user_id, date(2024, 7, 1) + timedelta(days=k))
+    return run
+
+
+@benchmark("bulk.simulate_batch_all_users_365_days", repeat=3)
+def bench_simulate_batch(ctx):
+    app_tracker = ctx.app_tracker
+    user_ids = app_tracker.registry.user_ids
+    jours = [date(2024, 1, 1) + timedelta(days=k) for k in range(365)]
+    pairs_users = [user_id for user_id in user_ids.tolist() for _ in jours]
+    pairs_dates = jours * len(user_ids)
+    return lambda: app_tracker.simulate_batch(pairs_users, pairs_dates)
+
+
+def run_benchmarks(pattern: str = None) -> dict:
+    """
+    Run the benchmarks whose name contains `pattern`, all of them if None.
+
+    Returns:
+        dict: Per benchmark, the min, median and mean time of one call in seconds.
+    """
+    ctx = Context()
+    results = {}
+    for name, (setup, number, repeat) in BENCHMARKS.items():
+        if pattern is not None and pattern not in name:
+            continue
+        fonction = setup(ctx)
+        fonction()  # Warm-up: lazy loading is not what is measured
+        temps = []
+        for _ in range(repeat):
+            t = time.perf_counter()
+            for _ in range(number):
+                fonction()
+            temps.append((time.perf_counter() - t) / number)
+        results[name] = {
+            'min': min(temps),
+            'median': statistics.median(temps),
+            'mean': statistics.fmean(temps),
+            'number': number,
+            'repeat': repeat,
+        }
+        print(f"{name:<45} median {results[name]['median'] * 1e3:10.2f} ms   min {results[name]['min'] * 1e3:10.2f} ms",
+              file=sys.stderr)
+    return results
+
+
+def compare(results: dict, baseline: dict, threshold: float) -> list:
+    """
+    Get the benchmarks slower than the baseline by more than `threshold`.
+
+    Returns:
+        list of tuple: (name, baseline median, new median, ratio)
+    """
+    regressions = []
+    for name, result in results.items():
+        reference = baseline['benchmarks'].get(name)
+        if reference is None:
+            continue
+        ratio = result['median'] / reference['median']
+        print(f"{name:<45} {reference['median'] * 1e3:10.2f} ms -> {result['median'] * 1e3:10.2f} ms   x{ratio:.2f}",
+              file=sys.stderr)
+        if ratio > 1 + threshold:
+            regressions.append((name, reference['median'], result['median'], ratio))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--filter", default=None, help="Only run benchmarks whose name contains this")
+    parser.add_argument("--save", default=None, help="Write the results to this JSON file")
+    parser.add_argument("--compare", default=None, help="JSON baseline to compare the results to")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed slowdown, 0.25 = 25%%")
+    parser.add_argument("--list", action="store_true", help="List the benchmarks")
+    args = parser.parse_args(argv)
+
+    if args.list:
+        print("\n".join(BENCHMARKS))
+        return 0
+
+    os.chdir(ROOT)
+    results = run_benchmarks(args.filter)
+
+    if args.save:
+        with open(args.save, "w", encoding="utf-8") as f:
+            json.dump({
+                'python': platform.python_version(),
+                'machine': platform.platform(),
+                'cpu_count': os.cpu_count(),
+                'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+                'benchmarks': results,
+            }, f, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.threshold)
+        for name, avant, apres, ratio in regressions:
+            print(f"REGRESSION {name}: {avant * 1e3:.2f} ms -> {apres * 1e3:.2f} ms (x{ratio:.2f})", file=sys.stderr)
+        if regressions:
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
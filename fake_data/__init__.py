@@ -1,42 +1,48 @@
+import logging
 import sys
 import os
-import openpyxl
+import time
 
 # Add project root directory to sys.path
 project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '../../../..'))
-print(f"Adding {project_root} to sys.path")
 sys.path.append(project_root)
 
-print(f"sys.path: {sys.path}")
-
-# Check directory content to ensure all modules are present
-for root, dirs, files in os.walk(os.path.abspath(os.path.dirname(__file__))):
-    print(root, dirs, files)
-
 try:
     from data_engineering.sensor_api.fake_data.app_tracker import AppTracker
+    from data_engineering.sensor_api.fake_data.assets import read_columns
+    from data_engineering.sensor_api.fake_data.cache import ActivityCache
+    from data_engineering.sensor_api.fake_data.population import generer_population
+    from data_engineering.sensor_api.fake_data.sensor import get_profile
 except ImportError:
     from .app_tracker import AppTracker
+    from .assets import read_columns
+    from .cache import ActivityCache
+    from .population import generer_population
+    from .sensor import get_profile
 
 from datetime import date
-import pandas as pd
+
+logger = logging.getLogger(__name__)
+
 
 def create_users_from_excel(file_path: str) -> list:
     """
-    Create user instances from an Excel file
+    Create user instances from an Excel file, read through its compiled form
     """
-    user_data = pd.read_excel(file_path)
-    print(f"User data loaded from {file_path}:\n{user_data.head()}")  # Display first few rows of the Excel file
+    user_data = read_columns(file_path)
+    logger.debug("User data loaded from %s: %d rows", file_path, len(user_data['user_id']))
     users = []
 
-    for _, row in user_data.iterrows():
+    for nom, prenom, age, sexe, user_id, classe in zip(
+            user_data['l_name'].tolist(), user_data['f_name'].tolist(), user_data['age'].tolist(),
+            user_data['sexe'].tolist(), user_data['user_id'].tolist(), user_data['classe'].tolist()):
         users.append({
-            'nom': row['l_name'],
-            'prenom': row['f_name'],
-            'age': row['age'],
-            'sexe': row['sexe'],
-            'user_id': row['user_id'],
-            'classe_mangeur': row['classe']
+            'nom': nom,
+            'prenom': prenom,
+            'age': age,
+            'sexe': sexe,
+            'user_id': user_id,
+            'classe_mangeur': classe
         })
 
     return users
@@ -52,11 +58,48 @@ def create_app() -> AppTracker:
         current_dir = os.path.dirname(os.path.abspath(__file__))
         file_path = os.path.join(current_dir, "user_table.XLSX")
 
-    users = create_users_from_excel(file_path)
-    print(f"Users created: {users}")  # Verify the list of users
-    app_tracker = AppTracker(users)
+    timings = {}
+    debut = time.perf_counter()
+
+    # SENSOR_API_POPULATION=N replaces the Excel users by N generated ones, for load tests
+    population = os.environ.get("SENSOR_API_POPULATION")
+    if population:
+        users = generer_population(int(population), seed=int(os.environ.get("SENSOR_API_POPULATION_SEED", 0)))
+        logger.debug("Users generated: %d", len(users))
+    else:
+        users = create_users_from_excel(file_path)
+        logger.debug("Users created: %d", len(users))
+    timings['users'] = time.perf_counter() - debut
+
+    # Days evicted from memory are kept on disk when SENSOR_API_SPILL_DIR is set
+    cache = ActivityCache(spill_dir=os.environ.get("SENSOR_API_SPILL_DIR"))
+    # Days materialized by `python -m fake_data.store` are served from SENSOR_API_STORE_DIR
+    store_dir = os.environ.get("SENSOR_API_STORE_DIR")
+    store = None
+    if store_dir:
+        try:
+            from data_engineering.sensor_api.fake_data.store import META_FILE, ActivityStore
+        except ImportError:
+            from .store import META_FILE, ActivityStore
+        if os.path.exists(os.path.join(store_dir, META_FILE)):
+            store = ActivityStore(store_dir)
+    app_tracker = AppTracker(users, cache=cache, store=store)
+
+    # Parse the food table once at startup rather than on the first request
+    etape = time.perf_counter()
+    logger.debug("Food catalog loaded: %s", app_tracker.catalog)
+    timings['catalog'] = time.perf_counter() - etape
+
+    # Same for the probability table of each eater class, so no first request of a class reads a workbook
+    etape = time.perf_counter()
+    for classe_mangeur in app_tracker.registry.vocab_classes:
+        get_profile(classe_mangeur).charger()
+    timings['profiles'] = time.perf_counter() - etape
+
+    app_tracker.startup_timings = timings
     return app_tracker
 
+
 if __name__ == "__main__":
     # Test code
     print("Running test for create_app function...")
@@ -0,0 +1,119 @@
+from datetime import date, timedelta
+
+import numpy as np
+
+try:
+    from data_engineering.sensor_api.fake_data.catalog import FoodCatalog
+except ImportError:
+    from .catalog import FoodCatalog
+
+GRANULARITIES = ('meal', 'day', 'week')
+
+# Meal ids are packed with the day in the key of a meal period
+_MEALS_PER_DAY = 16
+
+
+def rollup(connexion_day: dict, catalog: FoodCatalog) -> dict:
+    """
+    Sum the calories of a simulated day per meal and food type.
+
+    Calories of a row are the `Valeur calorique` of its food times its
+    quantity, looked up for every row at once in the catalog.
+
+    Args:
+        connexion_day (dict): The traffic of a user at a date, as returned by `AppTracker.get_all_connexion`.
+        catalog (FoodCatalog): The food catalog.
+
+    Returns:
+        dict: One row per (meal, food type) eaten: `meal_id`, `heure_repas`, `type` (None for
+            foods without a type) and `calories`, as lists.
+    """
+    meal_ids = np.asarray(connexion_day.get('meal_id', []), dtype=np.int64)
+    if len(meal_ids) == 0:
+        return {'meal_id': [], 'heure_repas': [], 'type': [], 'calories': []}
+    positions = catalog.positions(connexion_day['aliment_id'])
+    calories = catalog.calories[positions] * np.asarray(connexion_day['quantity'], dtype=np.float64)
+
+    # Group rows by meal then type, 0 standing for foods without a type
+    n_types = len(catalog.types_aliments) + 1
+    meals, premieres, meal_rows = np.unique(meal_ids, return_index=True, return_inverse=True)
+    groupes, rows = np.unique(meal_rows * n_types + catalog.type_codes[positions] + 1, return_inverse=True)
+    sommes = np.bincount(rows, weights=calories, minlength=len(groupes))
+
+    heures = [connexion_day['heure_repas'][i] for i in premieres.tolist()]
+    types = [None] + catalog.types_aliments
+    return {
+        'meal_id': meals[groupes // n_types].tolist(),
+        'heure_repas': [heures[meal] for meal in (groupes // n_types).tolist()],
+        'type': [types[code] for code in (groupes % n_types).tolist()],
+        'calories': sommes.tolist(),
+    }
+
+
+def debut_periode(business_date: date, granularity: str) -> date:
+    """
+    Get the first day of the period of a date: the date itself, or the Monday of its week
+    """
+    if granularity == 'week':
+        return business_date - timedelta(days=business_date.weekday())
+    return business_date
+
+
+def aggregate(rollups: list, start: date, end: date, granularity: str) -> dict:
+    """
+    Sum daily rollups per meal, day or week.
+
+    Days and weeks of the range without any meal are returned with 0
+    calories; a week cut by the range only sums its days in the range.
+
+    Args:
+        rollups (list of tuple): (date, rollup) of every day of the range.
+        start (date): First day of the range.
+        end (date): Last day of the range.
+        granularity (str): "meal", "day" or "week".
+
+    Returns:
+        dict: Columns `date` (first day of the period), `meal_id` and `heure_repas` for meals,
+            `calories` and `calories_par_type` (one column per food type eaten).
+    """
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularity should be one of {', '.join(GRANULARITIES)}")
+
+    ordinals, meal_ids, heures, types, calories = [], [], [], [], []
+    for business_date, day in rollups:
+        ordinals.extend([debut_periode(business_date, granularity).toordinal()] * len(day['meal_id']))
+        meal_ids.extend(day['meal_id'])
+        heures.extend(day['heure_repas'])
+        types.extend(day['type'])
+        calories.extend(day['calories'])
+    ordinals = np.array(ordinals, dtype=np.int64)
+    calories = np.array(calories, dtype=np.float64)
+
+    if granularity == 'meal':
+        cles = ordinals * _MEALS_PER_DAY + np.array(meal_ids, dtype=np.int64)
+        periodes, premieres, rows = np.unique(cles, return_index=True, return_inverse=True)
+    else:
+        # Every period of the range, with or without meals
+        debuts = sorted({debut_periode(start + timedelta(days=k), granularity).toordinal()
+                         for k in range((end - start).days + 1)})
+        periodes = np.array(debuts, dtype=np.int64)
+        rows = np.searchsorted(periodes, ordinals)
+
+    totaux = np.bincount(rows, weights=calories, minlength=len(periodes))
+    vocab_types = sorted({type_aliment for type_aliment in types if type_aliment is not None})
+    codes = np.array([vocab_types.index(t) if t is not None else -1 for t in types], dtype=np.int64)
+    avec_type = codes >= 0
+    par_type = np.bincount(rows[avec_type] * len(vocab_types) + codes[avec_type], weights=calories[avec_type],
+                           minlength=len(periodes) * len(vocab_types)).reshape(len(periodes), len(vocab_types))
+
+    result = {}
+    if granularity == 'meal':
+        result['date'] = [date.fromordinal(int(cle // _MEALS_PER_DAY)).isoformat() for cle in periodes.tolist()]
+        result['meal_id'] = (periodes % _MEALS_PER_DAY).tolist()
+        result['heure_repas'] = [heures[i] for i in premieres.tolist()]
+    else:
+        result['date'] = [date.fromordinal(ordinal).isoformat() for ordinal in periodes.tolist()]
+    result['calories'] = np.round(totaux, 2).tolist()
+    result['calories_par_type'] = {type_aliment: np.round(par_type[:, code], 2).tolist()
+                                   for code, type_aliment in enumerate(vocab_types)}
+    return result
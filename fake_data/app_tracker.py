@@ -1,19 +1,35 @@
-from typing import Tuple, Any
+from typing import TYPE_CHECKING, Tuple, Any, Iterator, Optional
 
-import pandas as pd
 import numpy as np
-from datetime import date, datetime
-
-import openpyxl
+from datetime import date, datetime, timedelta
 
 
 try:
-    from data_engineering.sensor_api.fake_data.sensor import create_user_instance
+    from data_engineering.sensor_api.fake_data.registry import UserRegistry
+    from data_engineering.sensor_api.fake_data.sensor import SIMULATION_VERSION, get_profile
+    from data_engineering.sensor_api.fake_data.cache import ActivityCache
+    from data_engineering.sensor_api.fake_data.catalog import FOOD_FILE, FoodCatalog, get_catalog
+    from data_engineering.sensor_api.fake_data import workers
+    from data_engineering.sensor_api.fake_data.engine import BatchEngine
+    from data_engineering.sensor_api.fake_data.metrics import chrono
+    from data_engineering.sensor_api.fake_data import aggregates
 except ImportError:
-    from .sensor import create_user_instance
+    from .registry import UserRegistry
+    from .sensor import SIMULATION_VERSION, get_profile
+    from .cache import ActivityCache
+    from .catalog import FOOD_FILE, FoodCatalog, get_catalog
+    from . import workers
+    from .engine import BatchEngine
+    from .metrics import chrono
+    from . import aggregates
+
+if TYPE_CHECKING:
+    from .store import ActivityStore
 
 import sys
 import os
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
 
 # Add the parent directory of 'data_engineering' to PYTHONPATH
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '.')))
@@ -21,69 +37,355 @@ current_dir = os.path.abspath(os.path.dirname(__file__))
 
 
 class AppTracker:
-    def __init__(self, user_data: list) -> None:
+    def __init__(self, user_data, food_file: str = FOOD_FILE, max_workers: Optional[int] = None,
+                 cache: Optional[ActivityCache] = None, store: Optional["ActivityStore"] = None) -> None:
         """
-        Initialize the AppTracker with user data
+        Initialize the AppTracker with user data: a list of user dictionaries, or a UserRegistry
+        such as a generated population. Days materialized in `store` are read from it instead
+        of being simulated.
         """
-        # _users for internal attribute in AppTracker class to avoid conflict with users property
-        self._users = [create_user_instance(user) for user in user_data]
+        # Users are stored in columns, User objects are only created when a user is looked up
+        if isinstance(user_data, UserRegistry):
+            self.registry = user_data
+        else:
+            self.registry = UserRegistry.from_records(user_data)
+        self.food_file = food_file
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self._pool = None
+        self._engine = None
+        # Simulated days never change, they are memoized
+        self.cache = cache if cache is not None else ActivityCache()
+        self.store = store
+        # Durations of the startup stages, filled by create_app
+        self.startup_timings = {}
 
     @property
     def users(self):
         """
-        Getter for the users list
+        Getter for the users list, creating every User object: prefer `get_user` or `registry`
         """
-        return self._users
+        return [self.registry.get(user_id) for user_id in self.registry.user_ids.tolist()]
 
+    def get_user(self, user_id: int):
+        """
+        Return the user with this id, or None, in constant time
+        """
+        return self.registry.get(user_id)
 
-    def get_connexion(self, meal_id: int, business_date: date, user_id=int) -> dict:
-        """Return the traffic for one sensor at a date"""
-        food_processed = "food_processed.xlsx"
-        aliments_df = pd.read_excel(food_processed)
-        user = next((u for u in self.users if u.user_id == user_id), None)
-        connexion_day = dict()
-        connexion = None if user is None else user.get_daily_activity(user_id, business_date, aliments_df)
+    @property
+    def catalog(self) -> FoodCatalog:
+        """
+        Getter for the shared food catalog, reloaded only when the food file changes
+        """
+        return get_catalog(self.food_file)
+
+    @property
+    def pool(self) -> ProcessPoolExecutor:
+        """
+        Getter for the worker processes, started on first use with the users and catalog preloaded
+        """
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=workers.init_worker,
+                initargs=(self.registry, self.food_file),
+            )
+        return self._pool
 
-        print(f"User: {user}")
-        print(f"Connexion: {connexion}")
+    @property
+    def engine(self) -> BatchEngine:
+        """
+        Getter for the vectorized batch engine, rebuilt when the food catalog changes
+        """
+        catalog = self.catalog
+        if self._engine is None or self._engine.catalog is not catalog:
+            self._engine = BatchEngine(self.registry, catalog)
+        return self._engine
 
+    @property
+    def empreinte_donnees(self) -> str:
+        """
+        Getter for the fingerprint of everything the simulated rows are drawn from: the food catalog,
+        the workbook of each eater class and the users, so that editing any of them changes it
+        """
+        classes = "|".join(get_profile(classe_mangeur).empreinte for classe_mangeur in self.registry.vocab_classes)
+        key = f"{self.catalog.empreinte}|{classes}|{self.registry.empreinte}"
+        return hashlib.sha256(key.encode()).hexdigest()[:12]
+
+    @property
+    def simulation_version(self) -> str:
+        """
+        Getter for the version of the simulated data: simulation code and input data (`empreinte_donnees`)
+        """
+        return f"{SIMULATION_VERSION}-{self.empreinte_donnees}"
+
+    def etag(self, user_id: int, business_date: date, meal_id: Optional[int] = None,
+             media_type: Optional[str] = None) -> str:
+        """
+        Return a strong ETag for the traffic of a user at a date, computed without simulating it.
+        Each media type other than JSON (None) gets its own ETag.
+        """
+        key = f"{self.simulation_version}|{user_id}|{business_date}|{meal_id}"
+        if media_type is not None:
+            key += f"|{media_type}"
+        return '"' + hashlib.sha256(key.encode()).hexdigest()[:32] + '"'
+
+    def close(self) -> None:
+        """
+        Stop the worker processes
+        """
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def get_columns(self, user_id: int, business_date: date) -> Optional[dict]:
+        """
+        Return the materialized traffic of a user at a date as zero-copy NumPy columns,
+        or None if that day is not in the store
+        """
+        if self.store is None:
+            return None
+        columns = self.store.get(user_id, business_date, self.simulation_version)
+        if columns is None:
+            return None
+        return {'user_id': np.full(len(columns['meal_id']), user_id, dtype=np.int64), **columns}
+
+    @staticmethod
+    def _connexion_from_columns(columns: dict, rows=slice(None)) -> dict:
+        # Same lists as a simulated day
+        heures = np.datetime_as_string(columns['heure_repas'][rows], unit='s')
+        return {
+            'user_id': columns['user_id'][rows].tolist(),
+            'meal_id': columns['meal_id'][rows].tolist(),
+            'heure_repas': [heure.replace('T', ' ') for heure in heures.tolist()],
+            'aliment_id': columns['aliment_id'][rows].tolist(),
+            'quantity': columns['quantity'][rows].tolist(),
+        }
+
+    def get_connexion(self, meal_id: int, business_date: date, user_id=int) -> dict:
+        """Return the traffic for one sensor at a date"""
         # Convert business_date to date object if it's a string
         if isinstance(business_date, str):
             business_date = datetime.strptime(business_date, '%Y-%m-%d').date()
+        user = self.get_user(user_id)
+        if user is None:
+            return dict()
 
-        if connexion:
-            for i in range(len(connexion['meal_id'])):
-                heure_repas_date = datetime.strptime(connexion['heure_repas'][i], '%Y-%m-%d %H:%M:%S').date()
-                #print(
-                #    f"Checking entry {i}: meal_id={connexion['meal_id'][i]}, "
-                #    f"heure_repas_date={heure_repas_date} de type {type(heure_repas_date)}, "
-                #    f"user_id={connexion['user_id'][i]}, business date = {business_date} de type {type(business_date)}")
-
-                condition_meal_id = (connexion['meal_id'][i] == meal_id)
-                condition_date = (heure_repas_date == business_date)
-                condition_user_id = (connexion['user_id'][i] == user_id)
-
-                #print(f"Condition meal_id: {condition_meal_id}")
-                #print(f"Condition date: {condition_date}")
-                #print(f"Condition user_id: {condition_user_id}")
+        columns = self.get_columns(user_id, business_date)
+        if columns is not None:
+            with chrono("filter"):
+                # Like simulated days, meals that spill over the next day are left out
+                jour = columns['heure_repas'].astype('datetime64[D]') == np.datetime64(business_date, 'D')
+                rows = np.flatnonzero((columns['meal_id'] == meal_id) & jour)
+                return self._connexion_from_columns(columns, rows) if len(rows) else dict()
 
-                if condition_meal_id and condition_date and condition_user_id:
-                    for key in connexion.keys():
-                        if key not in connexion_day:
-                            connexion_day[key] = []
-                        connexion_day[key].append(connexion[key][i])
+        # Meals have independent random streams: only the requested one is simulated
+        key = (user_id, business_date, f"{self.simulation_version}-repas{meal_id}")
+        connexion = self.cache.get(key)
+        if connexion is None:
+            connexion = user.get_daily_activity(user_id, business_date, self.catalog, meal_id)
+            self.cache.put(key, connexion)
 
-        #print(f"Filtered connexion_day: {connexion_day}")
+        return self._repas_du_jour(connexion, meal_id, business_date)
 
-        return connexion_day
+    @staticmethod
+    def _repas_du_jour(connexion: dict, meal_id: int, business_date: date) -> dict:
+        # Keep the meals of that day, comparing the date prefix instead of parsing every time
+        jour = business_date.isoformat()
+        with chrono("filter"):
+            rows = [i for i, (repas, heure) in enumerate(zip(connexion['meal_id'], connexion['heure_repas']))
+                    if repas == meal_id and heure.startswith(jour)]
+            if not rows:
+                return dict()
+            return {key: [values[i] for i in rows] for key, values in connexion.items()}
 
     def get_all_connexion(self, user_id: int, business_date: date) -> dict:
         """Return the traffic for all sensors of the store at a date"""
-        food_processed = "food_processed.xlsx"
-        aliments_df = pd.read_excel(food_processed)
-        user = next((u for u in self.users if u.user_id == user_id), None)
-        connexion_day = None if user is None else user.get_daily_activity(user_id, business_date, aliments_df)
         # Convert business_date to date object if it's a string
         if isinstance(business_date, str):
             business_date = datetime.strptime(business_date, '%Y-%m-%d').date()
+        user = self.get_user(user_id)
+        if user is None:
+            return None
+
+        columns = self.get_columns(user_id, business_date)
+        if columns is not None:
+            return self._connexion_from_columns(columns)
+
+        key = (user_id, business_date, self.simulation_version)
+        connexion_day = self.cache.get(key)
+        if connexion_day is None:
+            connexion_day = user.get_daily_activity(user_id, business_date, self.catalog)
+            self.cache.put(key, connexion_day)
         return connexion_day
+
+    def get_batch(self, lookups: list) -> list:
+        """
+        Return the traffic of many (user_id, date, meal_id) lookups in a single pass.
+
+        Lookups are grouped by date, then user, so every user-day is read or
+        simulated once however many lookups ask for it. When the whole day is
+        asked for, the meals asked for the same user and day are taken from
+        it; otherwise each distinct meal is simulated alone, as
+        `get_connexion` does. Results are the same as one call per lookup.
+
+        The pass goes through the per-user simulation, not the vectorized
+        `BatchEngine`: the engine draws other values than `GET /` for the same
+        (user, date), and a lookup must answer what `GET /` answers (same
+        data, same ETag, same cache and store entries).
+
+        Args:
+            lookups (list of tuple): (user_id, date, meal_id or None) of known users.
+
+        Returns:
+            list of dict: The traffic of each lookup, in the order of `lookups`, as returned
+                by `get_all_connexion` (meal_id None) or `get_connexion`.
+        """
+        groupes = {}
+        for i, (user_id, business_date, meal_id) in enumerate(lookups):
+            groupes.setdefault((business_date, user_id), {}).setdefault(meal_id, []).append(i)
+
+        results = [None] * len(lookups)
+        for (business_date, user_id), par_repas in sorted(groupes.items()):
+            connexion_day = self.get_all_connexion(user_id, business_date) if None in par_repas else None
+            for meal_id, indices in par_repas.items():
+                if meal_id is None:
+                    result = connexion_day
+                elif connexion_day is not None:
+                    result = self._repas_du_jour(connexion_day, meal_id, business_date)
+                else:
+                    result = self.get_connexion(meal_id, business_date, user_id)
+                for i in indices:
+                    results[i] = result
+        return results
+
+    def get_rollup(self, user_id: int, business_date: date) -> dict:
+        """
+        Return the calories of a user's day per meal and food type, computed once per (user, day).
+
+        Only the rollup is cached, not the simulated day it comes from, so long
+        ranges do not fill the cache with raw days.
+
+        Returns:
+            dict: As returned by `aggregates.rollup`
+        """
+        key = (user_id, business_date, f"{self.simulation_version}-rollup")
+        day = self.cache.get(key)
+        if day is None:
+            columns = self.get_columns(user_id, business_date)
+            if columns is not None:
+                connexion_day = self._connexion_from_columns(columns)
+            else:
+                connexion_day = self.cache.get((user_id, business_date, self.simulation_version))
+                if connexion_day is None:
+                    connexion_day = self.get_user(user_id).get_daily_activity(user_id, business_date, self.catalog)
+            with chrono("aggregate"):
+                day = aggregates.rollup(connexion_day, self.catalog)
+            self.cache.put(key, day)
+        return day
+
+    def get_aggregates(self, user_id: int, start_date: date, end_date: date, granularity: str = "day") -> dict:
+        """
+        Return the calories of a user over a date range per meal, day or week, in total and per food type.
+
+        Args:
+            user_id (int): user id
+            start_date (date): First day of the range (included)
+            end_date (date): Last day of the range (included)
+            granularity (str): "meal", "day" or "week"
+
+        Returns:
+            dict: As returned by `aggregates.aggregate`
+        """
+        rollups = []
+        business_date = start_date
+        while business_date <= end_date:
+            rollups.append((business_date, self.get_rollup(user_id, business_date)))
+            business_date += timedelta(days=1)
+        with chrono("aggregate"):
+            return aggregates.aggregate(rollups, start_date, end_date, granularity)
+
+    def simulate_batch(self, user_ids, dates) -> dict:
+        """
+        Simulate many (user_id, date) pairs at once with the vectorized batch engine.
+
+        Much faster than simulating users one day at a time for bulk generation.
+        Each pair is deterministic, but the result differs from `get_all_connexion`.
+
+        Args:
+            user_ids: Sequence of user ids
+            dates: Sequence of dates paired with `user_ids`, or a single date for all of them
+
+        Returns:
+            dict: One NumPy array per column (user_id, meal_id, heure_repas, aliment_id, quantity)
+        """
+        return self.engine.simulate(user_ids, dates)
+
+    def iter_connexion_range(self, user_id: int, start_date: date, end_date: date,
+                             meal_id: Optional[int] = None) -> Iterator[Tuple[date, dict]]:
+        """
+        Lazily yield the traffic of a user for every day of a date range.
+
+        Days are simulated one at a time as the iterator is consumed, so memory
+        does not depend on the length of the range.
+
+        Args:
+            user_id (int): user id
+            start_date (date): First day of the range (included)
+            end_date (date): Last day of the range (included)
+            meal_id (int, optional): Only return this meal of each day
+
+        Yields:
+            tuple: The day and its traffic, as returned by `get_all_connexion` or `get_connexion`
+        """
+        business_date = start_date
+        while business_date <= end_date:
+            if meal_id is None:
+                yield business_date, self.get_all_connexion(user_id, business_date)
+            else:
+                yield business_date, self.get_connexion(meal_id, business_date, user_id)
+            business_date += timedelta(days=1)
+
+    def get_population_connexion(self, business_date: date, classe_mangeur: Optional[str] = None) -> dict:
+        """
+        Return the traffic of every user at a date, simulated in the worker processes.
+
+        Users are split into contiguous chunks, a few per worker, and the
+        chunk results are concatenated back in user order.
+
+        Args:
+            business_date (date): The day to simulate
+            classe_mangeur (str, optional): Only return users of this eater class
+
+        Returns:
+            dict: The traffic of all users, one list per column
+        """
+        user_ids = self.registry.user_ids_de_classe(classe_mangeur).tolist()
+        chunk_size = max(1, -(-len(user_ids) // (self.max_workers * 4)))
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+
+        connexion_day = {key: [] for key in workers.COLUMNS}
+        for result in self.pool.map(workers.simulate_users, chunks, [business_date] * len(chunks)):
+            for key in workers.COLUMNS:
+                connexion_day[key].extend(result[key])
+        return connexion_day
+
+    def get_connection_times(self, business_date: date) -> dict:
+        """
+        Return the connection time of every meal of every user at a date, drawn in the worker processes.
+
+        The times are those of `User.generer_heures_connexion`, so of the simulated days.
+
+        Args:
+            business_date (date): The day
+
+        Returns:
+            dict: `user_id`, `meal_id` and `heure_repas` (datetime64[s]) arrays, rows grouped by user
+        """
+        user_ids = self.registry.user_ids.tolist()
+        chunk_size = max(1, -(-len(user_ids) // (self.max_workers * 4)))
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+        results = list(self.pool.map(workers.connection_times, chunks, [business_date] * len(chunks)))
+        if not results:
+            results = [workers.connection_times([], business_date)]
+        return {key: np.concatenate([result[key] for result in results]) for key in results[0]}
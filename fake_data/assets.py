@@ -0,0 +1,387 @@
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import TYPE_CHECKING
+
+import numpy as np
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+try:
+    from data_engineering.sensor_api.fake_data.metrics import chrono
+except ImportError:
+    from .metrics import chrono
+
+# Directory of the compiled tables, relative to the working directory like the Excel files
+CACHE_DIR = os.environ.get("SENSOR_API_CACHE_DIR", ".asset_cache")
+
+# Directory where tables are published for every process of the host to map (a tmpfs such as /dev/shm),
+# None to keep them private to each process
+SHARED_DIR = os.environ.get("SENSOR_API_SHARED_DIR")
+
+# Every Excel input read by the application
+ASSET_FILES = [
+    "user_table.XLSX",
+    "food_processed.xlsx",
+    "standard_class.XLSX",
+    "meat_lover_class.XLSX",
+    "vegetarian_class.XLSX",
+    "vegan_class.XLSX",
+    "fasting_class.XLSX",
+    "random_eater_class.XLSX",
+]
+
+_META_KEY = "__meta__"
+_KIND_PREFIX = "__kind__"
+_NUMBER_PREFIX = "__number__"
+
+# Value kinds of the text columns (Excel columns may mix text and numbers)
+_NULL, _TEXT, _INT, _FLOAT = 0, 1, 2, 3
+
+_tables = {}
+_tables_lock = threading.Lock()
+# DataFrames built by `load_table`, with the columns they were built from
+_frames = {}
+
+
+def empreinte(file_path: str) -> str:
+    """
+    Get the SHA-256 of a file's content
+    """
+    return _sha256(file_path)
+
+
+def _sha256(file_path: str) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def compiled_path(file_path: str, cache_dir: str = CACHE_DIR) -> str:
+    """
+    Get the path of the compiled form of an Excel file
+    """
+    return os.path.join(cache_dir, os.path.basename(file_path) + ".npz")
+
+
+def compile_table(file_path: str, cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    """
+    Parse an Excel file and store it as a NumPy archive (.npz).
+
+    Numeric columns are stored as-is. Other columns are stored as a
+    fixed-width unicode array, plus a per-value kind code and a float array
+    for the cells that hold numbers, so the archive loads without pickle and
+    round-trips mixed columns exactly.
+
+    Args:
+        file_path (str): Path of the Excel file.
+        cache_dir (str): Directory of the compiled tables.
+
+    Returns:
+        pd.DataFrame: The parsed table.
+    """
+    # pandas (and openpyxl through it) is only needed to parse Excel files
+    import pandas as pd
+
+    stat = os.stat(file_path)
+    df = pd.read_excel(file_path)
+
+    arrays = {}
+    for i, column in enumerate(df.columns):
+        values = df[column]
+        if values.dtype.kind in "biuf":
+            arrays[f"{i}"] = values.to_numpy()
+        else:
+            cells = values.tolist()
+            kinds = np.array([_kind(cell) for cell in cells], dtype=np.int8)
+            arrays[f"{i}"] = np.array([cell if kind == _TEXT else "" for cell, kind in zip(cells, kinds)], dtype=str)
+            arrays[f"{_KIND_PREFIX}{i}"] = kinds
+            if (kinds >= _INT).any():
+                arrays[f"{_NUMBER_PREFIX}{i}"] = np.array(
+                    [cell if kind >= _INT else np.nan for cell, kind in zip(cells, kinds)], dtype=np.float64
+                )
+    meta = {
+        "source": os.path.basename(file_path),
+        "mtime": stat.st_mtime,
+        "size": stat.st_size,
+        "sha256": _sha256(file_path),
+        "columns": [str(column) for column in df.columns],
+    }
+    arrays[_META_KEY] = np.array(json.dumps(meta))
+
+    # Write to a temporary file first so concurrent readers never see a partial archive
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        np.savez(f, **arrays)
+    os.replace(tmp_path, compiled_path(file_path, cache_dir))
+    return df
+
+
+def _kind(cell) -> int:
+    import pandas as pd
+
+    if isinstance(cell, str):
+        return _TEXT
+    if isinstance(cell, (bool, np.bool_)) or pd.isna(cell):
+        return _NULL
+    return _INT if isinstance(cell, (int, np.integer)) else _FLOAT
+
+
+def _load_compiled(archive) -> dict:
+    # `archive` maps array names to arrays: an open .npz archive, or the published .npy files
+    meta = json.loads(str(archive[_META_KEY]))
+    data = {}
+    for i, column in enumerate(meta["columns"]):
+        values = archive[f"{i}"]
+        kind_key = f"{_KIND_PREFIX}{i}"
+        if kind_key in archive:
+            kinds = archive[kind_key]
+            values = values.astype(object)
+            values[kinds == _NULL] = np.nan
+            if f"{_NUMBER_PREFIX}{i}" in archive:
+                numbers = archive[f"{_NUMBER_PREFIX}{i}"]
+                values[kinds == _INT] = numbers[kinds == _INT].astype(np.int64).astype(object)
+                values[kinds == _FLOAT] = numbers[kinds == _FLOAT].astype(object)
+        data[column] = values
+    return data
+
+
+def _is_fresh(meta: dict, file_path: str, stat: os.stat_result) -> bool:
+    if meta["mtime"] == stat.st_mtime and meta["size"] == stat.st_size:
+        return True
+    # Touched but possibly unchanged (git checkout, copy): fall back to the content hash
+    return meta["size"] == stat.st_size and meta["sha256"] == _sha256(file_path)
+
+
+def read_table(file_path: str, cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    """
+    Read an Excel file through its compiled binary form, as a DataFrame.
+
+    Same as `read_columns`, for callers that need pandas.
+
+    Args:
+        file_path (str): Path of the Excel file.
+        cache_dir (str): Directory of the compiled tables.
+
+    Returns:
+        pd.DataFrame: The table.
+    """
+    import pandas as pd
+
+    return pd.DataFrame(read_columns(file_path, cache_dir))
+
+
+def read_columns(file_path: str, cache_dir: str = CACHE_DIR) -> dict:
+    """
+    Read an Excel file through its compiled binary form, as NumPy columns.
+
+    The compiled archive is used when its recorded source mtime and size
+    match, or failing that when the source content hash matches. Otherwise
+    the Excel file is parsed again and recompiled. If the cache directory is
+    not writable the parsed table is returned uncached. pandas is only
+    imported when the Excel file has to be parsed.
+
+    Args:
+        file_path (str): Path of the Excel file.
+        cache_dir (str): Directory of the compiled tables.
+
+    Returns:
+        dict: One NumPy array per column, in file order.
+    """
+    with chrono("excel"):
+        if SHARED_DIR:
+            try:
+                return attach_table(file_path, cache_dir, SHARED_DIR)
+            except OSError:
+                pass  # Shared directory not writable: private copy
+        return _read_columns(file_path, cache_dir)
+
+
+def _read_columns(file_path: str, cache_dir: str) -> dict:
+    stat = os.stat(file_path)
+    target = compiled_path(file_path, cache_dir)
+    if os.path.exists(target):
+        try:
+            with np.load(target, allow_pickle=False) as archive:
+                if _is_fresh(json.loads(str(archive[_META_KEY])), file_path, stat):
+                    return _load_compiled(archive)
+        except (OSError, ValueError, KeyError):
+            pass  # Corrupt or outdated archive: recompile it
+
+    try:
+        df = compile_table(file_path, cache_dir)
+    except OSError:
+        import pandas as pd
+        df = pd.read_excel(file_path)
+    # Same arrays as a compiled archive gives: text columns hold Python objects
+    return {column: df[column].to_numpy() if df[column].dtype.kind in "biuf" else df[column].to_numpy(dtype=object)
+            for column in df.columns}
+
+
+def load_columns(file_path: str, cache_dir: str = CACHE_DIR) -> dict:
+    """
+    Get a table shared by the whole process, as NumPy columns.
+
+    Same as `read_columns`, but the result is kept in memory until the source
+    file's mtime changes, so the per-class workbooks are read once per
+    process instead of once per user. The returned arrays must not be
+    modified.
+
+    Args:
+        file_path (str): Path of the Excel file.
+        cache_dir (str): Directory of the compiled tables.
+
+    Returns:
+        dict: One NumPy array per column, in file order.
+    """
+    key = os.path.abspath(file_path)
+    mtime = os.path.getmtime(key)
+    cached = _tables.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+
+    with _tables_lock:
+        cached = _tables.get(key)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, read_columns(file_path, cache_dir))
+            _tables[key] = cached
+    return cached[1]
+
+
+def load_table(file_path: str, cache_dir: str = CACHE_DIR) -> pd.DataFrame:
+    """
+    Get a table shared by the whole process, as a DataFrame built from `load_columns`
+    """
+    import pandas as pd
+
+    columns = load_columns(file_path, cache_dir)
+    key = os.path.abspath(file_path)
+    cached = _frames.get(key)
+    if cached is None or cached[0] is not columns:
+        cached = (columns, pd.DataFrame(columns, copy=False))
+        _frames[key] = cached
+    return cached[1]
+
+
+def shared_path(file_path: str, sha256: str, shared_dir: str) -> str:
+    """
+    Get the directory where a version of an Excel file is published
+    """
+    return os.path.join(shared_dir, f"{os.path.basename(file_path)}-{sha256[:16]}")
+
+
+def publish_table(file_path: str, cache_dir: str = CACHE_DIR, shared_dir: str = SHARED_DIR) -> str:
+    """
+    Publish the compiled form of an Excel file as one .npy file per array, for every process to map.
+
+    The directory is named after the content hash of the source, so the
+    processes of a deployment find the same files and an edited workbook is
+    published next to the old one. It is written under a temporary name and
+    renamed once complete; when several processes publish at once, the
+    first rename wins and the others drop their copy.
+
+    Args:
+        file_path (str): Path of the Excel file.
+        cache_dir (str): Directory of the compiled tables.
+        shared_dir (str): Directory of the published tables.
+
+    Returns:
+        str: The directory of the published arrays.
+
+    Raises:
+        OSError: If the table cannot be compiled or published.
+    """
+    sha256 = _sha256(file_path)
+    target = shared_path(file_path, sha256, shared_dir)
+    if os.path.isdir(target):
+        return target
+
+    _read_columns(file_path, cache_dir)  # Compiles the archive if needed
+    os.makedirs(shared_dir, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=shared_dir, suffix=".tmp")
+    try:
+        with np.load(compiled_path(file_path, cache_dir), allow_pickle=False) as archive:
+            if json.loads(str(archive[_META_KEY]))["sha256"] != sha256:
+                raise OSError(f"No compiled table for the current content of {file_path}")
+            for key in archive.files:
+                np.save(os.path.join(tmp_dir, f"{key}.npy"), archive[key])
+        os.chmod(tmp_dir, 0o755)
+        os.rename(tmp_dir, target)
+    except OSError:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        if not os.path.isdir(target):
+            raise
+    return target
+
+
+def attach_table(file_path: str, cache_dir: str = CACHE_DIR, shared_dir: str = SHARED_DIR) -> dict:
+    """
+    Read an Excel file through its published form, publishing it first if needed.
+
+    Numeric columns are read-only memory maps of the published files: every
+    process attached to them shares one copy in the page cache. Text columns
+    are decoded into Python strings in each process, like `read_columns`
+    does.
+
+    Args:
+        file_path (str): Path of the Excel file.
+        cache_dir (str): Directory of the compiled tables.
+        shared_dir (str): Directory of the published tables.
+
+    Returns:
+        dict: One NumPy array per column, in file order.
+    """
+    directory = publish_table(file_path, cache_dir, shared_dir)
+    arrays = {}
+    for name in os.listdir(directory):
+        key = name[:-len(".npy")]
+        # The metadata is a 0-d string, read once
+        arrays[key] = np.load(os.path.join(directory, name), mmap_mode=None if key == _META_KEY else "r",
+                              allow_pickle=False)
+    return _load_compiled(arrays)
+
+
+def build(file_paths: list = None, cache_dir: str = CACHE_DIR, shared_dir: str = None) -> list:
+    """
+    Compile every Excel input ahead of time.
+
+    Args:
+        file_paths (list): Excel files to compile, defaults to `ASSET_FILES`.
+        cache_dir (str): Directory of the compiled tables.
+        shared_dir (str, optional): Also publish the compiled tables there (see `publish_table`).
+
+    Returns:
+        list: Paths of the compiled archives.
+    """
+    compiled = []
+    for file_path in file_paths or ASSET_FILES:
+        if not os.path.exists(file_path):
+            print(f"Skipping {file_path}: file not found")
+            continue
+        compile_table(file_path, cache_dir)
+        compiled.append(compiled_path(file_path, cache_dir))
+        print(f"Compiled {file_path} -> {compiled[-1]}")
+        if shared_dir:
+            print(f"Published {file_path} -> {publish_table(file_path, cache_dir, shared_dir)}")
+    return compiled
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compile the Excel inputs into binary tables")
+    parser.add_argument("files", nargs="*", help="Excel files to compile (default: all known inputs)")
+    parser.add_argument("--cache-dir", default=CACHE_DIR, help="Directory of the compiled tables")
+    parser.add_argument("--publish", default=SHARED_DIR, metavar="DIR",
+                        help="Also publish the tables there, for worker processes to map "
+                             "(default: $SENSOR_API_SHARED_DIR)")
+    args = parser.parse_args()
+    build(args.files, args.cache_dir, args.publish)
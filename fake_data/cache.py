@@ -0,0 +1,145 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+def taille_estimee(value) -> int:
+    """
+    Roughly estimate the memory used by a simulated day (a dict of lists)
+    """
+    taille = sys.getsizeof(value)
+    for key, column in value.items():
+        taille += sys.getsizeof(key) + sys.getsizeof(column)
+        if column:
+            # Values of a column have the same type, measure the first one
+            taille += len(column) * sys.getsizeof(column[0])
+    return taille
+
+
+class ActivityCache:
+    """
+    Bounded, size-aware LRU cache of simulated days.
+
+    Keys are `(user_id, date, version)` tuples, values are the dictionaries
+    returned by `User.get_daily_activity`. The least recently used entries
+    are evicted once either `max_entries` or `max_bytes` is exceeded. When a
+    `spill_dir` is given, evicted entries are written there as JSON files and
+    read back on a later miss, so they survive eviction and restarts.
+
+    Cached values are shared between callers and must not be modified.
+
+    Args:
+        max_entries (int): Maximum number of days kept in memory.
+        max_bytes (int): Maximum estimated size of the days kept in memory.
+        spill_dir (str): Directory of the on-disk store, None to disable it.
+    """
+
+    def __init__(self, max_entries: int = 10000, max_bytes: int = 64 * 1024 * 1024, spill_dir: str = None) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.spill_dir = spill_dir
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _spill_path(self, key: tuple) -> str:
+        user_id, business_date, version = key
+        return os.path.join(self.spill_dir, str(version), str(user_id), f"{business_date}.json")
+
+    def get(self, key: tuple):
+        """
+        Get a cached day, or None on a miss
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+        if self.spill_dir is not None:
+            try:
+                with open(self._spill_path(key), encoding="utf-8") as f:
+                    value = json.load(f)
+            except (OSError, ValueError):
+                pass
+            else:
+                with self._lock:
+                    self.disk_hits += 1
+                self._insert(key, value)
+                return value
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, key: tuple, value: dict) -> None:
+        """
+        Cache a day
+        """
+        self._insert(key, value)
+
+    def _insert(self, key: tuple, value: dict) -> None:
+        taille = taille_estimee(value)
+        evicted = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (value, taille)
+            self._bytes += taille
+            while len(self._entries) > 1 and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+                old_key, (old_value, old_taille) = self._entries.popitem(last=False)
+                self._bytes -= old_taille
+                self.evictions += 1
+                evicted.append((old_key, old_value))
+
+        # Disk writes happen outside the lock
+        if self.spill_dir is not None:
+            for old_key, old_value in evicted:
+                self._spill(old_key, old_value)
+
+    def _spill(self, key: tuple, value: dict) -> None:
+        path = self._spill_path(key)
+        if os.path.exists(path):
+            return
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(value, f)
+            os.replace(tmp_path, path)
+        except OSError:
+            pass  # The on-disk store is best effort
+
+    def clear(self) -> None:
+        """
+        Empty the in-memory cache (the on-disk store is kept)
+        """
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> dict:
+        """
+        Get the cache counters
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+            }
@@ -0,0 +1,160 @@
+import os
+import threading
+
+import numpy as np
+
+try:
+    from data_engineering.sensor_api.fake_data.assets import empreinte, read_columns
+except ImportError:
+    from .assets import empreinte, read_columns
+
+FOOD_FILE = "food_processed.xlsx"
+
+
+class FoodCatalog:
+    """
+    Column-oriented, read-only view of the food table.
+
+    The ~1,200 foods of `food_processed.xlsx` are held as typed NumPy arrays
+    and pre-grouped by `Type`, so picking a food of a given type is an index
+    lookup instead of a DataFrame filter. A catalog is never mutated: when the
+    source file changes, `get_catalog` builds a new instance and swaps it in.
+
+    Args:
+        aliments_df: Food information, a DataFrame or a dictionary of columns.
+        file_path (str): Path of the file the table was read from.
+        mtime (float): Modification time of that file when it was read.
+        empreinte (str): SHA-256 of that file, identifies the catalog content.
+    """
+
+    def __init__(self, aliments_df, file_path: str = FOOD_FILE, mtime: float = None,
+                 empreinte: str = None) -> None:
+        self.file_path = file_path
+        self.mtime = mtime
+        self.empreinte = empreinte
+        self.ids = np.asarray(aliments_df['id'], dtype=np.int64)
+        self.noms = np.asarray(aliments_df['Aliment'], dtype=object)
+        self.types = np.asarray(aliments_df['Type'], dtype=object)
+        self.calories = np.asarray(aliments_df['Valeur calorique'], dtype=np.float64)
+
+        # Row positions of each food type (missing types left out), types in order of appearance
+        types_presents = dict.fromkeys(t for t in self.types.tolist() if isinstance(t, str))
+        self._positions_par_type = {
+            type_aliment: np.flatnonzero(self.types == type_aliment)
+            for type_aliment in types_presents
+        }
+        # Code of each food's type in `types_aliments`, -1 when it has none
+        self.type_codes = np.full(len(self.ids), -1, dtype=np.int64)
+        for code, positions in enumerate(self._positions_par_type.values()):
+            self.type_codes[positions] = code
+        self.codes_types = {type_aliment: code for code, type_aliment in enumerate(self._positions_par_type)}
+        # The same positions in one array, each type a contiguous range `debuts[code]:debuts[code] + effectifs[code]`.
+        # Code -1 (a type that is not in the catalog) points to an empty last range
+        self.positions_par_type = np.concatenate([np.empty(0, dtype=np.intp), *self._positions_par_type.values()])
+        self.effectifs = np.array([len(positions) for positions in self._positions_par_type.values()] + [0],
+                                  dtype=np.int64)
+        self.debuts = np.concatenate([[0], np.cumsum(self.effectifs[:-1])]).astype(np.int64)
+        # Row position of each food id, -1 for ids that are not in the catalog
+        self._position_par_id = np.full(int(self.ids.max()) + 1 if len(self.ids) else 0, -1, dtype=np.int64)
+        self._position_par_id[self.ids] = np.arange(len(self.ids))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def __repr__(self):
+        return f"FoodCatalog(file_path={self.file_path}, aliments={len(self)}, types={len(self._positions_par_type)})"
+
+    @property
+    def types_aliments(self) -> list:
+        """
+        Getter for the food types present in the catalog
+        """
+        return list(self._positions_par_type)
+
+    @classmethod
+    def from_excel(cls, file_path: str = FOOD_FILE) -> "FoodCatalog":
+        """
+        Build a catalog from the food Excel file, through its compiled form
+        """
+        mtime = os.path.getmtime(file_path)
+        return cls(read_columns(file_path), file_path=file_path, mtime=mtime, empreinte=empreinte(file_path))
+
+    def positions_du_type(self, type_aliment) -> np.ndarray:
+        """
+        Get the row positions of every food of a given type.
+
+        Args:
+            type_aliment (str): The food type.
+
+        Returns:
+            np.ndarray: Row positions in file order (empty if the type is unknown).
+        """
+        return self._positions_par_type.get(type_aliment, np.empty(0, dtype=np.intp))
+
+    def positions(self, aliment_ids) -> np.ndarray:
+        """
+        Get the row positions of many foods at once, from their ids.
+
+        Args:
+            aliment_ids: Food ids.
+
+        Returns:
+            np.ndarray: Row positions, in the order of `aliment_ids`.
+
+        Raises:
+            KeyError: If a food id is not in the catalog.
+        """
+        aliment_ids = np.asarray(aliment_ids, dtype=np.int64)
+        connus = (aliment_ids >= 0) & (aliment_ids < len(self._position_par_id))
+        positions = np.where(connus, self._position_par_id[np.where(connus, aliment_ids, 0)], -1)
+        if (positions < 0).any():
+            raise KeyError(f"Unknown aliment_id: {aliment_ids[positions < 0][0]}")
+        return positions
+
+    def aliment(self, position: int) -> dict:
+        """
+        Get one food as a dictionary.
+
+        Args:
+            position (int): Row position in the catalog.
+
+        Returns:
+            dict: The food id, name, type and calorific value.
+        """
+        return {
+            'id': int(self.ids[position]),
+            'Aliment': self.noms[position],
+            'Type': self.types[position],
+            'Valeur calorique': float(self.calories[position]),
+        }
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(file_path: str = FOOD_FILE) -> FoodCatalog:
+    """
+    Get the process-wide catalog for a food file.
+
+    The file is only parsed again when its modification time changes, so
+    this is cheap enough to call on every request.
+
+    Args:
+        file_path (str): Path of the food Excel file.
+
+    Returns:
+        FoodCatalog: The current catalog for that file.
+    """
+    key = os.path.abspath(file_path)
+    mtime = os.path.getmtime(key)
+    catalog = _catalogs.get(key)
+    if catalog is not None and catalog.mtime == mtime:
+        return catalog
+
+    with _catalogs_lock:
+        catalog = _catalogs.get(key)
+        if catalog is None or catalog.mtime != mtime:
+            catalog = FoodCatalog.from_excel(file_path)
+            _catalogs[key] = catalog
+    return catalog
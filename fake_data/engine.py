@@ -0,0 +1,273 @@
+from datetime import date
+
+import numpy as np
+
+try:
+    from data_engineering.sensor_api.fake_data.catalog import FoodCatalog
+    from data_engineering.sensor_api.fake_data.registry import UserRegistry
+    from data_engineering.sensor_api.fake_data.sensor import TYPES_PORTIONS_MULTIPLES, EaterProfile
+except ImportError:
+    from .catalog import FoodCatalog
+    from .registry import UserRegistry
+    from .sensor import TYPES_PORTIONS_MULTIPLES, EaterProfile
+
+# Changes whenever the same (user_id, date) would give a different batch result
+ENGINE_VERSION = "batch-1"
+
+# Philox4x32-10 constants (Salmon et al., "Parallel Random Numbers: As Easy as 1, 2, 3")
+_PHILOX_M0 = np.uint64(0xD2511F53)
+_PHILOX_M1 = np.uint64(0xCD9E8D57)
+_PHILOX_W0 = np.uint64(0x9E3779B9)
+_PHILOX_W1 = np.uint64(0xBB67AE85)
+_MASK32 = np.uint64(0xFFFFFFFF)
+
+# Independent random streams of a meal, used as the third counter word
+_STREAM_HEURE, _STREAM_EXCES, _STREAM_PROBABILITES, _STREAM_TYPES, _STREAM_ALIMENTS, _STREAM_QUANTITES = range(6)
+
+# Number of (user_id, date) pairs simulated together, bounds the size of the work arrays
+CHUNK_SIZE = 2048
+
+
+def philox4x32(counter: np.ndarray, key: np.ndarray, rounds: int = 10) -> np.ndarray:
+    """
+    Philox4x32 counter-based generator, vectorized over any number of counters.
+
+    The output only depends on (counter, key), so any draw of any stream can be
+    computed independently, in any order and without shared state.
+
+    Args:
+        counter (np.ndarray): uint32 array of shape (..., 4).
+        key (np.ndarray): uint32 array of shape (..., 2), broadcastable to the counters.
+        rounds (int): Number of rounds.
+
+    Returns:
+        np.ndarray: uint32 array of shape (..., 4) of random words.
+    """
+    c0, c1, c2, c3 = (counter[..., i].astype(np.uint64) for i in range(4))
+    k0 = key[..., 0].astype(np.uint64)
+    k1 = key[..., 1].astype(np.uint64)
+    for i in range(rounds):
+        if i:
+            k0 = (k0 + _PHILOX_W0) & _MASK32
+            k1 = (k1 + _PHILOX_W1) & _MASK32
+        p0 = _PHILOX_M0 * c0
+        p1 = _PHILOX_M1 * c2
+        c0, c1, c2, c3 = (p1 >> 32) ^ c1 ^ k0, p1 & _MASK32, (p0 >> 32) ^ c3 ^ k1, p0 & _MASK32
+    return np.stack([c0, c1, c2, c3], axis=-1).astype(np.uint32)
+
+
+def uniformes(keys: np.ndarray, repas: int, stream: int, n: int) -> np.ndarray:
+    """
+    Draw uniform numbers in [0, 1) from one stream of one meal, for many keys.
+
+    Args:
+        keys (np.ndarray): uint32 array of shape (P, 2), one (user_id, date ordinal) key per row.
+        repas (int): Meal number.
+        stream (int): Stream of the meal (time, types, foods...).
+        n (int): Number of draws per key.
+
+    Returns:
+        np.ndarray: float64 array of shape (P, n).
+    """
+    n_blocks = (n + 1) // 2  # Each block of 4 words gives 2 doubles of 53 bits
+    counter = np.zeros((1, n_blocks, 4), dtype=np.uint32)
+    counter[..., 0] = np.arange(n_blocks, dtype=np.uint32)
+    counter[..., 1] = repas
+    counter[..., 2] = stream
+    words = philox4x32(counter, keys[:, None, :]).astype(np.uint64)
+    hi = (words[..., 0::2] >> np.uint64(5)) * np.uint64(67108864) + (words[..., 1::2] >> np.uint64(6))
+    return (hi.astype(np.float64) / 9007199254740992.0).reshape(len(keys), -1)[:, :n]
+
+
+class _ClassTables:
+    """
+    Arrays describing one eater class, taken from its shared profile.
+    """
+
+    def __init__(self, profil: EaterProfile, type_slots: dict) -> None:
+        types = profil.types.tolist()
+        self.repas = np.array(profil.repas)
+        self.moyennes = profil.moyennes
+        self.ecarts_types = profil.ecarts_types
+        self.minutes = profil.minutes
+        self.calories_min = profil.calories_min
+        self.calories_max = profil.calories_max
+        self.variation = profil.variation
+        types_multiples = TYPES_PORTIONS_MULTIPLES.get(profil.classe_mangeur, [])
+        self.multiples = np.array([types_multiples is None or t in types_multiples for t in types])
+        # Types missing from the catalog point to the empty last slot
+        self.slots = np.array([type_slots.get(t, len(type_slots)) for t in types])
+
+
+class BatchEngine:
+    """
+    Vectorized simulation of many (user_id, date) pairs at once.
+
+    Follows the rules of `User.simulate_daily_activity` (meal time variation,
+    noisy type probabilities, calorie bounds, quantities, trimming of the
+    least likely foods) but computes every pair of a chunk with NumPy array
+    operations. Random numbers come from Philox keyed on (user_id, date
+    ordinal), with one counter range per meal and per draw kind, so a pair
+    always gets the same result, whatever batch it is part of, without any
+    global random state.
+
+    Results are deterministic but differ from the per-user simulation, which
+    uses other random generators.
+
+    Args:
+        registry (UserRegistry): The users that can be simulated.
+        catalog (FoodCatalog): Catalog containing food information.
+    """
+
+    def __init__(self, registry: UserRegistry, catalog: FoodCatalog) -> None:
+        self.registry = registry
+        self.catalog = catalog
+
+        # Catalog positions grouped by type, in one array with per-type offsets
+        self._positions = catalog.positions_par_type
+        self._counts = catalog.effectifs
+        self._starts = catalog.debuts
+        type_slots = catalog.codes_types
+
+        # One set of tables per eater class of the registry, taken from any of its users
+        self._classes = []
+        self._codes = np.full(len(registry.vocab_classes), -1)
+        for code, classe_mangeur in enumerate(registry.vocab_classes):
+            user_ids = registry.user_ids_de_classe(classe_mangeur)
+            user = registry.get(int(user_ids[0])) if len(user_ids) else None
+            if user is not None and user.heures_repas:
+                self._codes[code] = len(self._classes)
+                self._classes.append(_ClassTables(user.profil, type_slots))
+
+    def simulate(self, user_ids, dates) -> dict:
+        """
+        Simulate a batch of (user_id, date) pairs.
+
+        Args:
+            user_ids: Sequence of user ids.
+            dates: Sequence of dates paired with `user_ids`, or a single date for all of them.
+
+        Returns:
+            dict: One NumPy array per column (user_id, meal_id, heure_repas, aliment_id,
+                  quantity), rows ordered by pair, then meal, then food.
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64).reshape(-1)
+        if isinstance(dates, date):
+            dates = [dates]
+        jours = np.broadcast_to(np.asarray(dates, dtype='datetime64[D]').reshape(-1), user_ids.shape)
+
+        codes = self._codes[self.registry.classes[self.registry.rows(user_ids)]]
+        facteurs = self.registry.facteurs_calories(user_ids)
+
+        parts = []
+        for start in range(0, len(user_ids), CHUNK_SIZE):
+            chunk = slice(start, start + CHUNK_SIZE)
+            for code, tables in enumerate(self._classes):
+                pairs = start + np.flatnonzero(codes[chunk] == code)
+                if len(pairs):
+                    parts.extend(self._simulate_class(tables, pairs, user_ids[pairs], jours[pairs], facteurs[pairs]))
+
+        columns = ['pair', 'meal_id', 'heure_repas', 'aliment_id', 'quantity', 'item']
+        if parts:
+            data = {key: np.concatenate([part[key] for part in parts]) for key in columns}
+        else:
+            data = {key: np.empty(0, dtype=np.int64) for key in columns}
+            data['heure_repas'] = np.empty(0, dtype='datetime64[s]')
+        order = np.lexsort((data['item'], data['meal_id'], data['pair']))
+        return {
+            'user_id': user_ids[data['pair'][order]],
+            'meal_id': data['meal_id'][order],
+            'heure_repas': data['heure_repas'][order],
+            'aliment_id': data['aliment_id'][order],
+            'quantity': data['quantity'][order],
+        }
+
+    def _simulate_class(self, tables: _ClassTables, pairs, user_ids, jours, facteurs) -> list:
+        """
+        Simulate every meal of pairs that all belong to one eater class
+        """
+        # Philox key: (user_id, date ordinal)
+        keys = np.empty((len(pairs), 2), dtype=np.uint32)
+        keys[:, 0] = user_ids.astype(np.uint32)
+        keys[:, 1] = (jours.astype(np.int64) + date(1970, 1, 1).toordinal()).astype(np.uint32)
+        n_types = tables.moyennes.shape[1]
+        items = np.arange(n_types)
+        parts = []
+
+        for m, repas in enumerate(tables.repas):
+            # Meal time: scheduled time plus a whole number of minutes
+            low, high = tables.variation
+            variation = low + np.floor(uniformes(keys, repas, _STREAM_HEURE, 1)[:, 0] * (high - low + 1))
+            heures = jours.astype('datetime64[s]') + ((tables.minutes[m] + variation) * 60).astype('timedelta64[s]')
+
+            # Noisy type probabilities (Box-Muller), then n_types draws of a type
+            u = uniformes(keys, repas, _STREAM_PROBABILITES, 2 * n_types)
+            normales = np.sqrt(-2 * np.log1p(-u[:, :n_types])) * np.cos(2 * np.pi * u[:, n_types:])
+            probabilites = np.clip(tables.moyennes[m] + tables.ecarts_types[m] * normales, 0, None)
+            cdf = np.cumsum(probabilites, axis=1)
+            valides = cdf[:, -1] > 0
+            cdf = cdf / np.where(valides, cdf[:, -1], 1)[:, None]
+            u = uniformes(keys, repas, _STREAM_TYPES, n_types)
+            types = np.minimum((cdf[:, None, :] <= u[:, :, None]).sum(axis=2), n_types - 1)
+
+            # One food of each drawn type
+            slots = tables.slots[types]
+            counts = self._counts[slots]
+            u = uniformes(keys, repas, _STREAM_ALIMENTS, n_types)
+            offsets = np.minimum(np.floor(u * counts).astype(np.int64), np.maximum(counts - 1, 0))
+            positions = self._positions[np.minimum(self._starts[slots] + offsets, len(self._positions) - 1)]
+            valides = valides[:, None] & (counts > 0)
+
+            # Quantities, as in User.determiner_quantite
+            u = uniformes(keys, repas, _STREAM_QUANTITES, 5 * n_types).reshape(len(pairs), n_types, 5)
+            zero = u[..., 0] < 0.04
+            enorme = ~zero & (u[..., 1] > 0.9999)
+            multiple = ~zero & ~enorme & tables.multiples[types] & (u[..., 3] < 0.30)
+            quantites = np.where(zero, 0, np.where(enorme, 100 + np.floor(u[..., 2] * 901),
+                                                   np.where(multiple, 2 + np.floor(u[..., 4] * 4), 1))).astype(np.int64)
+
+            # Foods are added until the minimum is reached within the maximum (or the maximum may be exceeded)
+            calories = np.where(valides, self.catalog.calories[positions] * quantites, 0)
+            cumul = np.cumsum(calories, axis=1)
+            exces = (uniformes(keys, repas, _STREAM_EXCES, 1) < 0.2) | np.logical_or.accumulate(quantites >= 10, axis=1)
+            calories_min = (tables.calories_min[m] * facteurs)[:, None]
+            calories_max = (tables.calories_max[m] * facteurs)[:, None]
+            arret = (cumul >= calories_min) & (exces | (cumul <= calories_max))
+            n_selection = np.where(arret.any(axis=1), arret.argmax(axis=1) + 1, n_types)
+            selection = (items < n_selection[:, None]) & valides
+            dernier = (n_selection - 1)[:, None]
+            total = np.take_along_axis(cumul, dernier, axis=1)
+            a_reduire = ~np.take_along_axis(exces, dernier, axis=1) & (total > calories_max)
+
+            # Over the maximum: drop the least likely types first until under it
+            cle = np.where(selection, tables.moyennes[m][types], np.inf)
+            ordre = np.argsort(cle, axis=1, kind='stable')
+            retraits = np.cumsum(np.take_along_axis(np.where(selection, calories, 0), ordre, axis=1), axis=1)
+            n_retraits = ((total - retraits) <= calories_max).argmax(axis=1) + 1
+            retire = np.zeros_like(selection)
+            np.put_along_axis(retire, ordre, items < n_retraits[:, None], axis=1)
+            gardes = selection & ~(a_reduire & retire)
+
+            p, t = np.nonzero(gardes)
+            parts.append({
+                'pair': pairs[p],
+                'meal_id': np.full(len(p), repas, dtype=np.int64),
+                'heure_repas': heures[p],
+                'aliment_id': self.catalog.ids[positions[p, t]],
+                'quantity': quantites[p, t],
+                'item': t,
+            })
+        return parts
+
+
+def to_connexion(columns: dict) -> dict:
+    """
+    Convert a batch result to the list-based format of `User.get_daily_activity`
+    """
+    return {
+        'user_id': columns['user_id'].tolist(),
+        'meal_id': columns['meal_id'].tolist(),
+        'heure_repas': [h.replace('T', ' ') for h in np.datetime_as_string(columns['heure_repas'], unit='s').tolist()],
+        'aliment_id': columns['aliment_id'].tolist(),
+        'quantity': columns['quantity'].tolist(),
+    }
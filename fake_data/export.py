@@ -0,0 +1,242 @@
+import argparse
+import hashlib
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from datetime import date, timedelta
+
+import numpy as np
+
+try:
+    from data_engineering.sensor_api.fake_data import create_app, workers
+    from data_engineering.sensor_api.fake_data.app_tracker import AppTracker
+    from data_engineering.sensor_api.fake_data.engine import ENGINE_VERSION
+except ImportError:
+    from . import create_app, workers
+    from .app_tracker import AppTracker
+    from .engine import ENGINE_VERSION
+
+MANIFEST = "_manifest.jsonl"
+
+
+def parse_users(spec: str) -> list:
+    """
+    Parse a list of user ids such as "1-20,25", or "all"
+    """
+    if spec == "all":
+        return None
+    user_ids = []
+    for part in spec.split(","):
+        debut, _, fin = part.strip().partition("-")
+        user_ids.extend(range(int(debut), int(fin or debut) + 1))
+    return user_ids
+
+
+def partition_path(business_date: date, classe_mangeur: str, part: int) -> str:
+    """
+    Get the path of a Parquet file, relative to the export directory (Hive-style partitions)
+    """
+    return os.path.join(f"date={business_date.isoformat()}", f"classe_mangeur={classe_mangeur}",
+                        f"part-{part:05d}.parquet")
+
+
+def selection_empreinte(app_tracker: AppTracker, user_ids=None) -> str:
+    """
+    Get a fingerprint of the exported users, in the order they are split into partitions
+    """
+    registry = app_tracker.registry
+    user_ids = registry.user_ids if user_ids is None else np.asarray(user_ids, dtype=np.int64)
+    return hashlib.sha256(user_ids.tobytes()).hexdigest()[:16]
+
+
+def iter_partitions(app_tracker: AppTracker, user_ids, start: date, end: date, chunk_size: int):
+    """
+    Split the export into units of work: one day, one eater class, at most `chunk_size` users.
+
+    Yields:
+        tuple: (date, classe_mangeur, relative path, user ids)
+    """
+    registry = app_tracker.registry
+    user_ids = registry.user_ids if user_ids is None else np.asarray(user_ids, dtype=np.int64)
+    classes = registry.classes[registry.rows(user_ids)]
+    groupes = [(classe_mangeur, user_ids[classes == code])
+               for code, classe_mangeur in enumerate(registry.vocab_classes)]
+
+    business_date = start
+    while business_date <= end:
+        for classe_mangeur, ids in groupes:
+            for part, debut in enumerate(range(0, len(ids), chunk_size)):
+                yield (business_date, classe_mangeur, partition_path(business_date, classe_mangeur, part),
+                       ids[debut:debut + chunk_size].tolist())
+        business_date += timedelta(days=1)
+
+
+def export_version(app_tracker: AppTracker, engine: str = "daily") -> str:
+    """
+    Get the version of the data an export writes, recorded in its manifest
+    """
+    if engine == "batch":
+        return f"{ENGINE_VERSION}-{app_tracker.empreinte_donnees}"
+    return app_tracker.simulation_version
+
+
+def read_manifest(out: str, version: str, users: str = None, chunk_size: int = None) -> dict:
+    """
+    Get the partitions already exported, by relative path.
+
+    A partition path only says which day, class and chunk it holds: the
+    export can only be resumed with the same users and chunk size, since
+    other ones put other users under the same paths.
+
+    Raises:
+        ValueError: If the directory was exported with another version, other users or another chunk size.
+    """
+    done = {}
+    try:
+        with open(os.path.join(out, MANIFEST), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # Last line cut by an interruption
+                if entry['version'] != version:
+                    raise ValueError(f"{out} was exported with simulation version {entry['version']}, "
+                                     f"not {version}: use another output directory")
+                if users is not None and entry.get('users') != users:
+                    raise ValueError(f"{out} was exported for other users: use the same --users "
+                                     f"or another output directory")
+                if chunk_size is not None and entry.get('chunk_size') != chunk_size:
+                    raise ValueError(f"{out} was exported with --chunk-size {entry.get('chunk_size')}, "
+                                     f"not {chunk_size}: use another output directory")
+                done[entry['partition']] = entry
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def export(app_tracker: AppTracker, start: date, end: date, out: str, user_ids=None,
+           engine: str = "daily", chunk_size: int = 1000, log=print) -> dict:
+    """
+    Export the simulated traffic of many users over a date range as partitioned Parquet.
+
+    Partitions are simulated and written by the worker processes of the
+    AppTracker. Each completed partition is appended to a manifest, so
+    running the same export again only simulates what is missing.
+
+    Args:
+        app_tracker (AppTracker): The users to export and the worker processes.
+        start (date): First day (included).
+        end (date): Last day (included).
+        out (str): Output directory.
+        user_ids (list, optional): Users to export, all of them if None.
+        engine (str): "daily" for the same data as the API, "batch" for the vectorized engine.
+        chunk_size (int): Maximum number of users per Parquet file.
+        log: Function called with progress messages.
+
+    Returns:
+        dict: Counters of the export (partitions, skipped, rows, user_days, seconds).
+    """
+    version = export_version(app_tracker, engine)
+    os.makedirs(out, exist_ok=True)
+    users = selection_empreinte(app_tracker, user_ids)
+    done = read_manifest(out, version, users, chunk_size)
+
+    stats = {'partitions': 0, 'skipped': 0, 'rows': 0, 'user_days': 0, 'seconds': 0.0}
+    debut = time.perf_counter()
+    dernier_log = debut
+    pool = app_tracker.pool
+    # Bounded number of tasks in flight, the list of partitions is never materialized
+    max_en_cours = 2 * (app_tracker.max_workers or os.cpu_count() or 1)
+    en_cours = {}
+
+    with open(os.path.join(out, MANIFEST), "a", encoding="utf-8") as manifest:
+        def terminer(futures):
+            nonlocal dernier_log
+            for future in futures:
+                relative_path, n_users = en_cours.pop(future)
+                rows = future.result()
+                manifest.write(json.dumps({'partition': relative_path, 'version': version, 'users': users,
+                                           'chunk_size': chunk_size, 'rows': rows, 'user_days': n_users}) + "\n")
+                manifest.flush()
+                stats['partitions'] += 1
+                stats['rows'] += rows
+                stats['user_days'] += n_users
+            maintenant = time.perf_counter()
+            if maintenant - dernier_log >= 1:
+                dernier_log = maintenant
+                log(progress(stats, maintenant - debut))
+
+        for business_date, classe_mangeur, relative_path, ids in iter_partitions(
+                app_tracker, user_ids, start, end, chunk_size):
+            if relative_path in done:
+                stats['skipped'] += 1
+                continue
+            future = pool.submit(workers.export_partition, ids, business_date,
+                                 os.path.join(out, relative_path), engine)
+            en_cours[future] = (relative_path, len(ids))
+            if len(en_cours) >= max_en_cours:
+                terminer(wait(en_cours, return_when=FIRST_COMPLETED).done)
+        terminer(wait(en_cours).done)
+
+    stats['seconds'] = time.perf_counter() - debut
+    log(progress(stats, stats['seconds']))
+    return stats
+
+
+def progress(stats: dict, seconds: float) -> str:
+    """
+    Format the throughput of an export
+    """
+    seconds = max(seconds, 1e-9)
+    return (f"{stats['partitions']} partitions ({stats['skipped']} already done), {stats['rows']} rows, "
+            f"{stats['rows'] / seconds:.0f} rows/s, {stats['user_days'] / seconds:.1f} user-days/s")
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m fake_data.export",
+        description="Export simulated traffic as Parquet partitioned by date and classe_mangeur")
+    parser.add_argument("--start", required=True, type=date.fromisoformat, help="First day, YYYY-MM-DD")
+    parser.add_argument("--end", required=True, type=date.fromisoformat, help="Last day, YYYY-MM-DD")
+    parser.add_argument("--users", default="all", help='User ids such as "1-20,25" (default: all)')
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--engine", choices=["daily", "batch"], default="daily",
+                        help="daily: same data as the API, batch: vectorized engine, much faster")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Maximum number of users per file")
+    args = parser.parse_args(argv)
+
+    if args.end < args.start:
+        parser.error("--end should be after --start")
+    if args.chunk_size < 1:
+        parser.error("--chunk-size should be at least 1")
+    try:
+        user_ids = parse_users(args.users)
+    except ValueError:
+        parser.error(f"Invalid --users: {args.users}")
+
+    app_tracker = create_app()
+    app_tracker.max_workers = args.workers
+    if user_ids is not None:
+        try:
+            app_tracker.registry.rows(user_ids)
+        except KeyError as error:
+            parser.error(str(error))
+    # Only a directory exported with other arguments is a usage error, failures of the export keep their traceback
+    try:
+        read_manifest(args.out, export_version(app_tracker, args.engine), selection_empreinte(app_tracker, user_ids),
+                      args.chunk_size)
+    except ValueError as error:
+        app_tracker.close()
+        parser.error(str(error))
+    try:
+        export(app_tracker, args.start, args.end, args.out, user_ids, args.engine, args.chunk_size,
+               log=lambda message: print(message, file=sys.stderr))
+    finally:
+        app_tracker.close()
+
+
+if __name__ == "__main__":
+    main()
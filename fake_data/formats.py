@@ -0,0 +1,204 @@
+import io
+from typing import Iterable, Optional
+
+# Media types the API can answer with, JSON first as the default
+JSON = "application/json"
+ARROW = "application/vnd.apache.arrow.stream"
+PARQUET = "application/x-parquet"
+MSGPACK = "application/msgpack"
+MEDIA_TYPES = [JSON, ARROW, PARQUET, MSGPACK]
+
+
+class FormatIndisponible(Exception):
+    """Raised when the package needed to encode a format is not installed"""
+
+
+def negocier(accept: Optional[str]) -> Optional[str]:
+    """
+    Choose the response media type from an Accept header.
+
+    The supported type with the highest quality wins, JSON on a tie or when
+    the client accepts anything.
+
+    Args:
+        accept (str): The Accept header, None if missing.
+
+    Returns:
+        str: The chosen media type, or None if no supported type is acceptable.
+    """
+    if not accept:
+        return JSON
+    qualites = {}
+    for partie in accept.split(","):
+        media_type, *params = [morceau.strip() for morceau in partie.split(";")]
+        qualite = 1.0
+        for param in params:
+            nom, _, valeur = param.partition("=")
+            if nom.strip() == "q":
+                try:
+                    qualite = float(valeur)
+                except ValueError:
+                    qualite = 0.0
+        media_type = media_type.lower()
+        if media_type in ("*/*", "application/*"):
+            candidats = MEDIA_TYPES
+        elif media_type in MEDIA_TYPES:
+            candidats = [media_type]
+        else:
+            continue
+        for candidat in candidats:
+            # An explicit type takes precedence over a wildcard
+            if candidat not in qualites or media_type == candidat:
+                qualites[candidat] = qualite
+    acceptes = [media_type for media_type in MEDIA_TYPES if qualites.get(media_type, 0) > 0]
+    if not acceptes:
+        return None
+    return max(acceptes, key=lambda media_type: qualites[media_type])
+
+
+def verifier(media_type: str) -> None:
+    """
+    Raise FormatIndisponible if a media type cannot be encoded here.
+
+    The optional packages are only imported when a binary format is asked for.
+    """
+    if media_type in (ARROW, PARQUET):
+        _pyarrow()
+    elif media_type == MSGPACK:
+        _msgpack()
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise FormatIndisponible("pyarrow is needed for Arrow and Parquet responses")
+    return pyarrow
+
+
+def _msgpack():
+    try:
+        import msgpack
+    except ImportError:
+        raise FormatIndisponible("msgpack is needed for msgpack responses")
+    return msgpack
+
+
+def schema(avec_date: bool = False):
+    """
+    Get the Arrow schema of the traffic, with a leading `date` column for ranges of days
+    """
+    pa = _pyarrow()
+    fields = [
+        ('user_id', pa.int64()),
+        ('meal_id', pa.int64()),
+        ('heure_repas', pa.timestamp('s')),
+        ('aliment_id', pa.int64()),
+        ('quantity', pa.int64()),
+    ]
+    if avec_date:
+        fields.insert(0, ('date', pa.date32()))
+    return pa.schema(fields)
+
+
+def record_batch(columns: dict, business_date=None):
+    """
+    Build an Arrow record batch from columnar traffic.
+
+    Columns are converted as whole arrays, `heure_repas` becomes a timestamp.
+    Empty traffic (an empty dictionary) gives an empty batch with the same schema.
+
+    Args:
+        columns (dict): Traffic as returned by the AppTracker, one list or NumPy array per column.
+        business_date (date, optional): Added as a `date` column, for ranges of days.
+    """
+    pa = _pyarrow()
+    arrays = [
+        pa.array(columns.get('user_id', []), type=pa.int64()),
+        pa.array(columns.get('meal_id', []), type=pa.int64()),
+        _heures(pa, columns.get('heure_repas', [])),
+        pa.array(columns.get('aliment_id', []), type=pa.int64()),
+        pa.array(columns.get('quantity', []), type=pa.int64()),
+    ]
+    if business_date is not None:
+        arrays.insert(0, pa.array([business_date] * len(arrays[0]), type=pa.date32()))
+    return pa.RecordBatch.from_arrays(arrays, schema=schema(business_date is not None))
+
+
+def _heures(pa, heures):
+    # 'YYYY-MM-DD HH:MM:SS' strings from the daily simulation, datetime64 from the batch engine
+    if getattr(heures, 'dtype', None) is not None and heures.dtype.kind == 'M':
+        return pa.array(heures.astype('datetime64[s]'), type=pa.timestamp('s'))
+    return pa.array(heures, type=pa.string()).cast(pa.timestamp('s'))
+
+
+def encoder(columns: dict, media_type: str) -> bytes:
+    """
+    Encode columnar traffic in a binary media type.
+
+    Args:
+        columns (dict): Traffic as returned by the AppTracker, one list per column.
+        media_type (str): One of ARROW, PARQUET or MSGPACK.
+
+    Returns:
+        bytes: The encoded body.
+    """
+    if media_type == MSGPACK:
+        return _msgpack().packb(columns)
+    if media_type == ARROW:
+        return b"".join(encoder_jours([(None, columns)], media_type))
+    return encoder_jours([(None, columns)], media_type)
+
+
+def encoder_jours(jours: Iterable, media_type: str):
+    """
+    Encode the traffic of several days in a binary media type.
+
+    Arrow and msgpack are streamed, one record batch or one map per day.
+    Parquet needs the whole table, it is written once every day is known.
+
+    Args:
+        jours (Iterable): (date, columns) pairs, the date is None for a single day.
+            Every date must be None, or none of them.
+        media_type (str): One of ARROW, PARQUET or MSGPACK.
+
+    Returns:
+        bytes for PARQUET, otherwise an iterator of bytes.
+    """
+    if media_type == MSGPACK:
+        msgpack = _msgpack()
+        return (msgpack.packb({'date': business_date.isoformat(), **columns})
+                for business_date, columns in jours)
+
+    pa = _pyarrow()
+    if media_type == PARQUET:
+        import pyarrow.parquet as pq
+        batches = [record_batch(columns, business_date) for business_date, columns in jours]
+        table = pa.Table.from_batches(batches, schema=batches[0].schema if batches else schema())
+        sink = io.BytesIO()
+        pq.write_table(table, sink)
+        return sink.getvalue()
+    if media_type != ARROW:
+        raise ValueError(f"Unsupported media type: {media_type}")
+
+    def flux():
+        sink = io.BytesIO()
+        writer = None
+        for business_date, columns in jours:
+            batch = record_batch(columns, business_date)
+            if writer is None:
+                writer = pa.ipc.new_stream(sink, batch.schema)
+            writer.write_batch(batch)
+            yield _vider(sink)
+        if writer is None:
+            writer = pa.ipc.new_stream(sink, schema())
+        writer.close()
+        yield _vider(sink)
+    return flux()
+
+
+def _vider(sink: io.BytesIO) -> bytes:
+    data = sink.getvalue()
+    sink.seek(0)
+    sink.truncate()
+    return data
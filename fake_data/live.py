@@ -0,0 +1,237 @@
+import asyncio
+import heapq
+import time
+from concurrent.futures import Executor
+from datetime import date, datetime, timedelta
+from typing import Iterable, Optional
+
+import numpy as np
+
+try:
+    from data_engineering.sensor_api.fake_data.metrics import LIVE_EVENTS, LIVE_SUBSCRIBERS
+except ImportError:
+    from .metrics import LIVE_EVENTS, LIVE_SUBSCRIBERS
+
+# A scheduled meal is a single int, so the heap of a 100k-user day stays small and is ordered by
+# time: seconds since 1970-01-01 (local time) << 32 | registry row << 5 | day shift << 3 | meal_id.
+# The day shift is the day of the time minus the business day of the meal, plus one: 2 for a meal
+# pushed past midnight, 0 for one pulled before it.
+EPOCH = datetime(1970, 1, 1)
+MAX_ROWS = 1 << 27
+MAX_MEAL_ID = 7
+
+
+def encoder_cles(secondes: np.ndarray, rows: np.ndarray, decalages: np.ndarray, meal_ids: np.ndarray) -> np.ndarray:
+    """
+    Pack scheduled meals into heap keys
+    """
+    return (secondes.astype(np.int64) << 32) | (rows.astype(np.int64) << 5) \
+        | ((decalages.astype(np.int64) + 1) << 3) | meal_ids.astype(np.int64)
+
+
+def decoder_cle(cle: int) -> tuple:
+    """
+    Unpack a heap key into (seconds since the epoch, registry row, day shift, meal_id)
+    """
+    return cle >> 32, (cle >> 5) & (MAX_ROWS - 1), ((cle >> 3) & 0b11) - 1, cle & MAX_MEAL_ID
+
+
+class Subscription:
+    """
+    Live events of some users and eater classes, in a bounded queue.
+
+    An event matches when its user is in `user_ids` or its eater class in
+    `classes_mangeurs`; without any filter, every event matches. When the
+    subscriber is too slow and the queue is full, new events are dropped
+    and counted in `dropped`.
+
+    Args:
+        user_ids (iterable of int, optional): Users to follow.
+        classes_mangeurs (iterable of str, optional): Eater classes to follow.
+        maxsize (int): Number of events kept waiting for the subscriber.
+    """
+
+    def __init__(self, user_ids: Optional[Iterable[int]] = None, classes_mangeurs: Optional[Iterable[str]] = None,
+                 maxsize: int = 1000) -> None:
+        self.user_ids = set(user_ids or ())
+        self.classes_mangeurs = set(classes_mangeurs or ())
+        self.queue = asyncio.Queue(maxsize)
+        self.dropped = 0
+
+    def accepte(self, user_id: int, classe_mangeur: str) -> bool:
+        if not self.user_ids and not self.classes_mangeurs:
+            return True
+        return user_id in self.user_ids or classe_mangeur in self.classes_mangeurs
+
+    def put(self, event: dict) -> None:
+        try:
+            self.queue.put_nowait(event)
+            LIVE_EVENTS.inc(outcome="delivered")
+        except asyncio.QueueFull:
+            self.dropped += 1
+            LIVE_EVENTS.inc(outcome="dropped")
+
+    async def get(self) -> dict:
+        """
+        Wait for the next event
+        """
+        return await self.queue.get()
+
+
+class LiveFeed:
+    """
+    Real-time feed of the meals of every user, as they happen.
+
+    The connection times of today's meals (`User.generer_heures_connexion`)
+    are drawn for the whole population in the worker processes and pushed on
+    one heap. A single task pops the meals when their time comes, so the
+    number of users does not change the number of tasks. A meal is only
+    simulated when a subscriber follows its user or eater class, and the
+    event carries what the historical endpoints return for that meal. The
+    next day is scheduled at midnight.
+
+    The clock is the wall clock by default. `debut` and `vitesse` start it at
+    another time and make it run faster, for demonstrations and tests.
+
+    Args:
+        app_tracker (AppTracker): Users and simulation.
+        debut (datetime, optional): Time of the clock when the feed is created, now if None.
+        vitesse (float): Simulated seconds per real second.
+        executor (Executor, optional): Where the schedule is drawn and meals are simulated,
+            the default executor of the loop if None.
+    """
+
+    def __init__(self, app_tracker, debut: Optional[datetime] = None, vitesse: float = 1.0,
+                 executor: Optional[Executor] = None) -> None:
+        self.app_tracker = app_tracker
+        self.vitesse = vitesse
+        self.executor = executor
+        self._debut = debut
+        self._origine = time.monotonic()
+        self._heap = []
+        self._planifie = None
+        self._subscriptions = set()
+        self._task = None
+
+    def maintenant(self) -> datetime:
+        """
+        Get the current time of the feed's clock
+        """
+        if self._debut is None and self.vitesse == 1:
+            return datetime.now()
+        debut = self._debut or datetime.now()
+        return debut + timedelta(seconds=(time.monotonic() - self._origine) * self.vitesse)
+
+    def __len__(self):
+        """Number of meals still to come"""
+        return len(self._heap)
+
+    def subscribe(self, user_ids: Optional[Iterable[int]] = None, classes_mangeurs: Optional[Iterable[str]] = None,
+                  maxsize: int = 1000) -> Subscription:
+        """
+        Follow the meals of some users or eater classes (every meal without filter), starting the feed if needed.
+
+        Must be called from the event loop of the feed.
+        """
+        subscription = Subscription(user_ids, classes_mangeurs, maxsize)
+        self._subscriptions.add(subscription)
+        LIVE_SUBSCRIBERS.set(len(self._subscriptions))
+        self.start()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+        LIVE_SUBSCRIBERS.set(len(self._subscriptions))
+
+    def start(self) -> None:
+        """
+        Start the scheduler task on the running event loop, if it is not running yet
+        """
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def _planifier(self, business_date: date, depuis: datetime) -> list:
+        """
+        Get a new heap with the meals of `business_date` that come after `depuis` (runs in the executor)
+        """
+        registry = self.app_tracker.registry
+        if len(registry) > MAX_ROWS:
+            raise ValueError(f"The live feed handles at most {MAX_ROWS} users")
+        times = self.app_tracker.get_connection_times(business_date)
+        if (times['meal_id'] > MAX_MEAL_ID).any():
+            raise ValueError(f"The live feed handles meal ids up to {MAX_MEAL_ID}")
+        secondes = (times['heure_repas'] - np.datetime64(EPOCH, 's')).astype(np.int64)
+        decalages = secondes // 86400 - (business_date - EPOCH.date()).days
+        if (np.abs(decalages) > 1).any():
+            raise ValueError("Meals should be at most one day away from their business day")
+        a_venir = secondes >= int((depuis - EPOCH).total_seconds())
+        cles = encoder_cles(secondes[a_venir], registry.rows(times['user_id'][a_venir]), decalages[a_venir],
+                            times['meal_id'][a_venir])
+        heap = self._heap + cles.tolist()
+        heapq.heapify(heap)
+        return heap
+
+    async def _run(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            maintenant = self.maintenant()
+            jour = maintenant.date()
+            if self._planifie is None or self._planifie < jour:
+                # The day before may still have meals to come past midnight
+                if self._planifie is None:
+                    business_date = jour - timedelta(days=1)
+                else:
+                    business_date = self._planifie + timedelta(days=1)
+                self._heap = await loop.run_in_executor(self.executor, self._planifier, business_date, maintenant)
+                self._planifie = business_date
+                continue
+
+            # Wake up for the next meal, or at midnight to schedule the next day
+            attente = (datetime.combine(jour + timedelta(days=1), datetime.min.time()) - maintenant).total_seconds()
+            if self._heap:
+                attente = min(attente, (self._heap[0] >> 32) - (maintenant - EPOCH).total_seconds())
+            if attente > 0:
+                await asyncio.sleep(attente / self.vitesse)
+            else:
+                await self._publier(heapq.heappop(self._heap))
+
+    async def _publier(self, cle: int) -> None:
+        """
+        Simulate a meal that just happened and push it to the subscribers that follow it
+        """
+        secondes, row, decalage, meal_id = decoder_cle(cle)
+        registry = self.app_tracker.registry
+        user_id = int(registry.user_ids[row])
+        classe_mangeur = registry.vocab_classes[registry.classes[row]]
+        subscriptions = [subscription for subscription in self._subscriptions
+                         if subscription.accepte(user_id, classe_mangeur)]
+        if not subscriptions:
+            return
+
+        business_date = (EPOCH + timedelta(seconds=secondes)).date() - timedelta(days=decalage)
+        loop = asyncio.get_running_loop()
+        connexion = await loop.run_in_executor(self.executor, self.app_tracker.get_connexion, meal_id, business_date,
+                                               user_id)
+        # A meal without any food is not in the historical data either
+        if not connexion:
+            return
+        event = {
+            'date': business_date.isoformat(),
+            'user_id': user_id,
+            'classe_mangeur': classe_mangeur,
+            'meal_id': meal_id,
+            'heure_repas': connexion['heure_repas'][0],
+            'aliment_id': connexion['aliment_id'],
+            'quantity': connexion['quantity'],
+        }
+        for subscription in subscriptions:
+            subscription.put(event)
@@ -0,0 +1,178 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+# Upper bounds of the latency histograms, in seconds
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Durations of the stages of the current request, by stage, set per request by the API
+_request_timings: ContextVar[Optional[dict]] = ContextVar("request_timings", default=None)
+
+
+class Counter:
+    """
+    Monotonic counter, one value per combination of label values.
+    """
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple(str(labels[label]) for label in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(tuple(str(labels[label]) for label in self.labels), 0)
+
+    def exposition(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labels, key)} {value}")
+        return lines
+
+
+class Gauge(Counter):
+    """
+    Value that can go up and down, one per combination of label values.
+    """
+    kind = "gauge"
+
+    def set(self, value: float, **labels) -> None:
+        key = tuple(str(labels[label]) for label in self.labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    """
+    Histogram of observations with fixed buckets, one per combination of label values.
+    """
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = BUCKETS) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple(str(labels[label]) for label in self.labels)
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # Counts per bucket (the last one is +Inf), sum of the values
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def count(self, **labels) -> int:
+        series = self._series.get(tuple(str(labels[label]) for label in self.labels))
+        return 0 if series is None else sum(series[0])
+
+    def exposition(self) -> list:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumul = 0
+                for borne, count in zip(self.buckets + (float("inf"),), counts):
+                    cumul += count
+                    le = "+Inf" if borne == float("inf") else repr(borne)
+                    lines.append(f"{self.name}_bucket{_labels(self.labels + ('le',), key + (le,))} {cumul}")
+                lines.append(f"{self.name}_sum{_labels(self.labels, key)} {total}")
+                lines.append(f"{self.name}_count{_labels(self.labels, key)} {cumul}")
+        return lines
+
+
+def _labels(names: tuple, values: tuple) -> str:
+    if not names:
+        return ""
+    paires = ",".join(f'{name}="{_echapper(value)}"' for name, value in zip(names, values))
+    return "{" + paires + "}"
+
+
+def _echapper(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+STAGE_SECONDS = Histogram("sensor_api_stage_seconds", "Duration of a processing stage", ("stage",))
+REQUEST_SECONDS = Histogram("sensor_api_request_seconds", "Duration of a request", ("endpoint",))
+REQUESTS = Counter("sensor_api_requests_total", "Requests served, by endpoint and eater class",
+                   ("endpoint", "classe_mangeur"))
+STARTUP_SECONDS = Gauge("sensor_api_startup_seconds", "Duration of a startup stage", ("stage",))
+SINGLE_FLIGHT = Counter("sensor_api_single_flight_total",
+                        "Calls that started a computation (leader) or joined an identical one in flight (coalesced)",
+                        ("name", "outcome"))
+LIVE_EVENTS = Counter("sensor_api_live_events_total",
+                      "Live meal events delivered to a subscriber, or dropped because its queue was full",
+                      ("outcome",))
+LIVE_SUBSCRIBERS = Gauge("sensor_api_live_subscribers", "Subscribers of the live feed")
+
+METRICS = [STAGE_SECONDS, REQUEST_SECONDS, REQUESTS, STARTUP_SECONDS, SINGLE_FLIGHT, LIVE_EVENTS, LIVE_SUBSCRIBERS]
+
+
+@contextmanager
+def chrono(stage: str):
+    """
+    Time a stage: the duration goes to the stage histogram and to the timings of the current request.
+
+    Nested stages are all recorded, so a stage may include the time of another.
+    """
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        duree = time.perf_counter() - debut
+        STAGE_SECONDS.observe(duree, stage=stage)
+        timings = _request_timings.get()
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + duree
+
+
+def start_request() -> dict:
+    """
+    Start collecting the stage timings of a request, in the current context
+    """
+    timings = {}
+    _request_timings.set(timings)
+    return timings
+
+
+def server_timing(timings: dict, total: Optional[float] = None) -> str:
+    """
+    Format stage timings (in seconds) as a Server-Timing header value, in milliseconds
+    """
+    entries = [f"{stage};dur={duree * 1000:.3f}" for stage, duree in timings.items()]
+    if total is not None:
+        entries.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(entries)
+
+
+def exposition(cache_stats: Optional[dict] = None) -> str:
+    """
+    Get every metric in the Prometheus text format, with the counters of the activity cache
+    """
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.exposition())
+    if cache_stats is not None:
+        for name in ('hits', 'disk_hits', 'misses', 'evictions'):
+            lines.append(f"# HELP sensor_api_cache_{name}_total Activity cache {name.replace('_', ' ')}")
+            lines.append(f"# TYPE sensor_api_cache_{name}_total counter")
+            lines.append(f"sensor_api_cache_{name}_total {cache_stats[name]}")
+        for name in ('entries', 'bytes'):
+            lines.append(f"# HELP sensor_api_cache_{name} Activity cache {name} in memory")
+            lines.append(f"# TYPE sensor_api_cache_{name} gauge")
+            lines.append(f"sensor_api_cache_{name} {cache_stats[name]}")
+    return "\n".join(lines) + "\n"
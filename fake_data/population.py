@@ -0,0 +1,90 @@
+import numpy as np
+
+try:
+    from data_engineering.sensor_api.fake_data.registry import UserRegistry
+except ImportError:
+    from .registry import UserRegistry
+
+# Share of each eater class in a generated population
+CLASSES_MANGEURS = {
+    'standard': 0.45,
+    'meat_lover': 0.2,
+    'vegetarian': 0.15,
+    'vegan': 0.08,
+    'fasting': 0.07,
+    'random': 0.05,
+}
+
+PRENOMS = [
+    'Alice', 'Antoine', 'Basma', 'Benjamin', 'Camille', 'Catherine', 'Claire', 'Clara', 'Daniel', 'Emma',
+    'François', 'Guillaume', 'Hugo', 'Inès', 'Jade', 'Julien', 'Karl', 'Kevin', 'Léa', 'Louis',
+    'Lucas', 'Manon', 'Maria', 'Marine', 'Mathieu', 'Maurice', 'Nathan', 'Nina', 'Paul', 'Sarah',
+    'Taslima', 'Thomas', 'Wassim', 'Yasmine', 'Zoé',
+]
+
+NOMS = [
+    'Amar', 'Bachier', 'Bernard', 'Bonnet', 'Coulomb', 'de Mailly', 'Dubois', 'Dupont', 'Durand', 'Fatmi',
+    'Fontaine', 'Gaillard', 'Garcia', 'Girard', 'Lambert', 'Le Guellhi', 'Lecun', 'Lefebvre', 'Martin', 'Mercier',
+    'Moreau', 'Perrier', 'Petit', 'Richard', 'Roux', 'Sagnier', 'Sanchez', 'Tardy', 'Vesnat', 'Zarhioui',
+]
+
+# Users are drawn by blocks, so memory does not depend on the size of the population
+BLOCK_SIZE = 1 << 16
+
+
+def generer_population(n: int, seed: int = 0, classes_mangeurs: dict = None, premier_id: int = 1) -> UserRegistry:
+    """
+    Generate a synthetic population of users, deterministic for a seed.
+
+    Users get contiguous ids starting at `premier_id`, a first and last name,
+    an age between 18 and 79, a sex and an eater class drawn from
+    `classes_mangeurs`. Everything is drawn as NumPy arrays straight into a
+    `UserRegistry`, no `User` object is created.
+
+    Args:
+        n (int): Number of users.
+        seed (int): Seed of the random draws.
+        classes_mangeurs (dict): Share of each eater class, CLASSES_MANGEURS by default.
+        premier_id (int): Id of the first user.
+
+    Returns:
+        UserRegistry: The generated users.
+    """
+    classes_mangeurs = CLASSES_MANGEURS if classes_mangeurs is None else classes_mangeurs
+    vocab_classes = sorted(classes_mangeurs)
+    parts = np.array([classes_mangeurs[classe_mangeur] for classe_mangeur in vocab_classes], dtype=np.float64)
+    if parts.min() < 0 or parts.sum() <= 0:
+        raise ValueError("Eater class shares should be positive")
+    cumul = np.cumsum(parts / parts.sum())
+    vocab_sexes = ['f', 'm']
+
+    ages = np.empty(n, dtype=np.int16)
+    sexes = np.empty(n, dtype=np.int8)
+    classes = np.empty(n, dtype=np.int8)
+    noms = np.empty(n, dtype=np.int32)
+    prenoms = np.empty(n, dtype=np.int32)
+
+    # One random stream per block, seeded from the seed and the block number. Whole blocks are
+    # drawn, so a user is the same whatever the size of the population
+    for bloc, debut in enumerate(range(0, n, BLOCK_SIZE)):
+        taille = min(BLOCK_SIZE, n - debut)
+        rng = np.random.Generator(np.random.PCG64(np.random.SeedSequence([seed, bloc])))
+        ages[debut:debut + taille] = rng.integers(18, 80, BLOCK_SIZE, dtype=np.int16)[:taille]
+        sexes[debut:debut + taille] = rng.integers(0, len(vocab_sexes), BLOCK_SIZE, dtype=np.int8)[:taille]
+        tirages = cumul.searchsorted(rng.random(BLOCK_SIZE)[:taille], side='right')
+        classes[debut:debut + taille] = np.minimum(tirages, len(vocab_classes) - 1)
+        noms[debut:debut + taille] = rng.integers(0, len(NOMS), BLOCK_SIZE, dtype=np.int32)[:taille]
+        prenoms[debut:debut + taille] = rng.integers(0, len(PRENOMS), BLOCK_SIZE, dtype=np.int32)[:taille]
+
+    return UserRegistry(
+        user_ids=np.arange(premier_id, premier_id + n, dtype=np.int64),
+        ages=ages,
+        sexes=sexes,
+        classes=classes,
+        noms=noms,
+        prenoms=prenoms,
+        vocab_sexes=vocab_sexes,
+        vocab_classes=vocab_classes,
+        vocab_noms=NOMS,
+        vocab_prenoms=PRENOMS,
+    )
@@ -0,0 +1,226 @@
+import hashlib
+
+import numpy as np
+
+try:
+    from data_engineering.sensor_api.fake_data.sensor import create_user_instance, facteur_calories
+except ImportError:
+    from .sensor import create_user_instance, facteur_calories
+
+
+class UserRecord:
+    """
+    Lightweight, read-only description of a user, without its eating behaviour.
+    """
+    __slots__ = ('user_id', 'nom', 'prenom', 'age', 'sexe', 'classe_mangeur')
+
+    def __init__(self, user_id: int, nom: str, prenom: str, age: int, sexe: str, classe_mangeur: str) -> None:
+        self.user_id = user_id
+        self.nom = nom
+        self.prenom = prenom
+        self.age = age
+        self.sexe = sexe
+        self.classe_mangeur = classe_mangeur
+
+    def __repr__(self):
+        return (f"UserRecord(nom={self.nom}, prenom={self.prenom}, age={self.age}, sexe={self.sexe}, "
+                f"user_id={self.user_id}, classe_mangeur={self.classe_mangeur})")
+
+    def to_dict(self) -> dict:
+        """
+        Get the user as the dictionary expected by `create_user_instance`
+        """
+        return {
+            'nom': self.nom,
+            'prenom': self.prenom,
+            'age': self.age,
+            'sexe': self.sexe,
+            'user_id': self.user_id,
+            'classe_mangeur': self.classe_mangeur,
+        }
+
+
+class UserRegistry:
+    """
+    Columnar store of users, indexed by user_id.
+
+    Users are kept as NumPy arrays: ids, ages, and codes into small
+    vocabularies for names, sexes and eater classes. Looking a user up by id
+    is O(1): plain arithmetic when ids are contiguous, a dictionary otherwise.
+    `User` objects are only created when a user is looked up with `get`, and
+    are not kept: a `User` is a few fields around the shared `EaterProfile`
+    of its class, so creating one is cheaper than keeping millions of them.
+
+    Args:
+        user_ids (np.ndarray): User ids, unique.
+        ages (np.ndarray): Ages.
+        sexes (np.ndarray): Codes into `vocab_sexes`.
+        classes (np.ndarray): Codes into `vocab_classes`.
+        noms (np.ndarray): Codes into `vocab_noms`.
+        prenoms (np.ndarray): Codes into `vocab_prenoms`.
+        vocab_sexes (list): Sex values.
+        vocab_classes (list): Eater classes.
+        vocab_noms (list): Last names.
+        vocab_prenoms (list): First names.
+    """
+
+    def __init__(self, user_ids, ages, sexes, classes, noms, prenoms,
+                 vocab_sexes: list, vocab_classes: list, vocab_noms: list, vocab_prenoms: list) -> None:
+        self.user_ids = np.asarray(user_ids, dtype=np.int64)
+        self.ages = np.asarray(ages, dtype=np.int16)
+        self.sexes = np.asarray(sexes, dtype=np.int8)
+        self.classes = np.asarray(classes, dtype=np.int8)
+        self.noms = np.asarray(noms, dtype=np.int32)
+        self.prenoms = np.asarray(prenoms, dtype=np.int32)
+        self.vocab_sexes = list(vocab_sexes)
+        self.vocab_classes = list(vocab_classes)
+        self.vocab_noms = list(vocab_noms)
+        self.vocab_prenoms = list(vocab_prenoms)
+
+        # Contiguous ids need no index at all
+        n = len(self.user_ids)
+        self._premier_id = int(self.user_ids[0]) if n else 0
+        if n and np.array_equal(self.user_ids, np.arange(self._premier_id, self._premier_id + n)):
+            self._index = None
+        else:
+            self._index = {user_id: row for row, user_id in enumerate(self.user_ids.tolist())}
+            if len(self._index) != n:
+                raise ValueError("Duplicate user_id in the user registry")
+
+        self._empreinte = None
+
+    @classmethod
+    def from_records(cls, user_data: list) -> "UserRegistry":
+        """
+        Build a registry from user dictionaries, as read by `create_users_from_excel`
+        """
+        vocabs = {}
+        codes = {}
+        for key in ('sexe', 'classe_mangeur', 'nom', 'prenom'):
+            values = np.array([str(user[key]) for user in user_data], dtype=str)
+            vocabs[key], codes[key] = np.unique(values, return_inverse=True)
+        return cls(
+            user_ids=[user['user_id'] for user in user_data],
+            ages=[user['age'] for user in user_data],
+            sexes=codes['sexe'],
+            classes=codes['classe_mangeur'],
+            noms=codes['nom'],
+            prenoms=codes['prenom'],
+            vocab_sexes=vocabs['sexe'].tolist(),
+            vocab_classes=vocabs['classe_mangeur'].tolist(),
+            vocab_noms=vocabs['nom'].tolist(),
+            vocab_prenoms=vocabs['prenom'].tolist(),
+        )
+
+    def __len__(self):
+        return len(self.user_ids)
+
+    def __contains__(self, user_id):
+        return self.row(user_id) is not None
+
+    def __iter__(self):
+        return self.iter_records()
+
+    @property
+    def empreinte(self) -> str:
+        """
+        Getter for the SHA-256 of the users (ids, ages, sexes, classes, names), computed once
+        """
+        if self._empreinte is None:
+            digest = hashlib.sha256()
+            for values, vocab in ((self.user_ids, None), (self.ages, None), (self.sexes, self.vocab_sexes),
+                                  (self.classes, self.vocab_classes), (self.noms, self.vocab_noms),
+                                  (self.prenoms, self.vocab_prenoms)):
+                # Codes only mean something with their vocabulary
+                digest.update(np.ascontiguousarray(values).tobytes())
+                if vocab is not None:
+                    digest.update("\x1f".join(map(str, vocab)).encode())
+            self._empreinte = digest.hexdigest()
+        return self._empreinte
+
+    def row(self, user_id: int):
+        """
+        Get the row of a user, or None if the user is unknown
+        """
+        if self._index is not None:
+            return self._index.get(user_id)
+        row = user_id - self._premier_id
+        return row if 0 <= row < len(self.user_ids) else None
+
+    def record(self, user_id: int):
+        """
+        Get the description of a user, or None if the user is unknown
+        """
+        row = self.row(user_id)
+        return None if row is None else self._record(row)
+
+    def _record(self, row: int) -> UserRecord:
+        return UserRecord(
+            user_id=int(self.user_ids[row]),
+            nom=self.vocab_noms[self.noms[row]],
+            prenom=self.vocab_prenoms[self.prenoms[row]],
+            age=int(self.ages[row]),
+            sexe=self.vocab_sexes[self.sexes[row]],
+            classe_mangeur=self.vocab_classes[self.classes[row]],
+        )
+
+    def classe_mangeur(self, user_id: int):
+        """
+        Get the eater class of a user, or None if the user is unknown
+        """
+        row = self.row(user_id)
+        return None if row is None else self.vocab_classes[self.classes[row]]
+
+    def get(self, user_id: int):
+        """
+        Get a new User instance of a user, or None if the user is unknown
+        """
+        row = self.row(user_id)
+        if row is None:
+            return None
+        return create_user_instance(self._record(row).to_dict())
+
+    def user_ids_de_classe(self, classe_mangeur: str = None) -> np.ndarray:
+        """
+        Get the ids of every user of an eater class (all users if None)
+        """
+        if classe_mangeur is None:
+            return self.user_ids
+        if classe_mangeur not in self.vocab_classes:
+            return self.user_ids[:0]
+        return self.user_ids[self.classes == self.vocab_classes.index(classe_mangeur)]
+
+    def facteurs_calories(self, user_ids) -> np.ndarray:
+        """
+        Get the calorie factor of many users at once
+        """
+        facteurs = np.array([facteur_calories(sexe) for sexe in self.vocab_sexes], dtype=np.float64)
+        return facteurs[self.sexes[self.rows(user_ids)]]
+
+    def rows(self, user_ids) -> np.ndarray:
+        """
+        Get the rows of many users at once, raising KeyError for an unknown user
+        """
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        if self._index is None:
+            rows = user_ids - self._premier_id
+            unknown = (rows < 0) | (rows >= len(self.user_ids))
+        else:
+            rows = np.array([self._index.get(user_id, -1) for user_id in user_ids.tolist()], dtype=np.int64)
+            unknown = rows < 0
+        if unknown.any():
+            raise KeyError(f"Unknown user_id: {user_ids[unknown][0]}")
+        return rows
+
+    def iter_records(self, classe_mangeur: str = None):
+        """
+        Iterate over user descriptions (optionally of one eater class) without creating User objects
+        """
+        if classe_mangeur is None:
+            rows = range(len(self.user_ids))
+        elif classe_mangeur in self.vocab_classes:
+            rows = np.flatnonzero(self.classes == self.vocab_classes.index(classe_mangeur)).tolist()
+        else:
+            rows = []
+        for row in rows:
+            yield self._record(row)
@@ -0,0 +1,272 @@
+import argparse
+import contextlib
+import heapq
+import json
+import os
+import socket
+import sys
+import time
+from bisect import bisect_left
+from datetime import date, datetime, timedelta
+from typing import Iterator, Optional
+
+import numpy as np
+
+try:
+    from data_engineering.sensor_api.fake_data import create_app, workers
+    from data_engineering.sensor_api.fake_data.app_tracker import AppTracker
+    from data_engineering.sensor_api.fake_data.export import parse_users
+except ImportError:
+    from . import create_app, workers
+    from .app_tracker import AppTracker
+    from .export import parse_users
+
+# Accepted speed factors
+MIN_SPEED, MAX_SPEED = 1, 10000
+
+
+def cle(event: dict) -> tuple:
+    """
+    Order of the replayed events: time, then user
+    """
+    return event['heure_repas'], event['user_id']
+
+
+def evenements_jour(app_tracker: AppTracker, business_date: date, connexion_day: dict) -> list:
+    """
+    Turn the simulated rows of many users into meal events, in time order.
+
+    Rows are grouped by user, and each user's meals are sorted by time, then
+    the users are merged (k-way merge) into one list for the day.
+    """
+    registry = app_tracker.registry
+    par_user = []
+    meals = []
+    user_ids, meal_ids = connexion_day['user_id'], connexion_day['meal_id']
+    debut = 0
+    for i in range(1, len(user_ids) + 1):
+        if i < len(user_ids) and user_ids[i] == user_ids[debut] and meal_ids[i] == meal_ids[debut]:
+            continue
+        user_id = int(user_ids[debut])
+        meals.append({
+            'date': business_date.isoformat(),
+            'user_id': user_id,
+            'classe_mangeur': registry.classe_mangeur(user_id),
+            'meal_id': int(meal_ids[debut]),
+            'heure_repas': str(connexion_day['heure_repas'][debut]),
+            'aliment_id': connexion_day['aliment_id'][debut:i],
+            'quantity': connexion_day['quantity'][debut:i],
+        })
+        # Last meal of the user: its meals are sorted and queued for the merge
+        if i == len(user_ids) or user_ids[i] != user_id:
+            meals.sort(key=cle)
+            par_user.append(meals)
+            meals = []
+        debut = i
+    return list(heapq.merge(*par_user, key=cle))
+
+
+def iter_jours(app_tracker: AppTracker, start: date, end: date, user_ids=None,
+               chunk_size: int = 1000) -> Iterator[list]:
+    """
+    Simulate the days of a range in the worker processes, the next day while the current one is consumed.
+
+    Yields:
+        list: The meal events of a day, in time order.
+    """
+    user_ids = app_tracker.registry.user_ids if user_ids is None else np.asarray(user_ids, dtype=np.int64)
+    chunks = [user_ids[i:i + chunk_size].tolist() for i in range(0, len(user_ids), chunk_size)]
+    pool = app_tracker.pool
+
+    def soumettre(business_date):
+        if business_date > end:
+            return business_date, []
+        return business_date, [pool.submit(workers.simulate_users, chunk, business_date) for chunk in chunks]
+
+    suivant = soumettre(start)
+    while suivant[0] <= end:
+        business_date, futures = suivant
+        suivant = soumettre(business_date + timedelta(days=1))
+        connexion_day = {key: [] for key in workers.COLUMNS}
+        for future in futures:
+            result = future.result()
+            for key in workers.COLUMNS:
+                connexion_day[key].extend(result[key])
+        yield evenements_jour(app_tracker, business_date, connexion_day)
+
+
+def evenements(app_tracker: AppTracker, start: date, end: date, user_ids=None,
+               chunk_size: int = 1000) -> Iterator[dict]:
+    """
+    Yield the meal events of many users over a date range, in global time order.
+
+    Days are simulated one at a time. A day's late meals (past midnight) are
+    held back and merged with the next day, so memory holds about two days
+    of events whatever the length of the range.
+
+    Args:
+        app_tracker (AppTracker): The users and the worker processes.
+        start (date): First day (included).
+        end (date): Last day (included).
+        user_ids (list, optional): Users to replay, all of them if None.
+        chunk_size (int): Number of users per task of the worker processes.
+
+    Yields:
+        dict: A meal: date, user_id, classe_mangeur, meal_id, heure_repas, aliment_id and quantity.
+    """
+    reste = []
+    for jour in iter_jours(app_tracker, start, end, user_ids, chunk_size):
+        if not jour:
+            continue
+        # What is left of the previous days before this day's first meal is final
+        coupure = bisect_left(reste, cle(jour[0]), key=cle)
+        yield from reste[:coupure]
+        reste = list(heapq.merge(reste[coupure:], jour, key=cle))
+    yield from reste
+
+
+@contextlib.contextmanager
+def ouvrir_sortie(spec: str):
+    """
+    Open where events are written: "-" for stdout, "tcp://host:port" for a socket, or a file path
+    """
+    if spec == "-":
+        yield sys.stdout.buffer
+        sys.stdout.buffer.flush()
+    elif spec.startswith("tcp://"):
+        host, _, port = spec[len("tcp://"):].rpartition(":")
+        with socket.create_connection((host, int(port))) as connection:
+            with connection.makefile("wb") as sortie:
+                yield sortie
+    else:
+        with open(spec, "wb") as sortie:
+            yield sortie
+
+
+def replay(app_tracker: AppTracker, start: date, end: date, sortie, user_ids=None, speed: Optional[float] = None,
+           chunk_size: int = 1000, log=print) -> dict:
+    """
+    Replay the meal events of a date range as NDJSON, on a clock running `speed` times faster than real time.
+
+    The first event is written at once and every other one when the replay
+    clock reaches its time; with `speed` None, events are written as fast as
+    they are simulated. Writes are buffered and flushed whenever the replay
+    waits, so a paced consumer gets every event on time.
+
+    Args:
+        app_tracker (AppTracker): The users and the worker processes.
+        start (date): First day (included).
+        end (date): Last day (included).
+        sortie: Binary file the events are written to.
+        user_ids (list, optional): Users to replay, all of them if None.
+        speed (float, optional): Replayed seconds per real second (1 to 10000), None for as fast as possible.
+        chunk_size (int): Number of users per task of the worker processes.
+        log: Function called with progress messages.
+
+    Returns:
+        dict: Counters of the replay (events, seconds, events_per_second, max_lag in seconds).
+
+    Raises:
+        ValueError: If `speed` is not between MIN_SPEED and MAX_SPEED.
+    """
+    if speed is not None and not MIN_SPEED <= speed <= MAX_SPEED:
+        raise ValueError(f"The speed should be between {MIN_SPEED} and {MAX_SPEED}, or None: {speed}")
+    stats = {'events': 0, 'seconds': 0.0, 'events_per_second': 0.0, 'max_lag': 0.0}
+    debut = time.perf_counter()
+    dernier_log = debut
+    # The replay clock starts at the first event, once its day is simulated
+    origine = depart = None
+    heure = None
+
+    for event in evenements(app_tracker, start, end, user_ids, chunk_size):
+        heure = event['heure_repas']
+        if speed is not None:
+            instant = datetime.fromisoformat(heure)
+            if origine is None:
+                origine, depart = instant, time.perf_counter()
+            attente = depart + (instant - origine).total_seconds() / speed - time.perf_counter()
+            if attente > 0.001:
+                sortie.flush()
+                time.sleep(attente)
+            else:
+                stats['max_lag'] = max(stats['max_lag'], -attente)
+        sortie.write(json.dumps(event).encode() + b"\n")
+        stats['events'] += 1
+
+        maintenant = time.perf_counter()
+        if maintenant - dernier_log >= 1:
+            dernier_log = maintenant
+            log(progress(stats, maintenant - debut, heure))
+
+    sortie.flush()
+    stats['seconds'] = time.perf_counter() - debut
+    stats['events_per_second'] = stats['events'] / max(stats['seconds'], 1e-9)
+    log(progress(stats, stats['seconds'], heure))
+    return stats
+
+
+def progress(stats: dict, seconds: float, heure: Optional[str]) -> str:
+    """
+    Format the throughput of a replay
+    """
+    seconds = max(seconds, 1e-9)
+    return (f"{stats['events']} events, {stats['events'] / seconds:.0f} events/s, replay clock {heure}, "
+            f"max lag {stats['max_lag']:.3f} s")
+
+
+def parse_speed(value: str) -> Optional[float]:
+    """
+    Parse the speed of a replay: a factor from 1 to 10000 such as 60 or 60x, or "max"
+    """
+    if value == "max":
+        return None
+    try:
+        speed = float(value.removesuffix("x"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid speed: {value}")
+    if not MIN_SPEED <= speed <= MAX_SPEED:
+        raise argparse.ArgumentTypeError(f"the speed should be between {MIN_SPEED} and {MAX_SPEED}, or max: {value}")
+    return speed
+
+
+def main(argv=None) -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m fake_data.replay",
+        description="Replay simulated meal events in time order as NDJSON, in compressed time")
+    parser.add_argument("--start", required=True, type=date.fromisoformat, help="First day, YYYY-MM-DD")
+    parser.add_argument("--end", required=True, type=date.fromisoformat, help="Last day, YYYY-MM-DD")
+    parser.add_argument("--users", default="all", help='User ids such as "1-20,25" (default: all)')
+    parser.add_argument("--speed", type=parse_speed, default=None,
+                        help='Replayed seconds per real second, 1 to 10000, or "max" (default)')
+    parser.add_argument("--out", default="-", help='"-" for stdout (default), a file, or tcp://host:port')
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="Number of users per worker task")
+    args = parser.parse_args(argv)
+
+    if args.end < args.start:
+        parser.error("--end should be after --start")
+    try:
+        user_ids = parse_users(args.users)
+    except ValueError:
+        parser.error(f"Invalid --users: {args.users}")
+
+    app_tracker = create_app()
+    app_tracker.max_workers = args.workers or os.cpu_count() or 1
+    if user_ids is not None:
+        try:
+            app_tracker.registry.rows(user_ids)
+        except KeyError as error:
+            parser.error(str(error))
+    try:
+        with ouvrir_sortie(args.out) as sortie:
+            replay(app_tracker, args.start, args.end, sortie, user_ids, args.speed, args.chunk_size,
+                   log=lambda message: print(message, file=sys.stderr))
+    except BrokenPipeError:
+        # The consumer went away (| head): silence the flush of stdout at exit
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+    finally:
+        app_tracker.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+import numpy as np
+
+try:
+    from data_engineering.sensor_api.fake_data.catalog import FoodCatalog
+except ImportError:
+    from .catalog import FoodCatalog
+
+# Vectorized draws of the per-user simulation, on the generators of `User.generateurs`
+
+
+def tirer_selon(np_rng: np.random.RandomState, probabilites: np.ndarray, n: int) -> np.ndarray:
+    """
+    Draw `n` indices with replacement following `probabilites`, by inverting their cumulative sums.
+
+    This is what `np_rng.choice(len(probabilites), size=n, p=probabilites)`
+    does for a legacy `RandomState` once `p` is validated: same uniform
+    draws, same indices, without the validation or an array of values to
+    index. Type probabilities are drawn again for every meal, so there is no
+    fixed distribution to build an alias table for; one cumulative sum per
+    meal and a binary search per draw are the whole cost.
+
+    Args:
+        np_rng (np.random.RandomState): Generator to draw from.
+        probabilites (np.ndarray): Non-negative weights, normalized or not.
+        n (int): Number of draws.
+
+    Returns:
+        np.ndarray: The drawn indices.
+
+    Raises:
+        ValueError: If every weight is zero, as `choice` does.
+    """
+    cdf = np.cumsum(probabilites, dtype=np.float64)
+    if not cdf[-1] > 0:
+        raise ValueError("probabilities do not sum to 1")
+    cdf /= cdf[-1]
+    return cdf.searchsorted(np_rng.random_sample(n), side='right')
+
+
+def tirer_aliments(np_rng: np.random.RandomState, catalog: FoodCatalog, types_aliments) -> np.ndarray:
+    """
+    Draw one food of each type, uniformly among the foods of that type, in O(1) per food.
+
+    Foods of a type are a contiguous range of `catalog.positions_par_type`:
+    one uniform draw scaled to the size of the range picks a food, where
+    `np_rng.choice(n, size=1, replace=False)` shuffles the whole range.
+
+    Args:
+        np_rng (np.random.RandomState): Generator to draw from.
+        catalog (FoodCatalog): The food catalog.
+        types_aliments: Food types, one food is drawn for each.
+
+    Returns:
+        np.ndarray: Catalog positions of the drawn foods, -1 for types without any food in the catalog.
+    """
+    codes = np.array([catalog.codes_types.get(type_aliment, -1) for type_aliment in types_aliments], dtype=np.int64)
+    effectifs = catalog.effectifs[codes]
+    offsets = (np_rng.random_sample(len(codes)) * effectifs).astype(np.int64)
+    positions = catalog.positions_par_type[np.minimum(catalog.debuts[codes] + offsets,
+                                                      len(catalog.positions_par_type) - 1)]
+    return np.where(effectifs > 0, positions, -1)
@@ -1,18 +1,303 @@
-import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta, date
+from datetime import datetime, timedelta, date, time
+from functools import lru_cache
+from types import MappingProxyType
 import random
-import openpyxl
 import os
+import threading
+
+try:
+    from data_engineering.sensor_api.fake_data.assets import empreinte, load_columns, load_table
+    from data_engineering.sensor_api.fake_data.catalog import FoodCatalog
+    from data_engineering.sensor_api.fake_data.metrics import chrono
+    from data_engineering.sensor_api.fake_data.sampling import tirer_aliments, tirer_selon
+except ImportError:
+    from .assets import empreinte, load_columns, load_table
+    from .catalog import FoodCatalog
+    from .metrics import chrono
+    from .sampling import tirer_aliments, tirer_selon
 
 # Path to the directory containing this script
 current_dir = os.path.abspath(os.path.dirname(__file__))
 
+# Changes whenever the same (user_id, date) would give a different simulated day
+SIMULATION_VERSION = "daily-3"
+
+# Food types that can be eaten in several portions, per eater class (None: every type)
+TYPES_PORTIONS_MULTIPLES = {
+    'meat_lover': ['Viande', 'Poisson', 'Oeuf'],
+    'vegan': ['Légumes', 'Fruit', 'Légumineuse'],
+    'vegetarian': ['Légumes', 'Fruit', 'Légumineuse'],
+    'standard': ['viande', 'poisson', 'oeuf', 'Légumes', 'Fruit', 'Légumineuse'],
+    'random': None,
+}
+
+
+@lru_cache(maxsize=None)
+def heure_du_jour(heure: str) -> time:
+    """
+    Parse a meal time such as '12:30', once per distinct value
+    """
+    return datetime.strptime(heure, '%H:%M').time()
+
+
+def facteur_calories(sexe: str) -> float:
+    """
+    Get the calorie factor of a sex: men eat 20% more
+    """
+    return 1.2 if sexe == 'homme' else 1.0
+
+
+def _lecture_seule(array: np.ndarray) -> np.ndarray:
+    array.flags.writeable = False
+    return array
+
+
+class EaterProfile:
+    """
+    Eating behaviour of an eater class, shared by all its users (flyweight).
+
+    Meal times (parsed once), calorie bounds and the per-meal probabilities
+    of the class workbook are held once per class and process, as read-only
+    NumPy arrays indexed like `repas`, instead of once per user. The
+    workbook is only read when the probabilities are first needed, so
+    creating a user does no I/O, and the tables are built again when the
+    workbook's modification time changes, as `load_columns` does. A profile
+    is not modified otherwise.
+
+    Args:
+        classe_mangeur (str): The eater class.
+        type_food_file (str): Workbook of the food type probabilities per meal.
+        heures_repas (dict): Time of each meal ('HH:MM'), by meal number.
+        intervalles_calories (dict): (min, max) calories of each meal, by meal number.
+    """
+    __slots__ = ('classe_mangeur', 'type_food_file', 'heures_repas', 'intervalles_calories', 'repas', 'heures',
+                 'minutes', 'calories_min', 'calories_max', 'variation', 'portions_multiples', 'types_multiples',
+                 '_tables', '_lock')
+
+    def __init__(self, classe_mangeur: str, type_food_file: str, heures_repas: dict,
+                 intervalles_calories: dict) -> None:
+        self.classe_mangeur = classe_mangeur
+        self.type_food_file = type_food_file
+        self.heures_repas = MappingProxyType(dict(heures_repas))
+        self.intervalles_calories = MappingProxyType(dict(intervalles_calories))
+        self.repas = tuple(heures_repas)
+        self.heures = MappingProxyType({repas: heure_du_jour(heure) for repas, heure in heures_repas.items()})
+        self.minutes = _lecture_seule(np.array([heure.hour * 60 + heure.minute for heure in self.heures.values()],
+                                               dtype=np.int64))
+        self.calories_min = _lecture_seule(np.array([intervalles_calories[repas][0] for repas in self.repas],
+                                                    dtype=np.float64))
+        self.calories_max = _lecture_seule(np.array([intervalles_calories[repas][1] for repas in self.repas],
+                                                    dtype=np.float64))
+        # Range of the random variation of meal times, in minutes
+        self.variation = (-60, 300) if classe_mangeur == 'random' else (-60, 60)
+        self.portions_multiples = classe_mangeur in TYPES_PORTIONS_MULTIPLES
+        types_multiples = TYPES_PORTIONS_MULTIPLES.get(classe_mangeur)
+        self.types_multiples = None if types_multiples is None else frozenset(types_multiples)
+        self._tables = None
+        self._lock = threading.Lock()
+
+    def __repr__(self):
+        return f"EaterProfile(classe_mangeur={self.classe_mangeur}, repas={list(self.heures_repas.items())})"
+
+    @property
+    def probabilites(self) -> dict:
+        """
+        Getter for the probability table of the class, as NumPy columns (reads the workbook once per process)
+        """
+        return load_columns(self.type_food_file)
+
+    @property
+    def probabilites_df(self):
+        """
+        Getter for the probability table of the class as a DataFrame (imports pandas)
+        """
+        return load_table(self.type_food_file)
+
+    def charger(self) -> None:
+        """
+        Read the class workbook now rather than on the first simulation
+        """
+        if self.repas:
+            self._charger()
+
+    def _charger(self) -> tuple:
+        # `load_columns` returns new columns when the workbook's mtime changes: the tables follow them
+        probabilites = self.probabilites
+        cached = self._tables
+        if cached is None or cached[0] is not probabilites:
+            with self._lock:
+                cached = self._tables
+                if cached is None or cached[0] is not probabilites:
+                    types = probabilites['Types']
+                    moyennes = np.empty((len(self.repas), len(types)), dtype=np.float64)
+                    ecarts_types = np.empty_like(moyennes)
+                    for m, repas in enumerate(self.repas):
+                        moyennes[m] = probabilites[f'Meal_{repas}_avg']
+                        ecarts_types[m] = probabilites[f'Meal_{repas}_std']
+                    moyennes_par_type = []
+                    for m in range(len(self.repas)):
+                        moyenne_par_type = {}
+                        for type_aliment, moyenne in zip(types.tolist(), moyennes[m].tolist()):
+                            moyenne_par_type.setdefault(type_aliment, moyenne)
+                        moyennes_par_type.append(MappingProxyType(moyenne_par_type))
+                    tables = (types, _lecture_seule(moyennes), _lecture_seule(ecarts_types), tuple(moyennes_par_type))
+                    cached = (probabilites, tables, empreinte(self.type_food_file))
+                    self._tables = cached
+        return cached[1]
+
+    @property
+    def empreinte(self) -> str:
+        """
+        Getter for the SHA-256 of the class workbook, computed again when its mtime changes ('' without meals)
+        """
+        if not self.repas:
+            return ""
+        self._charger()
+        return self._tables[2]
+
+    @property
+    def types(self) -> np.ndarray:
+        """
+        Getter for the food types of the probability table
+        """
+        return self._charger()[0]
+
+    @property
+    def moyennes(self) -> np.ndarray:
+        """
+        Getter for the mean probability of every type, one row per meal of `repas`
+        """
+        return self._charger()[1]
+
+    @property
+    def ecarts_types(self) -> np.ndarray:
+        """
+        Getter for the standard deviation of the probability of every type, one row per meal of `repas`
+        """
+        return self._charger()[2]
+
+    def table_repas(self, repas):
+        """
+        Get the probability table of a meal as arrays.
+
+        Args:
+            repas (int): The meal number
+
+        Returns:
+            tuple: Food types, mean and standard deviation of their probabilities (np.ndarray),
+                and the mean probability of each type (mapping, first row of a type wins).
+        """
+        types, moyennes, ecarts_types, moyennes_par_type = self._charger()
+        m = self.repas.index(repas)
+        return types, moyennes[m], ecarts_types[m], moyennes_par_type[m]
+
+
+# Profiles of the eater classes, shared by all their users
+PROFILS = {profil.classe_mangeur: profil for profil in [
+    EaterProfile('standard', "standard_class.XLSX",
+                 heures_repas={
+                     1: '08:00',  # breakfast
+                     2: '12:00',  # lunch
+                     3: '16:00',  # snack
+                     4: '20:00',  # dinner
+                 },
+                 intervalles_calories={
+                     1: (300, 500),  # breakfast
+                     2: (600, 800),  # lunch
+                     3: (200, 300),  # snack
+                     4: (500, 700),  # dinner
+                 }),
+    EaterProfile('meat_lover', "meat_lover_class.XLSX",
+                 heures_repas={
+                     1: '08:00',  # breakfast
+                     2: '12:00',  # lunch
+                     3: '16:00',  # snack
+                     4: '20:00',  # dinner
+                 },
+                 intervalles_calories={
+                     1: (400, 600),  # breakfast
+                     2: (700, 900),  # lunch
+                     3: (300, 500),  # snack
+                     4: (600, 800),  # dinner
+                 }),
+    EaterProfile('vegetarian', "vegetarian_class.XLSX",
+                 heures_repas={
+                     1: '08:00',  # breakfast
+                     2: '12:00',  # lunch
+                     3: '16:00',  # snack
+                     4: '20:00',  # dinner
+                 },
+                 intervalles_calories={
+                     1: (300, 400),  # breakfast
+                     2: (500, 700),  # lunch
+                     3: (100, 200),  # snack
+                     4: (450, 600),  # dinner
+                 }),
+    EaterProfile('vegan', "vegan_class.XLSX",
+                 heures_repas={
+                     1: '08:00',  # breakfast
+                     2: '12:00',  # lunch
+                     3: '16:00',  # snack
+                     4: '20:00',  # dinner
+                 },
+                 intervalles_calories={
+                     1: (250, 350),  # breakfast
+                     2: (500, 700),  # lunch
+                     3: (100, 200),  # snack
+                     4: (400, 500),  # dinner
+                 }),
+    EaterProfile('fasting', "fasting_class.XLSX",
+                 heures_repas={
+                     1: '12:00',  # lunch
+                     2: '18:00',  # dinner
+                 },
+                 intervalles_calories={
+                     1: (1000, 1200),  # lunch
+                     2: (800, 1000),  # dinner
+                 }),
+    EaterProfile('random', "random_eater_class.XLSX",
+                 heures_repas={
+                     1: '13:00',
+                 },
+                 intervalles_calories={
+                     1: (900, 4500),  # breakfast
+                 }),
+]}
+
+# Profiles without any meal, for users of other classes
+_profils_sans_repas = {}
+
+
+def get_profile(classe_mangeur: str, type_food_file: str = None) -> EaterProfile:
+    """
+    Get the shared profile of an eater class.
+
+    Args:
+        classe_mangeur (str): The eater class.
+        type_food_file (str, optional): Workbook of the class, for classes without a predefined profile.
+
+    Returns:
+        EaterProfile: The profile of the class, one without meals if the class is unknown.
+    """
+    profil = PROFILS.get(classe_mangeur)
+    if profil is None:
+        profil = _profils_sans_repas.get((classe_mangeur, type_food_file))
+        if profil is None:
+            profil = _profils_sans_repas.setdefault((classe_mangeur, type_food_file),
+                                                    EaterProfile(classe_mangeur, type_food_file, {}, {}))
+    return profil
+
+
 # Base User class
 class User:
     """
     Class User
+
+    A user only holds what is their own (identity, calorie factor); the
+    eating behaviour of their class is a shared `EaterProfile`.
     """
+    __slots__ = ('nom', 'prenom', 'age', 'sexe', 'user_id', 'facteur_calories', 'profil')
 
     def __init__(self,
                  nom: str,
@@ -31,18 +316,87 @@ class User:
         self.age = age
         self.sexe = sexe
         self.user_id = user_id
-        self.classe_mangeur = classe_mangeur
-        self.facteur_calories = 1.2 if sexe == 'homme' else 1.0
-        self.heures_repas = {}
-        self.intervalles_calories = {}
-        self.type_food_file = type_food  # Replace with actual path
-        self.probabilites_df = pd.read_excel(self.type_food_file)
-        self.aliments_consomme = []
+        self.facteur_calories = facteur_calories(sexe)
+        self.profil = get_profile(classe_mangeur, type_food)
 
     def __repr__(self):
         return (f"User(nom={self.nom}, prenom={self.prenom}, age={self.age}, sexe={self.sexe}, "
                 f"user_id={self.user_id}, classe_mangeur={self.classe_mangeur})")
 
+    @property
+    def classe_mangeur(self) -> str:
+        return self.profil.classe_mangeur
+
+    @property
+    def type_food_file(self) -> str:
+        return self.profil.type_food_file
+
+    @property
+    def heures_repas(self):
+        """
+        Getter for the time of each meal of the class, by meal number (read-only)
+        """
+        return self.profil.heures_repas
+
+    @property
+    def intervalles_calories(self):
+        """
+        Getter for the (min, max) calories of each meal of the class, by meal number (read-only)
+        """
+        return self.profil.intervalles_calories
+
+    @property
+    def probabilites(self) -> dict:
+        """
+        Getter for the probability table of the eater class, as NumPy columns
+        """
+        return self.profil.probabilites
+
+    def generateurs(self, user_id, business_date: date, repas: int):
+        """
+        Create the random generators of one simulated meal.
+
+        Each call gets its own generators, so simulations can run concurrently
+        without sharing random state. Every (user, date, meal) has independent
+        streams, so a meal can be simulated alone and still be identical to the
+        same meal in a whole-day simulation.
+
+        Args:
+            user_id: user id
+            business_date: The simulated date
+            repas (int): The meal number
+
+        Returns:
+            tuple: A `random.Random` and a `np.random.RandomState`.
+        """
+        state = np.random.SeedSequence([user_id, business_date.toordinal(), repas]).generate_state(8)
+        return random.Random(int.from_bytes(state[:4].tobytes(), 'little')), np.random.RandomState(state[4:])
+
+    def generateur_heure(self, user_id, business_date: date, repas: int) -> random.Random:
+        """
+        Create only the `random.Random` of `generateurs`, enough to draw the connection time of a meal.
+
+        Seeding the `np.random.RandomState` costs far more than the time itself needs.
+        """
+        state = np.random.SeedSequence([user_id, business_date.toordinal(), repas]).generate_state(4)
+        return random.Random(int.from_bytes(state.tobytes(), 'little'))
+
+    def heure_connexion(self, business_date: date, repas: int, rng: random.Random) -> datetime:
+        """
+        Generate the connection time of one meal with random variation.
+
+        Args:
+            business_date: The simulated date
+            repas (int): The meal number
+            rng (random.Random): Generator of the meal
+
+        Returns:
+            datetime: The varied connection time.
+        """
+        heure_reelle = datetime.combine(business_date, self.profil.heures[repas])
+        variation = timedelta(minutes=rng.randint(*self.profil.variation))
+        return heure_reelle + variation
+
     def generer_heures_connexion(self, business_date=date):
         """
         Generate connection times for each meal with random variation.
@@ -55,19 +409,34 @@ class User:
             list of tuple: A list of tuples where each tuple contains the meal number and the varied connection time.
                         Example: [(1, datetime), (2, datetime), ...]
         """
-        random.seed(business_date.toordinal() + self.user_id)  # Seed based on date and user_id for reproducibility
         heures_de_connexion = []
-        for repas, heure in self.heures_repas.items():
-            heure_reelle = datetime.combine(business_date, datetime.strptime(heure, '%H:%M').time())
-            if self.classe_mangeur == 'random':
-                variation = timedelta(minutes=random.randint(-60, 300))
-            else:
-                variation = timedelta(minutes=random.randint(-60, 60))
-            heure_variee = heure_reelle + variation
-            heures_de_connexion.append((repas, heure_variee))
+        for repas in self.heures_repas:
+            # The time is the first draw of the meal's generator, as in simulate_daily_activity
+            rng = self.generateur_heure(self.user_id, business_date, repas)
+            heures_de_connexion.append((repas, self.heure_connexion(business_date, repas, rng)))
         return heures_de_connexion
 
-    def choisir_types_aliments(self, repas):
+    @property
+    def probabilites_df(self):
+        """
+        Getter for the probability table of the eater class as a DataFrame (imports pandas)
+        """
+        return self.profil.probabilites_df
+
+    def table_repas(self, repas):
+        """
+        Get the probability table of a meal as arrays, shared by every user of the class.
+
+        Args:
+            repas (int): The meal number
+
+        Returns:
+            tuple: Food types, mean and standard deviation of their probabilities (np.ndarray),
+                and the mean probability of each type (mapping, first row of a type wins).
+        """
+        return self.profil.table_repas(repas)
+
+    def choisir_types_aliments(self, repas, np_rng: np.random.RandomState = None):
         """
         Choose food types to consume for a given meal based on probabilities.
 
@@ -76,59 +445,55 @@ class User:
 
         Args:
             repas (int): The meal number (1 for breakfast, 2 for lunch, etc.)
+            np_rng (np.random.RandomState): Generator to draw from, defaults to the global NumPy one.
 
         Returns:
             np.ndarray: An array of chosen food types.
         """
-        repas_col_avg = f'Meal_{repas}_avg'
-        repas_col_std = f'Meal_{repas}_std'
-
-        types = self.probabilites_df['Types']
-        moyennes = self.probabilites_df[repas_col_avg]
-        std_devs = self.probabilites_df[repas_col_std]
+        if np_rng is None:
+            np_rng = np.random
+        types, moyennes, std_devs, _ = self.table_repas(repas)
 
-        probabilites = np.random.normal(moyennes, std_devs)
+        probabilites = np_rng.normal(moyennes, std_devs)
         probabilites = np.clip(probabilites, 0, None)  # Ensure probabilities are not negative
 
         total_probabilite = np.sum(probabilites)
         if total_probabilite > 0:
             probabilites = probabilites / total_probabilite  # Normalize so probabilities sum to 1
 
-        types_choisis = np.random.choice(types, size=len(types), p=probabilites)
+        types_choisis = types[tirer_selon(np_rng, probabilites, len(types))]
         return types_choisis
 
-    def determiner_quantite(self, type_aliment):
+    def determiner_quantite(self, type_aliment, rng: random.Random = None):
         """
         Determine the quantity of a food item based on its type and the eater class.
 
+        Args:
+            type_aliment (str): The food type.
+            rng (random.Random): Generator to draw from, defaults to the global one.
+
         Returns:
             int: The quantity of food.
         """
+        if rng is None:
+            rng = random
         # 5% chance that the quantity is zero
-        if random.random() < 0.04:
+        if rng.random() < 0.04:
             return 0
-        elif random.random() > 0.9999:
-            return random.randint(100, 1000)
+        elif rng.random() > 0.9999:
+            return rng.randint(100, 1000)
 
         quantite = 1  # Default quantity
 
-        if self.classe_mangeur == 'meat_lover':
-            if type_aliment in ['Viande', 'Poisson', 'Oeuf'] and random.random() < 0.30:
-                quantite = random.randint(2, 5)
-        elif self.classe_mangeur in ['vegan', 'vegetarian']:
-            if type_aliment in ['Légumes', 'Fruit', 'Légumineuse'] and random.random() < 0.30:
-                quantite = random.randint(2, 5)
-        elif self.classe_mangeur == 'standard':
-            if type_aliment in ['viande', 'poisson', 'oeuf', 'Légumes', 'Fruit',
-                                'Légumineuse'] and random.random() < 0.30:
-                quantite = random.randint(2, 5)
-        elif self.classe_mangeur == 'random':
-            if random.random() < 0.30:
-                quantite = random.randint(2, 5)
+        if self.profil.portions_multiples:
+            types_multiples = self.profil.types_multiples
+            if (types_multiples is None or type_aliment in types_multiples) and rng.random() < 0.30:
+                quantite = rng.randint(2, 5)
 
         return quantite
 
-    def selectionner_aliments(self, aliments_df, types_choisis, repas, min_calories, max_calories):
+    def selectionner_aliments(self, catalog, types_choisis, repas, min_calories, max_calories,
+                              rng: random.Random = None, np_rng: np.random.RandomState = None):
         """
         Select foods to consume based on chosen types and caloric constraints.
 
@@ -137,29 +502,38 @@ class User:
         foods are removed based on their probability.
 
         Args:
-            aliments_df (pd.DataFrame): DataFrame containing food information.
+            catalog (FoodCatalog): Catalog containing food information.
             types_choisis (np.ndarray): Food types chosen for the meal.
             repas (int): Meal number (1 for breakfast, 2 for lunch, etc.)
             min_calories (float): Minimum calories to consume for this meal.
             max_calories (float): Maximum calories to consume for this meal.
+            rng (random.Random): Generator to draw from, defaults to the global one.
+            np_rng (np.random.RandomState): Generator to draw from, defaults to the global NumPy one.
 
         Returns:
             list of dict: A list of dictionaries representing selected foods.
         """
+        if rng is None:
+            rng = random
+        if np_rng is None:
+            np_rng = np.random
         min_calories *= self.facteur_calories
         max_calories *= self.facteur_calories
         total_calories = 0
         aliments_selectionnes = []
 
-        exceed_max_calories = random.random() < 0.2  # 20% chance to exceed max_calories
+        exceed_max_calories = rng.random() < 0.2  # 20% chance to exceed max_calories
 
-        for type_aliment in types_choisis:
-            aliments_du_type = aliments_df[aliments_df['Type'] == type_aliment]
-            aliment_choisi = aliments_du_type.sample(n=1).iloc[0].to_dict()
+        # One food of every chosen type, drawn at once: np_rng is not used by the rest of the meal
+        positions = tirer_aliments(np_rng, catalog, types_choisis)
+        for type_aliment, position in zip(types_choisis, positions.tolist()):
+            if position < 0:
+                raise ValueError(f"No food of type {type_aliment} in the catalog")
+            aliment_choisi = catalog.aliment(position)
             aliment_choisi['Repas'] = repas
 
             # Determine the quantity of the food
-            quantite = self.determiner_quantite(type_aliment)
+            quantite = self.determiner_quantite(type_aliment, rng)
             aliment_choisi['Quantite'] = quantite
             if quantite >= 10:
                 exceed_max_calories = 1
@@ -171,11 +545,36 @@ class User:
 
         # If the total exceeds max_calories and exceed_max_calories is False, remove foods with the lowest probabilities
         if not exceed_max_calories and total_calories > max_calories:
-            while total_calories > max_calories:
-                aliments_selectionnes.sort(key=lambda x: self.probabilite_aliment(x['Type'], x['Repas']))
-                aliment_a_retirer = aliments_selectionnes.pop(0)
-                total_calories -= aliment_a_retirer['Valeur calorique'] * aliment_a_retirer['Quantite']
+            self.retirer_moins_probables(aliments_selectionnes, total_calories, max_calories, repas)
+
+        return aliments_selectionnes
+
+    def retirer_moins_probables(self, aliments_selectionnes: list, total_calories: float, max_calories: float,
+                                repas) -> list:
+        """
+        Remove the least probable foods of a meal until its calories are within max_calories.
+
+        Removing the first item keeps the list sorted: one stable sort is
+        enough, then the least probable foods are dropped from the front. The
+        result is the one of sorting again before every removal.
 
+        Args:
+            aliments_selectionnes (list of dict): Foods of the meal, sorted and trimmed in place.
+            total_calories (float): Calories of these foods.
+            max_calories (float): Maximum calories of the meal.
+            repas (int): Meal number
+
+        Returns:
+            list of dict: `aliments_selectionnes`
+        """
+        moyenne_par_type = self.table_repas(repas)[3]
+        aliments_selectionnes.sort(key=lambda x: moyenne_par_type[x['Type']])
+        retires = 0
+        while total_calories > max_calories:
+            aliment_a_retirer = aliments_selectionnes[retires]
+            retires += 1
+            total_calories -= aliment_a_retirer['Valeur calorique'] * aliment_a_retirer['Quantite']
+        del aliments_selectionnes[:retires]
         return aliments_selectionnes
 
     def probabilite_aliment(self, type_aliment, repas):
@@ -189,11 +588,9 @@ class User:
         Returns:
             float: The average probability of the food for the given meal.
         """
-        repas_col_avg = f'Meal_{repas}_avg'
-        moyenne = self.probabilites_df[self.probabilites_df['Types'] == type_aliment][repas_col_avg].values[0]
-        return moyenne
+        return self.table_repas(repas)[3][type_aliment]
 
-    def simulate_daily_activity(self, user_id, business_date: date, aliments_df: pd.DataFrame):
+    def simulate_daily_activity(self, user_id, business_date: date, catalog: FoodCatalog, meal_id: int = None):
         """
         Simulate daily eating activities of the user for a given date.
 
@@ -203,25 +600,40 @@ class User:
         Args:
             business_date: The current date
             user_id: user id
-            aliments_df (pd.DataFrame): DataFrame containing food information.
+            catalog (FoodCatalog): Catalog containing food information.
+            meal_id (int, optional): Only simulate this meal, with the same result as in the whole day.
         """
-        np.random.seed(seed=business_date.toordinal() + user_id)  # Seed for reproducibility
-        random.seed(business_date.toordinal() + user_id)  # Also set the random seed
+        import pandas as pd
+
+        return pd.DataFrame(self.journal_repas(user_id, business_date, catalog, meal_id))
+
+    def journal_repas(self, user_id, business_date: date, catalog: FoodCatalog, meal_id: int = None) -> list:
+        """
+        Simulate the meals of a day, as a list of log entries.
+
+        Same simulation as `simulate_daily_activity`, without building a DataFrame.
 
-        heures_de_connexion = self.generer_heures_connexion(business_date)
-        self.aliments_consomme = []
+        Returns:
+            list of dict: One entry per food eaten (user_id, meal_id, heure_repas, aliment_id, quantity).
+        """
         aliments_logs = []
 
-        for repas, heure in heures_de_connexion:
-            types_choisis = self.choisir_types_aliments(repas)
+        for repas in self.heures_repas:
+            if meal_id is not None and repas != meal_id:
+                continue
+            # Generators local to this meal, seeded for reproducibility
+            rng, np_rng = self.generateurs(user_id, business_date, repas)
+            heure = self.heure_connexion(business_date, repas, rng)
+            types_choisis = self.choisir_types_aliments(repas, np_rng)
             aliments_selectionnes = self.selectionner_aliments(
-                aliments_df,
+                catalog,
                 types_choisis,
                 repas,
                 self.intervalles_calories[repas][0],
-                self.intervalles_calories[repas][1]
+                self.intervalles_calories[repas][1],
+                rng,
+                np_rng,
             )
-            self.aliments_consomme.extend(aliments_selectionnes)
 
             for aliment in aliments_selectionnes:
                 quantity = aliment.get('Quantite', 1)
@@ -232,20 +644,17 @@ class User:
                     'aliment_id': aliment['id'],
                     'quantity': quantity,
                 })
+        return aliments_logs
 
-        food_per_meal = pd.DataFrame(aliments_logs)
-
-        # Fusionner avec repas_df pour ajouter la colonne total_calorique
-        return food_per_meal
-
-    def get_daily_activity(self, user_id, business_date: date, aliments_df: pd.DataFrame) -> dict:
+    def get_daily_activity(self, user_id, business_date: date, catalog: FoodCatalog, meal_id: int = None) -> dict:
         """
         Récupère le journal d'activité alimentaire de l'utilisateur pour une date spécifique.
 
         Args:
             user_id: user id
-            aliments_df: Table des aliments
+            catalog: Catalogue des aliments
             business_date (date): La date pour laquelle récupérer le journal d'activité.
+            meal_id (int, optional): Ne simule que ce repas.
 
         Returns:
             dict: Un dictionnaire contenant la date et la liste des aliments consommés.
@@ -255,21 +664,13 @@ class User:
         if isinstance(business_date, str):
             business_date = datetime.strptime(business_date, "%Y-%m-%d").date()
 
-        np.random.seed(seed=business_date.toordinal())
-        random.seed(business_date.toordinal() + user_id)  # Seed for reproducibility
-
-        food_per_meal = self.simulate_daily_activity(user_id, business_date, aliments_df)
+        with chrono("simulation"):
+            aliments_logs = self.journal_repas(user_id, business_date, catalog, meal_id)
 
         keys = ['user_id', 'meal_id', 'heure_repas', 'aliment_id', 'quantity']
 
-        connexion_day = {key: [] for key in keys}
-
-        for index, row in food_per_meal.iterrows():
-            for key in keys:
-                connexion_day[key].append(row[key])
-            #connexion_day['date'].append(business_date.strftime("%Y-%m-%d"))  # Ajouter la date pour chaque entrée
-
-        return connexion_day
+        # Colonne par colonne, sans passer par un DataFrame
+        return {key: [log[key] for log in aliments_logs] for key in keys}
 
 
 # Sous-classe pour les mangeurs standard
@@ -277,8 +678,8 @@ class Standard(User):
     """
     Class representing a standard eater.
 
-    Inherits from User class and initializes specific attributes for a standard eater,
-    including meal times and calorie ranges for each meal.
+    Inherits from User class; the meal times and calorie ranges of a standard eater
+    are in its shared profile (`PROFILS`).
 
     Args:
         nom (str): User's last name.
@@ -287,22 +688,11 @@ class Standard(User):
         sexe (str): User's gender ('homme' or 'femme').
         user_id (int): User's unique identifier.
     """
+    __slots__ = ()
 
     def __init__(self, nom, prenom, age, sexe, user_id):
         type_food_file = "standard_class.XLSX"
         super().__init__(nom, prenom, age, sexe, user_id, 'standard', type_food_file)
-        self.heures_repas = {
-            1: '08:00',  # breakfast
-            2: '12:00',  # lunch
-            3: '16:00',  # snack
-            4: '20:00'  # dinner
-        }
-        self.intervalles_calories = {
-            1: (300, 500),  # breakfast
-            2: (600, 800),  # lunch
-            3: (200, 300),  # snack
-            4: (500, 700)  # dinner
-        }
 
 
 # Classe MangeurStandard héritant de Mangeur
@@ -310,8 +700,8 @@ class MeatLover(User):
     """
     Class representing a meat lover eater.
 
-    Inherits from User class and initializes specific attributes for a meat lover,
-    including meal times and calorie ranges for each meal.
+    Inherits from User class; the meal times and calorie ranges of a meat lover
+    are in its shared profile (`PROFILS`).
 
     Args:
         nom (str): User's last name.
@@ -320,30 +710,19 @@ class MeatLover(User):
         sexe (str): User's gender ('homme' or 'femme').
         user_id (int): User's unique identifier.
     """
+    __slots__ = ()
 
     def __init__(self, nom, prenom, age, sexe, user_id):
         type_food_file = "meat_lover_class.XLSX"
         super().__init__(nom, prenom, age, sexe, user_id, 'meat_lover', type_food_file)
-        self.heures_repas = {
-            1: '08:00',  # breakfast
-            2: '12:00',  # lunch
-            3: '16:00',  # snack
-            4: '20:00'  # dinner
-        }
-        self.intervalles_calories = {
-            1: (400, 600),  # breakfast
-            2: (700, 900),  # lunch
-            3: (300, 500),  # snack
-            4: (600, 800)  # dinner
-        }
 
 
 class Vegetarian(User):
     """
     Class representing a vegetarian eater.
 
-    Inherits from User class and initializes specific attributes for a vegetarian,
-    including meal times and calorie ranges for each meal.
+    Inherits from User class; the meal times and calorie ranges of a vegetarian
+    are in its shared profile (`PROFILS`).
 
     Args:
         nom (str): User's last name.
@@ -352,30 +731,19 @@ class Vegetarian(User):
         sexe (str): User's gender ('homme' or 'femme').
         user_id (int): User's unique identifier.
     """
+    __slots__ = ()
 
     def __init__(self, nom, prenom, age, sexe, user_id):
         type_food_file = "vegetarian_class.XLSX"
         super().__init__(nom, prenom, age, sexe, user_id, 'vegetarian', type_food_file)
-        self.heures_repas = {
-            1: '08:00',  # breakfast
-            2: '12:00',  # lunch
-            3: '16:00',  # snack
-            4: '20:00'  # dinner
-        }
-        self.intervalles_calories = {
-            1: (300, 400),  # breakfast
-            2: (500, 700),  # lunch
-            3: (100, 200),  # snack
-            4: (450, 600)  # dinner
-        }
 
 
 class Vegan(User):
     """
     Class representing a vegan eater.
 
-    Inherits from User class and initializes specific attributes for a vegan,
-    including meal times and calorie ranges for each meal.
+    Inherits from User class; the meal times and calorie ranges of a vegan
+    are in its shared profile (`PROFILS`).
 
     Args:
         nom (str): User's last name.
@@ -384,30 +752,19 @@ class Vegan(User):
         sexe (str): User's gender ('homme' or 'femme').
         user_id (int): User's unique identifier.
     """
+    __slots__ = ()
 
     def __init__(self, nom, prenom, age, sexe, user_id):
         type_food_file = "vegan_class.XLSX"
         super().__init__(nom, prenom, age, sexe, user_id, 'vegan', type_food_file)
-        self.heures_repas = {
-            1: '08:00',  # breakfast
-            2: '12:00',  # lunch
-            3: '16:00',  # snack
-            4: '20:00'  # dinner
-        }
-        self.intervalles_calories = {
-            1: (250, 350),  # breakfast
-            2: (500, 700),  # lunch
-            3: (100, 200),  # snack
-            4: (400, 500)  # dinner
-        }
 
 
 class Fasting(User):
     """
     Class representing an intermittent fasting eater.
 
-    Inherits from User class and initializes specific attributes for a fasting eater,
-    including meal times and calorie ranges for each meal.
+    Inherits from User class; the meal times and calorie ranges of a fasting eater
+    are in its shared profile (`PROFILS`).
 
     Args:
         nom (str): User's last name.
@@ -416,26 +773,19 @@ class Fasting(User):
         sexe (str): User's gender ('homme' or 'femme').
         user_id (int): User's unique identifier.
     """
+    __slots__ = ()
 
     def __init__(self, nom, prenom, age, sexe, user_id):
         type_food_file = "fasting_class.XLSX"
         super().__init__(nom, prenom, age, sexe, user_id, 'fasting', type_food_file)
-        self.heures_repas = {
-            1: '12:00',  # lunch
-            2: '18:00',  # dinner
-        }
-        self.intervalles_calories = {
-            1: (1000, 1200),  # lunch
-            2: (800, 1000)  # dinner
-        }
 
 
 class Random(User):
     """
     Class representing a random eater.
 
-    Inherits from User class and initializes specific attributes for a random eater,
-    including meal times and calorie ranges for each meal.
+    Inherits from User class; the meal times and calorie ranges of a random eater
+    are in its shared profile (`PROFILS`).
 
     Args:
         nom (str): User's last name.
@@ -444,16 +794,11 @@ class Random(User):
         sexe (str): User's gender ('homme' or 'femme').
         user_id (int): User's unique identifier.
     """
+    __slots__ = ()
 
     def __init__(self, nom, prenom, age, sexe, user_id):
         type_food_file = "random_eater_class.XLSX"
         super().__init__(nom, prenom, age, sexe, user_id, 'random', type_food_file)
-        self.heures_repas = {
-            1: '13:00',
-        }
-        self.intervalles_calories = {
-            1: (900, 4500),  # breakfast
-        }
 
 
 # Création d'une instance utilisateur en fonction de la classe de mangeur
@@ -0,0 +1,58 @@
+import asyncio
+import contextvars
+from concurrent.futures import Executor
+from typing import Callable, Hashable, Optional
+
+try:
+    from data_engineering.sensor_api.fake_data.metrics import SINGLE_FLIGHT
+except ImportError:
+    from .metrics import SINGLE_FLIGHT
+
+
+class SingleFlight:
+    """
+    Run blocking computations in an executor, one at a time per key.
+
+    A call whose key is already being computed does not start a new
+    computation, it waits for the one in flight and gets the same result (or
+    exception). The key is forgotten as soon as the computation ends, so
+    nothing is cached here. Calls must come from the same event loop.
+
+    Every call is counted in `sensor_api_single_flight_total`, with outcome
+    `leader` when it started the computation and `coalesced` when it joined one.
+
+    Args:
+        executor (Executor): Where computations run, the default executor of the loop if None.
+        name (str): Label of the counters, to tell several instances apart.
+    """
+
+    def __init__(self, executor: Optional[Executor] = None, name: str = "default") -> None:
+        self.executor = executor
+        self.name = name
+        self._in_flight = {}
+
+    def __len__(self):
+        return len(self._in_flight)
+
+    async def run(self, key: Hashable, fonction: Callable, *args):
+        """
+        Get the result of `fonction(*args)`, shared with the concurrent calls of the same key.
+
+        The computation runs in the context of the call that started it, so its
+        stage timings go to that request.
+        """
+        future = self._in_flight.get(key)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = loop.run_in_executor(self.executor, contextvars.copy_context().run, fonction, *args)
+            self._in_flight[key] = future
+            future.add_done_callback(lambda done: self._forget(key, done))
+            SINGLE_FLIGHT.inc(name=self.name, outcome="leader")
+        else:
+            SINGLE_FLIGHT.inc(name=self.name, outcome="coalesced")
+        # A cancelled caller (client gone) must not cancel the computation the others wait for
+        return await asyncio.shield(future)
+
+    def _forget(self, key: Hashable, future: asyncio.Future) -> None:
+        if self._in_flight.get(key) is future:
+            del self._in_flight[key]
@@ -0,0 +1,245 @@
+import argparse
+import json
+import os
+import tempfile
+import threading
+from datetime import date, timedelta
+from typing import Optional
+
+import numpy as np
+
+try:
+    from data_engineering.sensor_api.fake_data.registry import UserRegistry
+except ImportError:
+    from .registry import UserRegistry
+
+# First day of the materialized history
+START_DATE = date(2024, 1, 1)
+
+META_FILE = "meta.json"
+
+# Stored columns and their on-disk type; heure_repas is in seconds since the epoch
+COLUMNS = {
+    'meal_id': np.int8,
+    'heure_repas': np.int64,
+    'aliment_id': np.int32,
+    'quantity': np.int32,
+}
+OFFSETS = 'offsets'
+
+
+class ActivityStore:
+    """
+    Append-only, memory-mapped store of simulated days, indexed by (date, user).
+
+    Every column is a flat binary file of rows, ordered by day then user. An
+    offsets file gives, for day `d` and user row `u`, the rows
+    `offsets[d * n_users + u]` to `offsets[d * n_users + u + 1]`, so a user's
+    day is a zero-copy slice of the mapped files. `meta.json` is replaced
+    last when days are appended, readers never see a partial day.
+
+    Args:
+        directory (str): Directory of the store.
+    """
+
+    def __init__(self, directory: str) -> None:
+        self.directory = directory
+        self._lock = threading.Lock()
+        self._meta_mtime = None
+        self._meta = None
+        self._maps = None
+        self._rows_by_id = None
+
+    @classmethod
+    def create(cls, directory: str, user_ids, version: str, start_date: date = START_DATE) -> "ActivityStore":
+        """
+        Create an empty store for these users and this simulation version
+        """
+        os.makedirs(directory, exist_ok=True)
+        user_ids = np.asarray(user_ids, dtype=np.int64)
+        np.save(os.path.join(directory, "user_ids.npy"), user_ids)
+        for name, dtype in COLUMNS.items():
+            open(os.path.join(directory, f"{name}.bin"), "wb").close()
+        with open(os.path.join(directory, f"{OFFSETS}.bin"), "wb") as f:
+            f.write(np.zeros(1, dtype=np.int64).tobytes())
+        store = cls(directory)
+        store._write_meta({'version': version, 'start_date': start_date.isoformat(), 'days': 0, 'rows': 0,
+                           'n_users': len(user_ids)})
+        return store
+
+    @property
+    def meta(self) -> dict:
+        """
+        Getter for the description of the store, reloaded when another process appended days
+        """
+        self._refresh()
+        return self._meta
+
+    @property
+    def start_date(self) -> date:
+        return date.fromisoformat(self.meta['start_date'])
+
+    @property
+    def end_date(self) -> Optional[date]:
+        """
+        Getter for the last materialized day, None if the store is empty
+        """
+        meta = self.meta
+        if meta['days'] == 0:
+            return None
+        return self.start_date + timedelta(days=meta['days'] - 1)
+
+    def _write_meta(self, meta: dict) -> None:
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, os.path.join(self.directory, META_FILE))
+
+    def _refresh(self) -> None:
+        mtime = os.stat(os.path.join(self.directory, META_FILE)).st_mtime_ns
+        if mtime == self._meta_mtime:
+            return
+        with self._lock:
+            if mtime == self._meta_mtime:
+                return
+            with open(os.path.join(self.directory, META_FILE), encoding="utf-8") as f:
+                meta = json.load(f)
+            user_ids = np.load(os.path.join(self.directory, "user_ids.npy"))
+            maps = {OFFSETS: self._map(OFFSETS, np.int64, meta['days'] * meta['n_users'] + 1)}
+            for name, dtype in COLUMNS.items():
+                maps[name] = self._map(name, dtype, meta['rows'])
+            self._rows_by_id = {user_id: row for row, user_id in enumerate(user_ids.tolist())}
+            self._maps = maps
+            self._meta = meta
+            self._meta_mtime = mtime
+
+    def _map(self, name: str, dtype, length: int) -> np.ndarray:
+        # Files may be longer than the metadata says (append in progress): only map the committed part
+        if length == 0:
+            return np.empty(0, dtype=dtype)
+        return np.memmap(os.path.join(self.directory, f"{name}.bin"), dtype=dtype, mode="r", shape=(length,))
+
+    def get(self, user_id: int, business_date: date, version: str) -> Optional[dict]:
+        """
+        Get the materialized traffic of a user at a date.
+
+        Args:
+            user_id (int): user id
+            business_date (date): The day
+            version (str): Simulation version expected by the caller
+
+        Returns:
+            dict: Zero-copy NumPy slices per column (meal_id, heure_repas as datetime64[s],
+                aliment_id, quantity), or None if this day or user is not in the store.
+        """
+        meta = self.meta
+        if meta['version'] != version:
+            return None
+        jour = (business_date - date.fromisoformat(meta['start_date'])).days
+        row = self._rows_by_id.get(user_id)
+        if row is None or not 0 <= jour < meta['days']:
+            return None
+        maps = self._maps
+        position = jour * meta['n_users'] + row
+        debut, fin = int(maps[OFFSETS][position]), int(maps[OFFSETS][position + 1])
+        columns = {name: maps[name][debut:fin] for name in COLUMNS}
+        columns['heure_repas'] = columns['heure_repas'].view('datetime64[s]')
+        return columns
+
+    def append_day(self, business_date: date, connexion_day: dict, user_ids) -> None:
+        """
+        Append the traffic of every user of the store for the day after the last one.
+
+        Args:
+            business_date (date): The day, must follow the last materialized day.
+            connexion_day (dict): Traffic of the users, one list per column, rows grouped by user.
+            user_ids: The store's users, in the order of `connexion_day`.
+        """
+        meta = dict(self.meta)
+        expected = date.fromisoformat(meta['start_date']) + timedelta(days=meta['days'])
+        if business_date != expected:
+            raise ValueError(f"The next day to append is {expected}, not {business_date}")
+
+        store_ids = np.load(os.path.join(self.directory, "user_ids.npy"))
+        if not np.array_equal(store_ids, np.asarray(user_ids, dtype=np.int64)):
+            raise ValueError("The users changed since the store was created")
+
+        # Rows per user, from the user_id column
+        rows_by_id = {user_id: row for row, user_id in enumerate(store_ids.tolist())}
+        rows = np.array([rows_by_id[user_id] for user_id in connexion_day['user_id']], dtype=np.int64)
+        if (np.diff(rows) < 0).any():
+            raise ValueError("Rows should be grouped by user, in the order of the store")
+        counts = np.bincount(rows, minlength=len(store_ids))
+        offsets = meta['rows'] + np.cumsum(counts)
+
+        heures = np.array(connexion_day['heure_repas'], dtype='datetime64[s]').astype(np.int64)
+        values = {
+            'meal_id': np.asarray(connexion_day['meal_id'], dtype=COLUMNS['meal_id']),
+            'heure_repas': heures,
+            'aliment_id': np.asarray(connexion_day['aliment_id'], dtype=COLUMNS['aliment_id']),
+            'quantity': np.asarray(connexion_day['quantity'], dtype=COLUMNS['quantity']),
+            OFFSETS: offsets.astype(np.int64),
+        }
+        committed = {name: meta['rows'] * np.dtype(dtype).itemsize for name, dtype in COLUMNS.items()}
+        committed[OFFSETS] = (meta['days'] * meta['n_users'] + 1) * 8
+        for name, array in values.items():
+            with open(os.path.join(self.directory, f"{name}.bin"), "r+b") as f:
+                # Drop whatever an interrupted append left after the committed data
+                f.truncate(committed[name])
+                f.seek(committed[name])
+                f.write(array.tobytes())
+                f.flush()
+                os.fsync(f.fileno())
+
+        meta['days'] += 1
+        meta['rows'] += len(heures)
+        self._write_meta(meta)
+
+
+def materialize(app_tracker, directory: str, until: date = None, start_date: date = START_DATE, log=print) -> int:
+    """
+    Materialize every missing day of the store up to `until` (yesterday by default).
+
+    Creates the store if needed. Run it every night to append the day that just ended.
+
+    Returns:
+        int: The number of days appended.
+    """
+    until = until or date.today() - timedelta(days=1)
+    version = app_tracker.simulation_version
+    registry: UserRegistry = app_tracker.registry
+    if os.path.exists(os.path.join(directory, META_FILE)):
+        store = ActivityStore(directory)
+        if store.meta['version'] != version:
+            raise ValueError(f"{directory} holds simulation version {store.meta['version']}, not {version}")
+    else:
+        store = ActivityStore.create(directory, registry.user_ids, version, start_date)
+
+    ajoutes = 0
+    business_date = (store.end_date + timedelta(days=1)) if store.end_date else store.start_date
+    while business_date <= until:
+        connexion_day = app_tracker.get_population_connexion(business_date)
+        store.append_day(business_date, connexion_day, registry.user_ids)
+        log(f"Materialized {business_date}: {len(connexion_day['user_id'])} rows")
+        ajoutes += 1
+        business_date += timedelta(days=1)
+    return ajoutes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Materialize the simulated history into a memory-mapped store")
+    parser.add_argument("--dir", required=True, help="Directory of the store")
+    parser.add_argument("--until", type=date.fromisoformat, default=None, help="Last day (default: yesterday)")
+    parser.add_argument("--start", type=date.fromisoformat, default=START_DATE, help="First day of a new store")
+    args = parser.parse_args()
+
+    try:
+        from data_engineering.sensor_api.fake_data import create_app
+    except ImportError:
+        from . import create_app
+    app_tracker = create_app()
+    try:
+        materialize(app_tracker, args.dir, args.until, args.start)
+    finally:
+        app_tracker.close()
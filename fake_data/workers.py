@@ -0,0 +1,127 @@
+import os
+from datetime import date
+
+import numpy as np
+
+try:
+    from data_engineering.sensor_api.fake_data.catalog import get_catalog
+    from data_engineering.sensor_api.fake_data.engine import BatchEngine
+    from data_engineering.sensor_api.fake_data.registry import UserRegistry
+    from data_engineering.sensor_api.fake_data.sensor import create_user_instance, get_profile
+    from data_engineering.sensor_api.fake_data import formats
+except ImportError:
+    from .catalog import get_catalog
+    from .engine import BatchEngine
+    from .registry import UserRegistry
+    from .sensor import create_user_instance, get_profile
+    from . import formats
+
+COLUMNS = ['user_id', 'meal_id', 'heure_repas', 'aliment_id', 'quantity']
+
+# State of a pool worker, set once by `init_worker` and reused by every task
+_registry = None
+_food_file = None
+_engine = None
+
+
+def init_worker(registry: UserRegistry, food_file: str) -> None:
+    """
+    Warm a pool worker with the users and the food catalog.
+
+    Runs once per worker process, so tasks only have to carry user ids and
+    a date instead of pickled users and food tables.
+
+    Args:
+        registry (UserRegistry): The users of the AppTracker.
+        food_file (str): Path of the food Excel file.
+    """
+    global _registry, _food_file
+    _registry = registry
+    _food_file = food_file
+    get_catalog(food_file)
+    # Reads the probability table of every eater class, users only point to their class profile
+    for classe_mangeur in registry.vocab_classes:
+        get_profile(classe_mangeur).charger()
+
+
+def simulate_users(user_ids: list, business_date: date) -> dict:
+    """
+    Simulate one day for several users inside a pool worker.
+
+    Args:
+        user_ids (list): Ids of the users to simulate.
+        business_date (date): The day to simulate.
+
+    Returns:
+        dict: The traffic of all these users, one list per column.
+    """
+    catalog = get_catalog(_food_file)
+    connexion_day = {key: [] for key in COLUMNS}
+    for user_id in user_ids:
+        activity = _registry.get(user_id).get_daily_activity(user_id, business_date, catalog)
+        for key in COLUMNS:
+            connexion_day[key].extend(activity[key])
+    return connexion_day
+
+
+def connection_times(user_ids: list, business_date: date) -> dict:
+    """
+    Draw the connection time of every meal of several users inside a pool worker.
+
+    Users are created for the draw and dropped, a whole population is not kept in memory.
+
+    Args:
+        user_ids (list): Ids of the users.
+        business_date (date): The day.
+
+    Returns:
+        dict: `user_id`, `meal_id` and `heure_repas` (datetime64[s]) arrays, one row per meal.
+    """
+    user_id_column, meal_id_column, heure_column = [], [], []
+    for user_id in user_ids:
+        user = create_user_instance(_registry.record(user_id).to_dict())
+        for repas, heure in user.generer_heures_connexion(business_date):
+            user_id_column.append(user_id)
+            meal_id_column.append(repas)
+            heure_column.append(heure)
+    return {
+        'user_id': np.array(user_id_column, dtype=np.int64),
+        'meal_id': np.array(meal_id_column, dtype=np.int8),
+        'heure_repas': np.array(heure_column, dtype='datetime64[s]'),
+    }
+
+
+def export_partition(user_ids: list, business_date: date, path: str, engine: str = "daily") -> int:
+    """
+    Simulate one day for several users inside a pool worker and write it as a Parquet file.
+
+    The file is written under a temporary name and renamed once complete, so
+    an interrupted export never leaves a truncated partition behind.
+
+    Args:
+        user_ids (list): Ids of the users to simulate.
+        business_date (date): The day to simulate.
+        path (str): Parquet file to write.
+        engine (str): "daily" for the same data as the API, "batch" for the vectorized engine.
+
+    Returns:
+        int: The number of rows written.
+    """
+    global _engine
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    if engine == "batch":
+        catalog = get_catalog(_food_file)
+        if _engine is None or _engine.catalog is not catalog:
+            _engine = BatchEngine(_registry, catalog)
+        columns = _engine.simulate(user_ids, business_date)
+    else:
+        columns = simulate_users(user_ids, business_date)
+
+    batch = formats.record_batch(columns)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    pq.write_table(pa.Table.from_batches([batch]), tmp_path)
+    os.replace(tmp_path, path)
+    return batch.num_rows
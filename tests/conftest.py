@@ -0,0 +1,51 @@
+import os
+
+import pytest
+
+from fake_data import create_app
+
+# The Excel files are read relative to the project root
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+@pytest.fixture(scope="session")
+def root_dir():
+    """
+    Path of the project root, where the Excel files are
+    """
+    return ROOT
+
+
+@pytest.fixture(scope="session")
+def app_tracker():
+    """
+    AppTracker of the users of user_table.XLSX, shared by the whole session, run from the project root
+    """
+    cwd = os.getcwd()
+    os.chdir(ROOT)
+    app_tracker = create_app()
+    app_tracker.max_workers = 1
+    try:
+        yield app_tracker
+    finally:
+        app_tracker.close()
+        os.chdir(cwd)
+
+
+@pytest.fixture
+def app(monkeypatch, root_dir):
+    """
+    The `app` module, imported from the project root
+    """
+    monkeypatch.chdir(root_dir)
+    import app
+    return app
+
+
+@pytest.fixture
+def client(app):
+    """
+    TestClient of the FastAPI application
+    """
+    testclient = pytest.importorskip("fastapi.testclient")
+    return testclient.TestClient(app.app)
@@ -0,0 +1,61 @@
+from datetime import date
+
+import pytest
+
+from fake_data.aggregates import aggregate, rollup
+from fake_data.catalog import FoodCatalog
+
+CATALOG = FoodCatalog({
+    'id': [1, 2, 3, 4],
+    'Aliment': ['Pomme', 'Poulet', 'Riz', 'Mystère'],
+    'Type': ['Fruit', 'Viande', 'Feculent', float('nan')],
+    'Valeur calorique': [50.0, 200.0, 130.0, 10.0],
+})
+
+
+def jour(business_date: date, repas: list) -> dict:
+    connexion_day = {'meal_id': [], 'heure_repas': [], 'aliment_id': [], 'quantity': []}
+    for meal_id, heure, aliment_id, quantity in repas:
+        connexion_day['meal_id'].append(meal_id)
+        connexion_day['heure_repas'].append(f"{business_date} {heure}")
+        connexion_day['aliment_id'].append(aliment_id)
+        connexion_day['quantity'].append(quantity)
+    return connexion_day
+
+
+@pytest.mark.unit
+def test_rollup_sums_calories_per_meal_and_type():
+    day = rollup(jour(date(2024, 7, 18), [(1, "08:00:00", 1, 2), (1, "08:00:00", 1, 1), (2, "12:30:00", 2, 1),
+                                           (2, "12:30:00", 3, 2), (2, "12:30:00", 4, 3)]), CATALOG)
+    assert day == {
+        'meal_id': [1, 2, 2, 2],
+        'heure_repas': ["2024-07-18 08:00:00"] + ["2024-07-18 12:30:00"] * 3,
+        'type': ['Fruit', None, 'Viande', 'Feculent'],
+        'calories': [150.0, 30.0, 200.0, 260.0],
+    }
+
+
+@pytest.mark.unit
+def test_aggregate_per_meal_day_and_week():
+    # Thursday 18 to Monday 22 July, nothing on the 20th
+    rollups = [(date(2024, 7, d), rollup(jour(date(2024, 7, d), repas), CATALOG)) for d, repas in [
+        (18, [(1, "08:00:00", 1, 1), (2, "12:00:00", 2, 1)]),
+        (19, [(2, "12:10:00", 3, 1)]),
+        (20, []),
+        (21, [(1, "09:00:00", 4, 1)]),
+        (22, [(1, "08:30:00", 2, 2)]),
+    ]]
+    days = aggregate(rollups, date(2024, 7, 18), date(2024, 7, 22), 'day')
+    assert days['date'] == ['2024-07-18', '2024-07-19', '2024-07-20', '2024-07-21', '2024-07-22']
+    assert days['calories'] == [250.0, 130.0, 0.0, 10.0, 400.0]
+    assert days['calories_par_type']['Viande'] == [200.0, 0.0, 0.0, 0.0, 400.0]
+
+    weeks = aggregate(rollups, date(2024, 7, 18), date(2024, 7, 22), 'week')
+    assert weeks['date'] == ['2024-07-15', '2024-07-22']
+    assert weeks['calories'] == [390.0, 400.0]
+
+    meals = aggregate(rollups, date(2024, 7, 18), date(2024, 7, 22), 'meal')
+    assert list(zip(meals['date'], meals['meal_id'], meals['calories'])) == [
+        ('2024-07-18', 1, 50.0), ('2024-07-18', 2, 200.0), ('2024-07-19', 2, 130.0), ('2024-07-21', 1, 10.0),
+        ('2024-07-22', 1, 400.0)]
+    assert meals['heure_repas'][2] == "2024-07-19 12:10:00"
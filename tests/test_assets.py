@@ -0,0 +1,94 @@
+import math
+import os
+import sys
+
+import pytest
+
+from fake_data import assets
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    pd = pytest.importorskip("pandas")
+    path = str(tmp_path / "table.xlsx")
+
+    def ecrire(valeurs: list) -> str:
+        pd.DataFrame({'id': list(range(1, len(valeurs) + 1)), 'Valeur': valeurs}).to_excel(path, index=False)
+        return path
+
+    return ecrire
+
+
+@pytest.fixture
+def compilations(monkeypatch):
+    appels = []
+    compile_table = assets.compile_table
+
+    def compter(file_path, cache_dir=assets.CACHE_DIR):
+        appels.append(file_path)
+        return compile_table(file_path, cache_dir)
+
+    monkeypatch.setattr(assets, "compile_table", compter)
+    return appels
+
+
+def sans_pandas(monkeypatch) -> None:
+    # `import pandas` raises ImportError while None is in sys.modules
+    monkeypatch.setitem(sys.modules, "pandas", None)
+
+
+@pytest.mark.unit
+def test_compiled_table_is_reused_then_recompiled(tmp_path, workbook, compilations, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    path = workbook(["a", "b", "c"])
+
+    assert assets.read_columns(path, cache_dir)['Valeur'].tolist() == ["a", "b", "c"]
+    assert compilations == [path]
+    assert os.path.exists(assets.compiled_path(path, cache_dir))
+
+    # Second read: the archive, without pandas
+    with monkeypatch.context() as patch:
+        sans_pandas(patch)
+        assert assets.read_columns(path, cache_dir)['Valeur'].tolist() == ["a", "b", "c"]
+    assert compilations == [path]
+
+    # New content: parsed and compiled again
+    workbook(["a", "b", "d"])
+    mtime = os.path.getmtime(path)
+    os.utime(path, (mtime + 10, mtime + 10))
+    assert assets.read_columns(path, cache_dir)['Valeur'].tolist() == ["a", "b", "d"]
+    assert compilations == [path, path]
+
+
+@pytest.mark.unit
+def test_touched_table_is_checked_by_content(tmp_path, workbook, compilations, monkeypatch):
+    cache_dir = str(tmp_path / "cache")
+    path = workbook(["a", "b", "c"])
+    assets.read_columns(path, cache_dir)
+    hashes = []
+    sha256 = assets._sha256
+    monkeypatch.setattr(assets, "_sha256", lambda file_path: hashes.append(file_path) or sha256(file_path))
+
+    # Same content, other mtime (checkout, copy): the sha256 says the archive is still good
+    mtime = os.path.getmtime(path)
+    os.utime(path, (mtime + 10, mtime + 10))
+    with monkeypatch.context() as patch:
+        sans_pandas(patch)
+        assert assets.read_columns(path, cache_dir)['Valeur'].tolist() == ["a", "b", "c"]
+    assert hashes == [path]
+    assert compilations == [path]
+
+
+@pytest.mark.unit
+def test_mixed_column_round_trips(tmp_path, workbook):
+    cache_dir = str(tmp_path / "cache")
+    path = workbook(["texte", 12, 2.5, None, "autre", 0])
+
+    parsed = assets.read_columns(path, cache_dir)['Valeur']
+    compiled = assets.read_columns(path, cache_dir)['Valeur']
+    assert os.path.exists(assets.compiled_path(path, cache_dir))
+    for valeurs in (parsed, compiled):
+        assert valeurs.dtype == object
+        assert valeurs[[0, 1, 2, 4, 5]].tolist() == ["texte", 12, 2.5, "autre", 0]
+        assert [type(valeur) for valeur in valeurs[[1, 2]].tolist()] == [int, float]
+        assert isinstance(valeurs[3], float) and math.isnan(valeurs[3])
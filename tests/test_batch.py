@@ -0,0 +1,56 @@
+import asyncio
+
+import pytest
+
+
+@pytest.mark.integration
+def test_batch_matches_individual_requests(monkeypatch, app):
+    """Each item of a batch gets what GET / answers for it, errors included, with each user-day simulated once"""
+    httpx = pytest.importorskip("httpx")
+
+    items = [
+        {'user_id': 4, 'date': "2024-07-18", 'meal_id': 1},
+        {'user_id': 4, 'date': "2024-07-18"},
+        {'user_id': 4, 'date': "2024-07-18", 'meal_id': 3},
+        {'user_id': 5, 'date': "2024-07-19", 'meal_id': 2},
+        {'user_id': 4, 'date': "2024-07-18", 'meal_id': 1},
+        {'user_id': 999999, 'date': "2024-07-18"},
+        {'user_id': 4, 'date': "2023-12-31"},
+        {'user_id': 4, 'date': "2024-02-30"},
+        {'user_id': 4, 'date': "2024-07-18", 'meal_id': 9},
+        {'date': "2024-07-18"},
+    ]
+    simulations = []
+    get_all_connexion = app.app_tracker.get_all_connexion
+
+    def simulation(user_id, business_date):
+        simulations.append((user_id, business_date))
+        return get_all_connexion(user_id, business_date)
+
+    async def requests():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            batch = await client.post("/batch", json=items)
+            appels = list(simulations)
+            singles = []
+            for item in items[:-1]:
+                params = {key: value for key, value in item.items() if key != 'date'}
+                year, month, day = item['date'].split("-")
+                singles.append(await client.get("/", params={**params, 'year': year, 'month': month, 'day': day}))
+            trop = await client.post("/batch", json=[items[0]] * (app.MAX_BATCH_ITEMS + 1))
+            return batch, appels, singles, trop
+
+    app.app_tracker.cache.clear()
+    monkeypatch.setattr(app.app_tracker, "get_all_connexion", simulation)
+    batch, appels, singles, trop = asyncio.run(requests())
+
+    assert batch.status_code == 200
+    # The meals of user 4 come from the day asked for in the same batch
+    assert appels == [(4, app.date(2024, 7, 18))]
+    for result, item, single in zip(batch.json(), items, singles):
+        if single.status_code == 200:
+            assert result == {'status': 200, 'result': single.json()}, item
+        else:
+            assert result == {'status': single.status_code, 'error': single.json()}, item
+    assert batch.json()[-1] == {'status': 404, 'error': "Enter a valid user_id"}
+    assert trop.status_code == 413
@@ -0,0 +1,88 @@
+import json
+import os
+from datetime import date
+
+import pytest
+
+from fake_data.cache import ActivityCache, taille_estimee
+
+
+def jour(user_id: int, n: int = 3) -> dict:
+    return {'user_id': [user_id] * n, 'meal_id': list(range(1, n + 1)), 'heure_repas': ["2024-07-18 08:00:00"] * n,
+            'aliment_id': list(range(n)), 'quantity': [1] * n}
+
+
+def cle(user_id: int) -> tuple:
+    return (user_id, date(2024, 7, 18), "version")
+
+
+@pytest.mark.unit
+def test_least_recently_used_days_are_evicted_by_count():
+    cache = ActivityCache(max_entries=2)
+    assert cache.get(cle(1)) is None
+    cache.put(cle(1), jour(1))
+    cache.put(cle(2), jour(2))
+    assert cache.get(cle(1)) == jour(1)  # 1 is now the most recently used
+    cache.put(cle(3), jour(3))
+    assert cache.get(cle(2)) is None
+    assert cache.get(cle(1)) == jour(1) and cache.get(cle(3)) == jour(3)
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions'], stats['entries']) == (3, 2, 1, 2)
+    assert stats['bytes'] == taille_estimee(jour(1)) + taille_estimee(jour(3))
+
+
+@pytest.mark.unit
+def test_days_are_evicted_by_size():
+    taille = taille_estimee(jour(1, 50))
+    cache = ActivityCache(max_bytes=2 * taille + taille // 2)
+    for user_id in range(1, 5):
+        cache.put(cle(user_id), jour(user_id, 50))
+    assert len(cache) == 2 and cache.evictions == 2
+    assert cache.get(cle(2)) is None and cache.get(cle(4)) is not None
+    # A day bigger than the bound is still kept alone
+    cache.put(cle(5), jour(5, 500))
+    assert len(cache) == 1 and cache.get(cle(5)) == jour(5, 500)
+
+
+@pytest.mark.unit
+def test_evicted_days_are_read_back_from_the_spill_dir(tmp_path):
+    cache = ActivityCache(max_entries=1, spill_dir=str(tmp_path))
+    cache.put(cle(1), jour(1))
+    cache.put(cle(2), jour(2))
+    chemin = os.path.join(str(tmp_path), "version", "1", "2024-07-18.json")
+    with open(chemin, encoding="utf-8") as f:
+        assert json.load(f) == jour(1)
+
+    assert cache.get(cle(1)) == jour(1)
+    assert (cache.disk_hits, cache.misses) == (1, 0)
+    # Read back into memory, and it survives a restart
+    assert cache.get(cle(1)) == jour(1) and cache.hits == 1
+    assert ActivityCache(spill_dir=str(tmp_path)).get(cle(1)) == jour(1)
+
+
+@pytest.mark.api
+def test_past_day_is_not_modified_without_simulating(app, client, monkeypatch):
+    params = {'user_id': 4, 'year': 2024, 'month': 7, 'day': 18}
+    response = client.get("/", params=params)
+    assert response.status_code == 200
+    etag = response.headers["ETag"]
+    assert response.headers["Cache-Control"] == app.PAST_DAY_CACHE_CONTROL
+
+    def simulation(*args):
+        raise AssertionError("Simulated for a 304")
+
+    with monkeypatch.context() as patch:
+        patch.setattr(app.app_tracker, "get_all_connexion", simulation)
+        for if_none_match in (etag, f'"other", W/{etag}', "*"):
+            not_modified = client.get("/", params=params, headers={"If-None-Match": if_none_match})
+            assert not_modified.status_code == 304 and not_modified.content == b""
+            assert not_modified.headers["ETag"] == etag
+    assert client.get("/", params=params, headers={"If-None-Match": '"other"'}).status_code == 200
+
+
+@pytest.mark.api
+def test_today_is_not_cacheable(client):
+    today = date.today()
+    response = client.get("/", params={'user_id': 4, 'year': today.year, 'month': today.month, 'day': today.day})
+    assert response.status_code == 200
+    assert "ETag" not in response.headers and "Cache-Control" not in response.headers
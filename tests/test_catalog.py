@@ -0,0 +1,46 @@
+import os
+import threading
+
+import pytest
+
+from fake_data.catalog import FoodCatalog, get_catalog
+
+
+def ecrire(path, calories: list) -> None:
+    pd = pytest.importorskip("pandas")
+    pd.DataFrame({
+        'id': list(range(1, len(calories) + 1)),
+        'Aliment': [f"Aliment {i}" for i in range(1, len(calories) + 1)],
+        'Type': ['Fruit', 'Viande', 'Fruit', 'Feculent'][:len(calories)],
+        'Valeur calorique': calories,
+    }).to_excel(path, index=False)
+
+
+@pytest.mark.unit
+def test_get_catalog_reloads_only_a_rewritten_file(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    food_file = str(tmp_path / "food.xlsx")
+    ecrire(food_file, [50.0, 200.0, 60.0])
+
+    catalog = get_catalog(food_file)
+    assert isinstance(catalog, FoodCatalog) and catalog.calories.tolist() == [50.0, 200.0, 60.0]
+    # Unchanged file: the same instance, also for threads asking at the same time
+    memes = []
+    threads = [threading.Thread(target=lambda: memes.append(get_catalog(food_file))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(autre is catalog for autre in memes)
+
+    ecrire(food_file, [55.0, 210.0, 65.0, 120.0])
+    mtime = os.path.getmtime(food_file)
+    os.utime(food_file, (mtime + 10, mtime + 10))
+    nouveau = get_catalog(food_file)
+    assert nouveau is not catalog
+    assert nouveau.calories.tolist() == [55.0, 210.0, 65.0, 120.0]
+    assert nouveau.types_aliments == ['Fruit', 'Viande', 'Feculent']
+    assert nouveau.empreinte != catalog.empreinte
+    assert get_catalog(food_file) is nouveau
+    # The catalog in use is not modified
+    assert catalog.calories.tolist() == [50.0, 200.0, 60.0]
@@ -0,0 +1,49 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+
+import numpy as np
+import pytest
+
+
+@pytest.mark.integration
+def test_concurrent_simulations_match_sequential(app_tracker):
+    """Simulations running in many threads give the same result as one at a time"""
+    jobs = [(user.user_id, business_date)
+            for user in app_tracker.users[:8]
+            for business_date in (date(2024, 3, 1), date(2024, 7, 18))]
+    sequential = {job: app_tracker.get_all_connexion(*job) for job in jobs}
+
+    # Each job runs several times, shuffled, so that threads interleave on the same users
+    concurrent_jobs = jobs * 3
+    random.Random(0).shuffle(concurrent_jobs)
+    with ThreadPoolExecutor(max_workers=16) as executor:
+        results = list(executor.map(lambda job: app_tracker.get_all_connexion(*job), concurrent_jobs))
+
+    for job, result in zip(concurrent_jobs, results):
+        assert result == sequential[job], f"user_id={job[0]} date={job[1]}"
+
+
+@pytest.mark.unit
+def test_simulation_leaves_global_random_state_alone(app_tracker):
+    """The simulation neither reseeds nor consumes the global generators"""
+    random.seed(1234)
+    np.random.seed(1234)
+    expected = (random.random(), np.random.random())
+
+    random.seed(1234)
+    np.random.seed(1234)
+    app_tracker.get_all_connexion(app_tracker.users[0].user_id, date(2024, 7, 18))
+    assert (random.random(), np.random.random()) == expected
+
+
+@pytest.mark.unit
+def test_single_meal_matches_full_day(app_tracker):
+    """Simulating one meal gives the rows of that meal in the full day"""
+    user = app_tracker.users[0]
+    business_date = date(2024, 7, 18)
+    full_day = app_tracker.get_all_connexion(user.user_id, business_date)
+    for meal_id in user.heures_repas:
+        rows = [i for i, repas in enumerate(full_day['meal_id']) if repas == meal_id]
+        expected = {key: [values[i] for i in rows] for key, values in full_day.items()} if rows else {}
+        assert app_tracker.get_connexion(meal_id, business_date, user.user_id) == expected
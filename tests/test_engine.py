@@ -0,0 +1,75 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from fake_data import engine
+from fake_data.engine import BatchEngine, philox4x32
+
+# Known-answer tests of Random123 for philox4x32 with 10 rounds: (counter, key, result)
+KAT_PHILOX4X32_10 = [
+    ([0x00000000, 0x00000000, 0x00000000, 0x00000000], [0x00000000, 0x00000000],
+     [0x6627e8d5, 0xe169c58d, 0xbc57ac4c, 0x9b00dbd8]),
+    ([0xffffffff, 0xffffffff, 0xffffffff, 0xffffffff], [0xffffffff, 0xffffffff],
+     [0x408f276d, 0x41c83b0e, 0xa20bc7c6, 0x6d5451fd]),
+    ([0x243f6a88, 0x85a308d3, 0x13198a2e, 0x03707344], [0xa4093822, 0x299f31d0],
+     [0xd16cfe09, 0x94fdcceb, 0x5001e420, 0x24126ea1]),
+]
+
+
+def lignes(columns: dict, user_id: int, rangs=None) -> dict:
+    """Rows of one user in a batch result, or of the given rows"""
+    rangs = np.flatnonzero(columns['user_id'] == user_id) if rangs is None else rangs
+    return {key: values[rangs].tolist() for key, values in columns.items()}
+
+
+@pytest.mark.unit
+def test_philox4x32_matches_known_answers():
+    counters = np.array([counter for counter, _, _ in KAT_PHILOX4X32_10], dtype=np.uint32)
+    keys = np.array([key for _, key, _ in KAT_PHILOX4X32_10], dtype=np.uint32)
+    attendus = np.array([result for _, _, result in KAT_PHILOX4X32_10], dtype=np.uint32)
+    np.testing.assert_array_equal(philox4x32(counters, keys), attendus)
+    # One counter at a time gives the same words
+    for counter, key, result in zip(counters, keys, attendus):
+        np.testing.assert_array_equal(philox4x32(counter, key), result)
+
+
+@pytest.mark.integration
+def test_user_rows_do_not_depend_on_the_batch(app_tracker, monkeypatch):
+    """A (user, date) pair gets the same rows whatever else is simulated with it, and in whatever order"""
+    batch_engine = BatchEngine(app_tracker.registry, app_tracker.catalog)
+    user_ids = app_tracker.registry.user_ids.tolist()
+    business_date = date(2024, 7, 18)
+    tous = batch_engine.simulate(user_ids, business_date)
+
+    # Fewer users, in another order, cut in chunks of 3 pairs
+    monkeypatch.setattr(engine, "CHUNK_SIZE", 3)
+    autres = list(reversed(user_ids[::2]))
+    partiel = batch_engine.simulate(autres, business_date)
+    assert partiel['user_id'].tolist() == [user_id for user_id in autres
+                                           for _ in range(int((tous['user_id'] == user_id).sum()))]
+    for user_id in autres:
+        assert lignes(partiel, user_id) == lignes(tous, user_id), user_id
+
+    # Same user at two dates in one batch: each date as when simulated alone
+    veille = date(2024, 7, 17)
+    deux_jours = batch_engine.simulate([user_ids[0], user_ids[0]], [veille, business_date])
+    seul_veille = batch_engine.simulate([user_ids[0]], veille)
+    n = len(seul_veille['user_id'])
+    assert lignes(deux_jours, None, np.arange(n)) == lignes(seul_veille, user_ids[0])
+    assert lignes(deux_jours, None, np.arange(n, len(deux_jours['user_id']))) == lignes(tous, user_ids[0])
+
+
+@pytest.mark.integration
+def test_empty_batch_and_single_user(app_tracker):
+    batch_engine = BatchEngine(app_tracker.registry, app_tracker.catalog)
+    vide = batch_engine.simulate([], date(2024, 7, 18))
+    assert list(vide) == ['user_id', 'meal_id', 'heure_repas', 'aliment_id', 'quantity']
+    assert all(len(values) == 0 for values in vide.values())
+    assert vide['heure_repas'].dtype == np.dtype('datetime64[s]')
+    assert engine.to_connexion(vide) == {key: [] for key in vide}
+
+    user_id = int(app_tracker.registry.user_ids_de_classe('standard')[0])
+    seul = batch_engine.simulate([user_id], date(2024, 7, 18))
+    assert len(seul['user_id']) > 0 and set(seul['user_id'].tolist()) == {user_id}
+    assert lignes(seul, user_id) == lignes(batch_engine.simulate([user_id, user_id + 1], date(2024, 7, 18)), user_id)
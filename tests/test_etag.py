@@ -0,0 +1,36 @@
+import os
+import shutil
+from datetime import date
+
+import pytest
+
+from fake_data.app_tracker import AppTracker
+
+USERS = [
+    {'nom': 'Dupont', 'prenom': 'Marie', 'age': 30, 'sexe': 'femme', 'user_id': 1, 'classe_mangeur': 'standard'},
+    {'nom': 'Martin', 'prenom': 'Paul', 'age': 40, 'sexe': 'homme', 'user_id': 2, 'classe_mangeur': 'vegan'},
+]
+
+
+@pytest.mark.unit
+def test_etag_follows_the_class_tables_and_the_users(tmp_path, monkeypatch, root_dir):
+    """Days served with a year-long immutable ETag must get a new one when their inputs change"""
+    for file_name in ("food_processed.xlsx", "standard_class.XLSX", "vegan_class.XLSX"):
+        shutil.copyfile(os.path.join(root_dir, file_name), tmp_path / file_name)
+    monkeypatch.chdir(tmp_path)
+    app_tracker = AppTracker(USERS)
+    business_date = date(2024, 7, 18)
+    etag = app_tracker.etag(1, business_date)
+    assert app_tracker.etag(1, business_date) == etag
+
+    # New content for the workbook of the standard class
+    shutil.copyfile(tmp_path / "vegan_class.XLSX", tmp_path / "standard_class.XLSX")
+    mtime = os.path.getmtime(tmp_path / "standard_class.XLSX")
+    os.utime(tmp_path / "standard_class.XLSX", (mtime + 10, mtime + 10))
+    modifie = app_tracker.etag(1, business_date)
+    assert modifie != etag
+
+    # Same class tables, but the second user changed class
+    autre_classe = [USERS[0], {**USERS[1], 'classe_mangeur': 'standard'}]
+    assert AppTracker(autre_classe).etag(1, business_date) != modifie
+    assert AppTracker(USERS).etag(1, business_date) == modifie
@@ -0,0 +1,74 @@
+import json
+import os
+from datetime import date
+
+import pytest
+
+from fake_data import export as export_module
+from fake_data.export import MANIFEST, export, main
+
+
+def partitions(out: str) -> list:
+    return sorted(os.path.relpath(os.path.join(dossier, nom), out)
+                  for dossier, _, noms in os.walk(out) for nom in noms if nom.endswith(".parquet"))
+
+
+@pytest.mark.integration
+def test_interrupted_export_resumes_with_the_same_data(app_tracker, tmp_path, monkeypatch):
+    """An export stopped midway and run again writes the partitions of a single run, and only the missing ones"""
+    pq = pytest.importorskip("pyarrow.parquet")
+    silencieux = lambda message: None  # noqa: E731
+    start, end = date(2024, 7, 18), date(2024, 7, 19)
+    reference = export(app_tracker, start, end, str(tmp_path / "reference"), chunk_size=3, log=silencieux)
+
+    # Stopped (Ctrl+C) while waiting for its third batch of partitions
+    out = str(tmp_path / "out")
+    wait = export_module.wait
+    appels = []
+
+    def interrompre(futures, **kwargs):
+        appels.append(len(futures))
+        if len(appels) == 3:
+            raise KeyboardInterrupt
+        return wait(futures, **kwargs)
+
+    monkeypatch.setattr(export_module, "wait", interrompre)
+    with pytest.raises(KeyboardInterrupt):
+        export(app_tracker, start, end, out, chunk_size=3, log=silencieux)
+    monkeypatch.undo()
+    with open(os.path.join(out, MANIFEST), encoding="utf-8") as f:
+        faites = [json.loads(line)['partition'] for line in f]
+    assert 0 < len(faites) < reference['partitions']
+
+    stats = export(app_tracker, start, end, out, chunk_size=3, log=silencieux)
+    assert stats['skipped'] == len(faites)
+    assert stats['skipped'] + stats['partitions'] == reference['partitions']
+    assert partitions(out) == partitions(str(tmp_path / "reference"))
+    for relative_path in partitions(out):
+        assert pq.read_table(os.path.join(out, relative_path)).equals(
+            pq.read_table(str(tmp_path / "reference" / relative_path))), relative_path
+
+    # Other users, or other chunks, would land under the paths already exported
+    with pytest.raises(ValueError, match="chunk-size"):
+        export(app_tracker, start, end, out, chunk_size=4, log=silencieux)
+    with pytest.raises(SystemExit):
+        main(["--start", "2024-07-18", "--end", "2024-07-19", "--users", "1-5", "--chunk-size", "3",
+              "--out", out])
+
+
+@pytest.mark.integration
+def test_only_usage_errors_exit_with_the_usage(tmp_path, monkeypatch, root_dir, capsys):
+    monkeypatch.chdir(root_dir)
+    arguments = ["--start", "2024-07-18", "--end", "2024-07-18", "--out", str(tmp_path)]
+    with pytest.raises(SystemExit) as sortie:
+        main(arguments + ["--chunk-size", "0"])
+    assert sortie.value.code == 2
+    assert "--chunk-size should be at least 1" in capsys.readouterr().err
+
+    # A failure of the export itself is not reported as a usage error
+    def echec(*args, **kwargs):
+        raise ValueError("failure inside the export")
+
+    monkeypatch.setattr(export_module, "export", echec)
+    with pytest.raises(ValueError, match="failure inside the export"):
+        main(arguments)
@@ -0,0 +1,123 @@
+import io
+import json
+
+import pytest
+
+from fake_data import formats
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("accept, expected", [
+    (None, formats.JSON),
+    ("*/*", formats.JSON),
+    ("text/html,application/xhtml+xml,*/*;q=0.8", formats.JSON),
+    ("application/vnd.apache.arrow.stream", formats.ARROW),
+    ("application/json;q=0.5, application/x-parquet", formats.PARQUET),
+    ("application/msgpack, */*;q=0.1", formats.MSGPACK),
+    ("text/csv", None),
+    ("application/msgpack;q=0", None),
+])
+def test_negocier(accept, expected):
+    assert formats.negocier(accept) == expected
+
+
+@pytest.mark.unit
+def test_arrow_round_trip():
+    pa = pytest.importorskip("pyarrow")
+    columns = {
+        'user_id': [4, 4],
+        'meal_id': [1, 2],
+        'heure_repas': ['2024-07-18 08:12:00', '2024-07-18 12:40:00'],
+        'aliment_id': [12, 345],
+        'quantity': [1, 2],
+    }
+    table = pa.ipc.open_stream(formats.encoder(columns, formats.ARROW)).read_all()
+    assert table.column('aliment_id').to_pylist() == columns['aliment_id']
+    assert str(table.column('heure_repas')[0]) == '2024-07-18 08:12:00'
+    # An empty day keeps the schema
+    assert pa.ipc.open_stream(formats.encoder({}, formats.ARROW)).read_all().schema == table.schema
+
+
+def colonnes(table) -> dict:
+    """Columns of an Arrow table as the JSON body gives them"""
+    columns = table.to_pydict()
+    columns['heure_repas'] = [str(heure) for heure in columns['heure_repas']]
+    if 'date' in columns:
+        columns['date'] = [jour.isoformat() for jour in columns['date']]
+    return columns
+
+
+@pytest.mark.api
+@pytest.mark.parametrize("path, params", [
+    ("/", {'user_id': 4, 'year': 2024, 'month': 7, 'day': 18}),
+    ("/range", {'user_id': 4, 'start': "2024-07-18", 'end': "2024-07-19"}),
+    ("/population", {'date': "2024-07-18"}),
+])
+def test_negotiation_over_http(client, path, params):
+    refus = client.get(path, params=params, headers={"Accept": "text/csv"})
+    assert refus.status_code == 406
+    assert refus.json() == f"Supported media types: {', '.join(formats.MEDIA_TYPES)}"
+    for media_type in formats.MEDIA_TYPES:
+        response = client.get(path, params=params, headers={"Accept": media_type})
+        assert response.status_code == 200
+        assert response.headers["Vary"] == "Accept"
+        assert response.headers["Content-Type"].startswith(media_type if media_type != formats.JSON else "application/")
+
+
+@pytest.mark.api
+def test_each_media_type_has_its_own_etag(client):
+    params = {'user_id': 4, 'year': 2024, 'month': 7, 'day': 18, 'meal_id': 1}
+    etags = {media_type: client.get("/", params=params, headers={"Accept": media_type}).headers["ETag"]
+             for media_type in formats.MEDIA_TYPES}
+    assert len(set(etags.values())) == len(formats.MEDIA_TYPES)
+    # Stable for a media type, and an ETag of one type does not validate another
+    assert client.get("/", params=params, headers={"Accept": formats.ARROW}).headers["ETag"] == etags[formats.ARROW]
+    autre = client.get("/", params=params, headers={"Accept": formats.ARROW, "If-None-Match": etags[formats.JSON]})
+    assert autre.status_code == 200
+
+
+@pytest.mark.api
+@pytest.mark.parametrize("path, params", [
+    ("/", {'user_id': 4, 'year': 2024, 'month': 7, 'day': 18}),
+    ("/population", {'date': "2024-07-18", 'classe_mangeur': "vegan"}),
+])
+def test_binary_bodies_hold_the_json_columns(client, path, params):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    msgpack = pytest.importorskip("msgpack")
+    attendu = client.get(path, params=params).json()
+    assert attendu['user_id']
+
+    def body(media_type):
+        return client.get(path, params=params, headers={"Accept": media_type}).content
+
+    assert colonnes(pa.ipc.open_stream(body(formats.ARROW)).read_all()) == attendu
+    assert colonnes(pq.read_table(pa.BufferReader(body(formats.PARQUET)))) == attendu
+    assert msgpack.unpackb(body(formats.MSGPACK)) == attendu
+
+
+@pytest.mark.api
+def test_range_bodies_hold_one_batch_or_map_per_day(client):
+    pa = pytest.importorskip("pyarrow")
+    pq = pytest.importorskip("pyarrow.parquet")
+    msgpack = pytest.importorskip("msgpack")
+    params = {'user_id': 4, 'start': "2024-07-18", 'end': "2024-07-20"}
+    jours = [json.loads(line) for line in client.get("/range", params=params).text.splitlines()]
+    assert [jour['date'] for jour in jours] == ["2024-07-18", "2024-07-19", "2024-07-20"]
+
+    def body(media_type):
+        return client.get("/range", params=params, headers={"Accept": media_type}).content
+
+    batches = list(pa.ipc.open_stream(body(formats.ARROW)))
+    assert len(batches) == len(jours)
+    for batch, jour in zip(batches, jours):
+        columns = colonnes(pa.Table.from_batches([batch]))
+        assert set(columns.pop('date')) <= {jour['date']}
+        assert columns == {key: values for key, values in jour.items() if key != 'date'}
+
+    assert [dict(jour) for jour in msgpack.Unpacker(io.BytesIO(body(formats.MSGPACK)))] == jours
+
+    table = colonnes(pq.read_table(pa.BufferReader(body(formats.PARQUET))))
+    for key in table:
+        assert table[key] == [value for jour in jours
+                              for value in (jour[key] if key != 'date' else [jour['date']] * len(jour['user_id']))]
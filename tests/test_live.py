@@ -0,0 +1,71 @@
+import asyncio
+from datetime import date, datetime
+
+import pytest
+
+from fake_data import metrics
+from fake_data.live import LiveFeed
+
+
+@pytest.mark.integration
+def test_live_feed_pushes_followed_meals_in_time_order(app_tracker):
+    """A day of meals, played 86400 times faster, reaches the subscribers that follow them, as simulated"""
+    business_date = date(2024, 7, 18)
+    suivis = set(app_tracker.registry.user_ids_de_classe('vegan').tolist()) | {5}
+    attendus = set()
+    for user_id in suivis:
+        connexion = app_tracker.get_all_connexion(user_id, business_date)
+        for meal_id, heure in zip(connexion['meal_id'], connexion['heure_repas']):
+            if heure.startswith(business_date.isoformat()):
+                attendus.add((user_id, meal_id, heure))
+
+    async def ecouter():
+        feed = LiveFeed(app_tracker, debut=datetime(2024, 7, 18), vitesse=86400)
+        subscription = feed.subscribe(user_ids=[5], classes_mangeurs=['vegan'])
+        events = []
+        try:
+            while len(events) < len(attendus):
+                events.append(await asyncio.wait_for(subscription.get(), 20))
+        finally:
+            await feed.stop()
+        return events
+
+    events = asyncio.run(ecouter())
+    assert {(event['user_id'], event['meal_id'], event['heure_repas']) for event in events} == attendus
+    heures = [event['heure_repas'] for event in events]
+    assert heures == sorted(heures)
+    event = events[0]
+    connexion = app_tracker.get_connexion(event['meal_id'], business_date, event['user_id'])
+    assert (event['aliment_id'], event['quantity']) == (connexion['aliment_id'], connexion['quantity'])
+
+
+@pytest.mark.api
+def test_websocket_client_leaving_a_quiet_feed_is_unsubscribed(app, monkeypatch):
+    """A client that closes its socket is unsubscribed without waiting for an event of the users it follows"""
+    scope = {'type': "websocket", 'path': "/live/ws", 'raw_path': b"/live/ws", 'query_string': b"user_id=4",
+             'headers': [], 'scheme': "ws", 'server': ("test", 80), 'client': ("test", 1234), 'root_path': "",
+             'subprotocols': []}
+
+    async def session():
+        monkeypatch.setattr(app, "live_feed", LiveFeed(app.app_tracker, executor=app.simulations.executor))
+        messages = asyncio.Queue()
+        envoyes = []
+        await messages.put({'type': "websocket.connect"})
+
+        async def send(message):
+            envoyes.append(message)
+            if message['type'] == "websocket.accept":
+                # Messages of the client are ignored, then it leaves before any meal of user 4
+                await messages.put({'type': "websocket.receive", 'text': "ping"})
+                await messages.put({'type': "websocket.disconnect", 'code': 1000})
+
+        try:
+            # Returns once the disconnection is read, instead of waiting for the next event
+            await asyncio.wait_for(app.app(scope, messages.get, send), 5)
+        finally:
+            await app.live_feed.stop()
+        return envoyes
+
+    envoyes = asyncio.run(session())
+    assert [message['type'] for message in envoyes] == ["websocket.accept"]
+    assert metrics.LIVE_SUBSCRIBERS.value() == 0
@@ -0,0 +1,28 @@
+import pytest
+
+from fake_data import metrics
+
+
+@pytest.mark.unit
+def test_histogram_exposition():
+    histogram = metrics.Histogram("test_seconds", "Test durations", ("stage",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 3.0):
+        histogram.observe(value, stage="simulation")
+    lines = histogram.exposition()
+    assert 'test_seconds_bucket{stage="simulation",le="0.1"} 1' in lines
+    assert 'test_seconds_bucket{stage="simulation",le="1.0"} 3' in lines
+    assert 'test_seconds_bucket{stage="simulation",le="+Inf"} 4' in lines
+    assert 'test_seconds_count{stage="simulation"} 4' in lines
+
+
+@pytest.mark.unit
+def test_chrono_records_request_timings():
+    timings = metrics.start_request()
+    avant = metrics.STAGE_SECONDS.count(stage="test")
+    with metrics.chrono("test"):
+        pass
+    with metrics.chrono("test"):
+        pass
+    assert list(timings) == ["test"]
+    assert metrics.STAGE_SECONDS.count(stage="test") == avant + 2
+    assert metrics.server_timing({"simulation": 0.0125}, 0.02) == "simulation;dur=12.500, total;dur=20.000"
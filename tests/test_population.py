@@ -0,0 +1,54 @@
+from datetime import date
+
+import numpy as np
+import pytest
+
+from fake_data.population import CLASSES_MANGEURS, generer_population
+
+
+@pytest.mark.unit
+def test_population_is_deterministic():
+    """The same seed gives the same users, whatever the size of the population"""
+    grande = generer_population(200_000, seed=3)
+    petite = generer_population(1_000, seed=3)
+    for column in ('ages', 'sexes', 'classes', 'noms', 'prenoms'):
+        assert np.array_equal(getattr(petite, column), getattr(grande, column)[:1_000])
+    assert not np.array_equal(generer_population(1_000, seed=4).classes, petite.classes)
+
+
+@pytest.mark.unit
+def test_population_follows_class_mix():
+    population = generer_population(200_000, seed=0)
+    for code, classe_mangeur in enumerate(population.vocab_classes):
+        assert (population.classes == code).mean() == pytest.approx(CLASSES_MANGEURS[classe_mangeur], abs=0.01)
+    assert population.record(200_000).user_id == 200_000
+    assert population.record(200_001) is None
+
+
+@pytest.mark.api
+def test_population_route_concatenates_users_in_registry_order(app, client):
+    business_date = date(2024, 7, 18)
+    registry = app.app_tracker.registry
+
+    def attendu(user_ids) -> dict:
+        columns = {key: [] for key in ('user_id', 'meal_id', 'heure_repas', 'aliment_id', 'quantity')}
+        for user_id in user_ids.tolist():
+            for key, values in app.app_tracker.get_all_connexion(user_id, business_date).items():
+                columns[key].extend(values)
+        return columns
+
+    tous = client.get("/population", params={'date': "2024-07-18"})
+    assert tous.status_code == 200
+    assert tous.headers["Vary"] == "Accept"
+    assert tous.json() == attendu(registry.user_ids)
+
+    vegans = client.get("/population", params={'date': "2024-07-18", 'classe_mangeur': "vegan"})
+    assert vegans.status_code == 200
+    assert vegans.json() == attendu(registry.user_ids_de_classe("vegan"))
+    assert set(vegans.json()['user_id']) == set(registry.user_ids_de_classe("vegan").tolist())
+
+    # Same status as the other invalid inputs of the route
+    inconnue = client.get("/population", params={'date': "2024-07-18", 'classe_mangeur': "carnivore"})
+    avant_2024 = client.get("/population", params={'date': "2023-12-31"})
+    assert inconnue.status_code == avant_2024.status_code == 404
+    assert inconnue.json() == "Classe_mangeur Not found"
@@ -0,0 +1,68 @@
+import os
+import shutil
+
+import pytest
+
+from fake_data import sensor, workers
+from fake_data.population import generer_population
+from fake_data.sensor import PROFILS, EaterProfile, create_user_instance, get_profile
+
+
+def user(user_id: int, classe_mangeur: str):
+    return create_user_instance({'nom': 'Dupont', 'prenom': 'Marie', 'age': 30, 'sexe': 'femme',
+                                 'user_id': user_id, 'classe_mangeur': classe_mangeur})
+
+
+@pytest.mark.unit
+def test_users_share_their_class_profile_without_io(monkeypatch):
+    def lecture(*args, **kwargs):
+        raise AssertionError("A user was created with I/O")
+
+    monkeypatch.setattr(sensor, "load_columns", lecture)
+    for classe_mangeur, profil in PROFILS.items():
+        premier, second = user(1, classe_mangeur), user(2, classe_mangeur)
+        assert premier.profil is second.profil is profil
+        assert premier.classe_mangeur == classe_mangeur
+        assert not hasattr(premier, '__dict__')
+
+    with pytest.raises(TypeError):
+        premier.heures_repas[1] = '09:00'
+
+
+@pytest.mark.unit
+def test_profile_tables_are_read_only_arrays():
+    profil = PROFILS['standard']
+    types, moyennes, ecarts_types, moyenne_par_type = profil.table_repas(2)
+    assert moyennes.shape == ecarts_types.shape == types.shape
+    assert (moyennes == profil.moyennes[profil.repas.index(2)]).all()
+    assert moyenne_par_type[types[0]] == moyennes[0]
+    with pytest.raises(ValueError):
+        profil.moyennes[0, 0] = 1.0
+    assert profil.minutes.tolist() == [480, 720, 960, 1200]
+
+
+@pytest.mark.unit
+def test_profile_tables_follow_the_workbook(tmp_path, monkeypatch, root_dir):
+    """Tables are built again when the class workbook's mtime changes"""
+    monkeypatch.chdir(root_dir)
+    workbook = tmp_path / "standard_class.XLSX"
+    shutil.copyfile(os.path.join(root_dir, "standard_class.XLSX"), workbook)
+    standard = PROFILS['standard']
+    profil = EaterProfile('standard', str(workbook), standard.heures_repas, standard.intervalles_calories)
+
+    moyennes = profil.moyennes
+    assert profil.moyennes is moyennes
+    mtime = os.path.getmtime(workbook)
+    os.utime(workbook, (mtime + 10, mtime + 10))
+    assert profil.moyennes is not moyennes
+    assert (profil.moyennes == moyennes).all()
+
+
+@pytest.mark.unit
+def test_init_worker_reads_every_class_table(monkeypatch, root_dir):
+    monkeypatch.chdir(root_dir)
+    registry = generer_population(50, seed=0)
+    for classe_mangeur in registry.vocab_classes:
+        monkeypatch.setattr(get_profile(classe_mangeur), '_tables', None)
+    workers.init_worker(registry, "food_processed.xlsx")
+    assert all(get_profile(classe_mangeur)._tables is not None for classe_mangeur in registry.vocab_classes)
@@ -0,0 +1,41 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+
+
+@pytest.mark.api
+def test_range_streams_every_day_and_rejects_bad_ranges(app, client):
+    start = date(2024, 7, 1)
+    response = client.get("/range", params={'user_id': 4, 'start': "2024-07-01", 'end': "2024-07-03"})
+    assert response.status_code == 200
+    days = [json.loads(line) for line in response.text.splitlines()]
+    assert [day.pop('date') for day in days] == ["2024-07-01", "2024-07-02", "2024-07-03"]
+    assert days == [app.app_tracker.get_all_connexion(4, start + timedelta(days=k)) for k in range(3)]
+
+    inverse = client.get("/range", params={'user_id': 4, 'start': "2024-07-03", 'end': "2024-07-01"})
+    assert inverse.status_code == 404
+    assert inverse.json() == "End date should be after start date"
+
+    end = start + timedelta(days=app.MAX_RANGE_DAYS)
+    trop = client.get("/range", params={'user_id': 4, 'start': start.isoformat(), 'end': end.isoformat()})
+    assert trop.status_code == 400
+    assert trop.json() == f"At most {app.MAX_RANGE_DAYS} days per range"
+
+
+@pytest.mark.api
+def test_aggregates_rejects_bad_ranges_like_range(app, client):
+    params = {'user_id': 4, 'start': "2024-07-01", 'end': "2024-07-14", 'granularity': "week"}
+    response = client.get("/aggregates", params=params)
+    assert response.status_code == 200
+    result = app.app_tracker.get_aggregates(4, date(2024, 7, 1), date(2024, 7, 14), "week")
+    assert response.json() == json.loads(json.dumps({'user_id': 4, 'granularity': "week", **result}))
+
+    inverse = client.get("/aggregates", params={**params, 'start': "2024-07-14", 'end': "2024-07-01"})
+    assert inverse.status_code == 404
+    assert inverse.json() == "End date should be after start date"
+
+    end = date(2024, 1, 1) + timedelta(days=app.MAX_RANGE_DAYS)
+    trop = client.get("/aggregates", params={**params, 'start': "2024-01-01", 'end': end.isoformat()})
+    assert trop.status_code == 400
+    assert trop.json() == f"At most {app.MAX_RANGE_DAYS} days per range"
@@ -0,0 +1,49 @@
+import pytest
+
+from fake_data.registry import UserRegistry
+from fake_data.sensor import PROFILS
+
+USERS = [
+    {'nom': 'Dupont', 'prenom': 'Marie', 'age': 30, 'sexe': 'femme', 'user_id': 7, 'classe_mangeur': 'vegan'},
+    {'nom': 'Martin', 'prenom': 'Paul', 'age': 41, 'sexe': 'homme', 'user_id': 3, 'classe_mangeur': 'standard'},
+    {'nom': 'Durand', 'prenom': 'Lea', 'age': 25, 'sexe': 'femme', 'user_id': 12, 'classe_mangeur': 'vegan'},
+]
+
+
+@pytest.mark.unit
+@pytest.mark.parametrize("user_ids", [[7, 3, 12], [1, 2, 3]], ids=["index", "contiguous"])
+def test_lookup_by_id(user_ids):
+    registry = UserRegistry.from_records([{**user, 'user_id': user_id} for user, user_id in zip(USERS, user_ids)])
+    for user, user_id in zip(USERS, user_ids):
+        assert user_id in registry
+        assert registry.record(user_id).to_dict() == {**user, 'user_id': user_id}
+        instance = registry.get(user_id)
+        assert (instance.user_id, instance.nom, instance.age) == (user_id, user['nom'], user['age'])
+        assert instance.profil is PROFILS[user['classe_mangeur']]
+        # Users are not kept, only their class profile is shared
+        assert registry.get(user_id) is not instance
+    assert registry.get(99) is None and registry.record(99) is None and 99 not in registry
+    assert registry.rows(user_ids[::-1]).tolist() == [2, 1, 0]
+
+
+@pytest.mark.unit
+def test_lookup_by_class():
+    registry = UserRegistry.from_records(USERS)
+    assert registry.user_ids_de_classe('vegan').tolist() == [7, 12]
+    assert registry.user_ids_de_classe('standard').tolist() == [3]
+    assert registry.user_ids_de_classe('fasting').tolist() == []
+    assert registry.user_ids_de_classe().tolist() == [7, 3, 12]
+    assert registry.classe_mangeur(3) == 'standard'
+    assert registry.classe_mangeur(99) is None
+    assert [record.user_id for record in registry.iter_records('vegan')] == [7, 12]
+
+
+@pytest.mark.unit
+def test_unknown_ids_raise_key_error():
+    registry = UserRegistry.from_records(USERS)
+    with pytest.raises(KeyError, match="99"):
+        registry.rows([7, 99])
+    with pytest.raises(KeyError):
+        registry.facteurs_calories([3, 4])
+    with pytest.raises(ValueError):
+        UserRegistry.from_records(USERS + [USERS[0]])
@@ -0,0 +1,42 @@
+import argparse
+import io
+import json
+from datetime import date
+
+import pytest
+
+from fake_data.replay import parse_speed, replay
+
+
+@pytest.mark.integration
+def test_replay_is_in_time_order_and_complete(app_tracker):
+    """Every simulated meal of the range is replayed once, all users merged in time order"""
+    sortie = io.BytesIO()
+    stats = replay(app_tracker, date(2024, 7, 18), date(2024, 7, 20), sortie, chunk_size=7, log=lambda message: None)
+    events = [json.loads(line) for line in sortie.getvalue().splitlines()]
+    assert stats['events'] == len(events) > 0
+
+    cles = [(event['heure_repas'], event['user_id']) for event in events]
+    assert cles == sorted(cles)
+
+    for user_id in (1, 4, 13):
+        for business_date in (date(2024, 7, 18), date(2024, 7, 20)):
+            connexion = app_tracker.get_all_connexion(user_id, business_date)
+            replayed = [event for event in events
+                        if event['user_id'] == user_id and event['date'] == business_date.isoformat()]
+            assert sorted(connexion['aliment_id']) == sorted(a for event in replayed for a in event['aliment_id'])
+            assert {event['meal_id'] for event in replayed} == set(connexion['meal_id'])
+
+
+@pytest.mark.unit
+def test_parse_speed_bounds():
+    assert parse_speed("max") is None
+    assert parse_speed("60x") == parse_speed("60") == 60.0
+    assert parse_speed("1") == 1.0 and parse_speed("10000") == 10000.0
+    for value in ("0.001", "0", "-5", "1e9", "10001", "fast"):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_speed(value)
+    # Library callers get the same limits as the command line
+    for speed in (0.001, 0, -5, 1e9, 10001):
+        with pytest.raises(ValueError):
+            replay(None, date(2024, 7, 18), date(2024, 7, 18), io.BytesIO(), speed=speed)
@@ -0,0 +1,71 @@
+import math
+
+import numpy as np
+import pytest
+
+from fake_data.catalog import FoodCatalog
+from fake_data.sampling import tirer_aliments, tirer_selon
+
+CATALOG = FoodCatalog({
+    'id': list(range(1, 12)),
+    'Aliment': [f"Aliment {i}" for i in range(1, 12)],
+    'Type': ['Fruit', 'Viande', 'Fruit', 'Feculent', 'Fruit', 'Viande', 'Fruit', 'Fruit', 'Feculent', 'Viande',
+             float('nan')],
+    'Valeur calorique': [50.0] * 11,
+})
+
+
+def chi2_critique(ddl: int, z: float = 3.09) -> float:
+    """
+    Chi-square value exceeded with probability about 0.001 (Wilson-Hilferty approximation)
+    """
+    h = 2 / (9 * ddl)
+    return ddl * (1 - h + z * math.sqrt(h)) ** 3
+
+
+def chi2(observes: np.ndarray, attendus: np.ndarray) -> float:
+    return float(((observes - attendus) ** 2 / attendus).sum())
+
+
+@pytest.mark.unit
+def test_tirer_selon_matches_choice():
+    for seed in range(200):
+        probabilites = np.clip(np.random.RandomState(seed).normal(0.1, 0.1, 30), 0, None)
+        probabilites /= probabilites.sum()
+        types = np.array([f"type {i}" for i in range(30)], dtype=object)
+        attendu = np.random.RandomState(seed).choice(types, size=30, p=probabilites)
+        assert (types[tirer_selon(np.random.RandomState(seed), probabilites, 30)] == attendu).all()
+
+    with pytest.raises(ValueError):
+        tirer_selon(np.random.RandomState(0), np.zeros(3), 3)
+
+
+@pytest.mark.unit
+def test_tirer_aliments_is_uniform_within_each_type():
+    np_rng = np.random.RandomState(42)
+    types = ['Fruit', 'Viande', 'Feculent'] * 20000
+    positions = tirer_aliments(np_rng, CATALOG, types)
+    for type_aliment in ('Fruit', 'Viande', 'Feculent'):
+        du_type = CATALOG.positions_du_type(type_aliment)
+        tirees = positions[np.array(types) == type_aliment]
+        assert np.isin(tirees, du_type).all()
+        observes = np.array([(tirees == position).sum() for position in du_type], dtype=np.float64)
+        attendus = np.full(len(du_type), len(tirees) / len(du_type))
+        assert chi2(observes, attendus) < chi2_critique(len(du_type) - 1)
+
+    # Same distribution as the draw it replaces
+    anciens = np.array([CATALOG.positions_du_type('Fruit')[np_rng.choice(5, size=1, replace=False)[0]]
+                        for _ in range(20000)])
+    nouveaux = tirer_aliments(np_rng, CATALOG, ['Fruit'] * 20000)
+    table = np.array([[(tirage == position).sum() for position in CATALOG.positions_du_type('Fruit')]
+                      for tirage in (anciens, nouveaux)], dtype=np.float64)
+    attendus = table.sum(axis=1, keepdims=True) * table.sum(axis=0, keepdims=True) / table.sum()
+    assert chi2(table, attendus) < chi2_critique(4)
+
+
+@pytest.mark.unit
+def test_tirer_aliments_flags_missing_types():
+    positions = tirer_aliments(np.random.RandomState(0), CATALOG, ['Fruit', 'Dessert', 'Viande'])
+    assert positions[1] == -1
+    assert positions[0] in CATALOG.positions_du_type('Fruit')
+    assert positions[2] in CATALOG.positions_du_type('Viande')
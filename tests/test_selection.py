@@ -0,0 +1,42 @@
+import copy
+import random
+
+import pytest
+
+from fake_data.sensor import PROFILS, create_user_instance
+
+
+def retirer_reference(user, aliments_selectionnes: list, total_calories: float, max_calories: float) -> list:
+    """The trimming before the single sort: sort again, then drop the least probable food, until within bounds"""
+    probabilites_df = user.probabilites_df
+    while total_calories > max_calories:
+        aliments_selectionnes.sort(key=lambda x: probabilites_df[probabilites_df['Types'] == x['Type']][
+            f"Meal_{x['Repas']}_avg"].values[0])
+        aliment_a_retirer = aliments_selectionnes.pop(0)
+        total_calories -= aliment_a_retirer['Valeur calorique'] * aliment_a_retirer['Quantite']
+    return aliments_selectionnes
+
+
+@pytest.mark.integration
+@pytest.mark.parametrize("classe_mangeur", [classe for classe, profil in PROFILS.items() if profil.repas])
+def test_single_sort_trimming_matches_the_reference(app_tracker, classe_mangeur):
+    pytest.importorskip("pandas")
+    catalog = app_tracker.catalog
+    user = create_user_instance({'nom': 'Dupont', 'prenom': 'Marie', 'age': 30, 'sexe': 'femme',
+                                 'user_id': 1, 'classe_mangeur': classe_mangeur})
+    for seed in range(40):
+        rng = random.Random(seed)
+        repas = rng.choice(list(user.heures_repas))
+        # Types of the class, with repeats so that equal probabilities keep their order
+        types = [t for t in user.table_repas(repas)[0].tolist() if len(catalog.positions_du_type(t))]
+        aliments = []
+        for type_aliment in rng.choices(types, k=rng.randint(1, 12)):
+            aliment = catalog.aliment(rng.choice(catalog.positions_du_type(type_aliment).tolist()))
+            aliment['Repas'] = repas
+            aliment['Quantite'] = rng.randint(1, 5)
+            aliments.append(aliment)
+        total_calories = sum(aliment['Valeur calorique'] * aliment['Quantite'] for aliment in aliments)
+        max_calories = total_calories * rng.uniform(0, 1)
+
+        attendu = retirer_reference(user, copy.deepcopy(aliments), total_calories, max_calories)
+        assert user.retirer_moins_probables(aliments, total_calories, max_calories, repas) == attendu, seed
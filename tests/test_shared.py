@@ -0,0 +1,32 @@
+import os
+
+import numpy as np
+import pytest
+
+from fake_data import assets
+
+
+@pytest.mark.unit
+def test_attached_tables_are_shared_read_only_maps(tmp_path, root_dir):
+    food_file = os.path.join(root_dir, "food_processed.xlsx")
+    cache_dir = str(tmp_path / "cache")
+    shared_dir = str(tmp_path / "shared")
+
+    private = assets.read_columns(food_file, cache_dir)
+    premier = assets.attach_table(food_file, cache_dir, shared_dir)
+    second = assets.attach_table(food_file, cache_dir, shared_dir)
+
+    # Published once, under the content hash of the workbook
+    assert os.listdir(shared_dir) == [os.path.basename(assets.publish_table(food_file, cache_dir, shared_dir))]
+    assert list(premier) == list(private)
+    for column, values in private.items():
+        if values.dtype == object:
+            # Missing cells are NaN, which is not equal to itself
+            assert [v if v == v else None for v in premier[column].tolist()] == \
+                [v if v == v else None for v in values.tolist()]
+        else:
+            np.testing.assert_array_equal(premier[column], values)
+
+    calories = premier['Valeur calorique']
+    assert isinstance(calories, np.memmap) and not calories.flags.writeable
+    assert calories.filename == second['Valeur calorique'].filename
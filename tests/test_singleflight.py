@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from fake_data import metrics
+from fake_data.singleflight import SingleFlight
+
+
+def attendre(condition, timeout: float = 5.0) -> None:
+    debut = time.perf_counter()
+    while not condition():
+        assert time.perf_counter() - debut < timeout, "Timed out"
+        time.sleep(0.001)
+
+
+@pytest.mark.unit
+def test_identical_calls_share_one_computation():
+    flight = SingleFlight(name="test")
+    appels = []
+    fin = threading.Event()
+
+    def calcul(x):
+        appels.append(x)
+        fin.wait(5)
+        return x * 2
+
+    async def scenario():
+        taches = [asyncio.ensure_future(flight.run("a", calcul, 21)) for _ in range(10)]
+        taches.append(asyncio.ensure_future(flight.run("b", calcul, 1)))
+        await asyncio.sleep(0)
+        fin.set()
+        return await asyncio.gather(*taches)
+
+    assert asyncio.run(scenario()) == [42] * 10 + [2]
+    assert sorted(appels) == [1, 21]
+    assert len(flight) == 0
+    assert metrics.SINGLE_FLIGHT.value(name="test", outcome="leader") == 2
+    assert metrics.SINGLE_FLIGHT.value(name="test", outcome="coalesced") == 9
+
+
+@pytest.mark.integration
+def test_concurrent_identical_requests_simulate_once(monkeypatch, app):
+    """N identical requests arriving together run one simulation and get the same answer"""
+    httpx = pytest.importorskip("httpx")
+
+    n = 20
+    simulations = []
+    coalesced = metrics.SINGLE_FLIGHT.value(name="connexion", outcome="coalesced")
+    get_all_connexion = app.app_tracker.get_all_connexion
+
+    def simulation(user_id, business_date):
+        simulations.append((user_id, business_date))
+        # Hold the simulation until every other request joined it
+        attendre(lambda: metrics.SINGLE_FLIGHT.value(name="connexion", outcome="coalesced") >= coalesced + n - 1)
+        return get_all_connexion(user_id, business_date)
+
+    monkeypatch.setattr(app.app_tracker, "get_all_connexion", simulation)
+    app.app_tracker.cache.clear()
+
+    async def requests():
+        transport = httpx.ASGITransport(app=app.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(*[client.get("/?user_id=4&year=2024&month=7&day=18") for _ in range(n)])
+
+    responses = asyncio.run(requests())
+    assert [response.status_code for response in responses] == [200] * n
+    assert len({response.content for response in responses}) == 1
+    assert len(simulations) == 1
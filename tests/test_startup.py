@@ -0,0 +1,35 @@
+import os
+import subprocess
+import sys
+
+import pytest
+
+# Run in a new interpreter: the test session has already imported app and pandas
+SCRIPT = """
+import sys
+import fake_data
+import app
+from fake_data.sensor import get_profile
+
+problemes = []
+if "pandas" in sys.modules:
+    problemes.append("pandas imported")
+if "profiles" not in app.startup_timings:
+    problemes.append("no profiles stage")
+problemes += [f"{classe} not loaded" for classe in app.app_tracker.registry.vocab_classes
+              if get_profile(classe).repas and get_profile(classe)._tables is None]
+sys.exit("; ".join(problemes) or None)
+"""
+
+
+@pytest.mark.integration
+def test_import_is_quiet_and_without_pandas(root_dir):
+    """With fresh compiled tables, importing the package and the app prints nothing and does not need pandas"""
+    env = {key: value for key, value in os.environ.items() if not key.startswith("SENSOR_API_")}
+    lancer = lambda: subprocess.run([sys.executable, "-c", SCRIPT], cwd=root_dir, env=env,  # noqa: E731
+                                    capture_output=True, text=True, timeout=120)
+    # The first run compiles the tables if they are missing or outdated
+    lancer()
+    resultat = lancer()
+    assert resultat.returncode == 0, resultat.stderr
+    assert (resultat.stdout, resultat.stderr) == ("", "")
@@ -0,0 +1,59 @@
+from datetime import date, timedelta
+
+import numpy as np
+import pytest
+
+from fake_data import AppTracker
+from fake_data.store import ActivityStore, materialize
+
+
+@pytest.mark.integration
+def test_store_matches_live_simulation(app_tracker, tmp_path):
+    """Materialized days are served from the store, with the values of the live simulation"""
+    debut = date(2024, 7, 1)
+    silencieux = lambda message: None  # noqa: E731
+    assert materialize(app_tracker, str(tmp_path), until=debut + timedelta(days=1), start_date=debut, log=silencieux) == 2
+    # Nightly run: only the new day is appended
+    assert materialize(app_tracker, str(tmp_path), until=debut + timedelta(days=2), log=silencieux) == 1
+
+    store = ActivityStore(str(tmp_path))
+    assert store.end_date == debut + timedelta(days=2)
+    for user in app_tracker.users[:5]:
+        for k in range(4):
+            business_date = debut + timedelta(days=k)
+            columns = store.get(user.user_id, business_date, app_tracker.simulation_version)
+            if k == 3:
+                assert columns is None  # Not materialized: live simulation
+                continue
+            live = app_tracker.get_all_connexion(user.user_id, business_date)
+            assert columns['meal_id'].tolist() == live['meal_id']
+            assert columns['aliment_id'].tolist() == live['aliment_id']
+            assert np.datetime_as_string(columns['heure_repas']).tolist() == [h.replace(' ', 'T') for h in
+                                                                                live['heure_repas']]
+    assert store.get(app_tracker.users[0].user_id, debut, "other-version") is None
+
+
+@pytest.mark.integration
+def test_store_serves_the_same_traffic_as_the_simulation(app_tracker, tmp_path, monkeypatch):
+    """get_connexion and get_all_connexion answer the same from the store, and simulate what it does not hold"""
+    debut = date(2024, 7, 1)
+    materialize(app_tracker, str(tmp_path), until=debut + timedelta(days=1), start_date=debut, log=lambda message: None)
+    servi = AppTracker(app_tracker.registry, store=ActivityStore(str(tmp_path)))
+
+    user_ids = app_tracker.registry.user_ids.tolist()
+    jours = [debut, debut + timedelta(days=1), debut + timedelta(days=2)]
+    attendus = {(user_id, business_date): app_tracker.get_all_connexion(user_id, business_date)
+                for user_id in user_ids for business_date in jours}
+    for (user_id, business_date), connexion_day in attendus.items():
+        # The last day is not in the store: it is simulated
+        assert (servi.get_columns(user_id, business_date) is None) == (business_date == jours[-1])
+        assert servi.get_all_connexion(user_id, business_date) == connexion_day
+        for meal_id in range(1, 5):
+            assert servi.get_connexion(meal_id, business_date, user_id) == \
+                app_tracker.get_connexion(meal_id, business_date, user_id), (user_id, business_date, meal_id)
+
+    # Days of another simulation version are not served from the store
+    monkeypatch.setattr(AppTracker, "simulation_version", property(lambda self: "other-version"))
+    servi.cache.clear()
+    assert servi.get_columns(user_ids[0], debut) is None
+    assert servi.get_all_connexion(user_ids[0], debut) == attendus[(user_ids[0], debut)]